@@ -1,5 +1,5 @@
 from django.http import HttpResponse
 
 
-def healthcheck(request):
+async def healthcheck(request):
     return HttpResponse("OK")
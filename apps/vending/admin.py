@@ -1,5 +1,5 @@
 from django.contrib import admin
-from apps.vending.models import Product, User, VendingMachineSlot
+from apps.vending.models import BalanceLedgerEntry, BalanceSnapshot, Machine, OrderEvent, Product, SalesRollup, User, VendingMachineSlot
 
 
 class ProductAdmin(admin.ModelAdmin):
@@ -8,16 +8,62 @@ class ProductAdmin(admin.ModelAdmin):
     ordering = ["-created_at"]
 
 
+class MachineAdmin(admin.ModelAdmin):
+    list_display = ["name", "created_at", "id"]
+    ordering = ["-created_at"]
+
+
 class VendingMachineSlotAdmin(admin.ModelAdmin):
-    list_display = ["product", "quantity", "row", "column"]
+    list_display = ["machine", "product", "quantity", "row", "column"]
+    list_filter = ["machine"]
     ordering = ["-row", "-column"]
 
 
 class UserAdmin(admin.ModelAdmin):
     list_display = ["name", "balance", "created_at", "id"]
     ordering = ["-created_at"]
+    # The balance is derived from the ledger, it only changes through the balance endpoints
+    readonly_fields = ["balance"]
+
+
+class ReadOnlyModelAdmin(admin.ModelAdmin):
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class BalanceLedgerEntryAdmin(ReadOnlyModelAdmin):
+    list_display = ["user", "type_operation", "amount", "created_at"]
+    ordering = ["-created_at"]
+
+
+class BalanceSnapshotAdmin(ReadOnlyModelAdmin):
+    list_display = ["user", "balance", "entries_count", "taken_at"]
+    ordering = ["-taken_at"]
+
+
+class OrderEventAdmin(ReadOnlyModelAdmin):
+    list_display = ["created_at", "user_id", "slot_id", "product_id", "quantity", "total_price"]
+    ordering = ["-created_at"]
+
+
+class SalesRollupAdmin(ReadOnlyModelAdmin):
+    list_display = ["period", "bucket", "slot_id", "product_id", "quantity", "orders", "revenue"]
+    list_filter = ["period"]
+    ordering = ["-bucket"]
 
 
+admin.site.register(Machine, MachineAdmin)
 admin.site.register(Product, ProductAdmin)
 admin.site.register(VendingMachineSlot, VendingMachineSlotAdmin)
 admin.site.register(User, UserAdmin)
+admin.site.register(BalanceLedgerEntry, BalanceLedgerEntryAdmin)
+admin.site.register(BalanceSnapshot, BalanceSnapshotAdmin)
+admin.site.register(OrderEvent, OrderEventAdmin)
+admin.site.register(SalesRollup, SalesRollupAdmin)
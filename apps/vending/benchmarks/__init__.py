@@ -0,0 +1,20 @@
+from apps.vending.benchmarks.cases import CASES, Dataset, seed_dataset
+from apps.vending.benchmarks.runner import BenchmarkResult, find_regressions, load_baseline, run_benchmarks, save_baseline
+from apps.vending.benchmarks.servers import ConcurrencyResult, run_asgi, run_wsgi
+from apps.vending.benchmarks.startup import StartupResult, measure_startup
+
+__all__ = [
+    "CASES",
+    "BenchmarkResult",
+    "ConcurrencyResult",
+    "Dataset",
+    "StartupResult",
+    "find_regressions",
+    "load_baseline",
+    "measure_startup",
+    "run_asgi",
+    "run_benchmarks",
+    "run_wsgi",
+    "save_baseline",
+    "seed_dataset",
+]
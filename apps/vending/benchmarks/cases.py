@@ -0,0 +1,326 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import cycle
+from math import ceil
+from typing import Callable
+
+from django.contrib.auth import get_user_model
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+
+from apps.vending.enums import BalanceTypeOperation
+from apps.vending.models import Machine, Product, User, VendingMachineSlot
+from apps.vending.money import Money, format_cents
+from apps.vending.planogram import bump_inventory_version, render_planogram
+from apps.vending.renderers import render_slots, slot_rows
+from apps.vending.request_dto import BalanceOperationDto, BatchOrderOperationDto, OrderLineDto, OrderOperationDto
+from apps.vending.serializers import UserSerializer, VendingMachineSlotSerializer
+from apps.vending.services import BalanceOperatorService, BatchOrderOperatorService, OrderOperatorService
+
+GRID = [(row, column) for row in range(1, 11) for column in range(1, 6)]
+
+PRICE = Money("0.05")
+BALANCE = Money("99.99")
+STOCK = 100
+
+
+@dataclass
+class Dataset:
+    users: list[User]
+    slots: list[VendingMachineSlot]
+    machines: list[Machine]
+    # Timed calls per case, set by run_benchmarks(); cases that sell size
+    # stock and balances for them.
+    iterations: int = 1
+
+
+def seed_dataset(users: int, slots: int, machines: int = 1) -> Dataset:
+    """
+    Seeds `slots` slots, up to the 10x5 grid, in each of `machines` machines.
+    """
+    products = Product.objects.bulk_create([
+        Product(name=f"Product {i}", description="Benchmark product", price=PRICE)
+        for i in range(slots)
+    ])
+    seeded_machines = Machine.objects.bulk_create([
+        Machine(name=f"Benchmark machine {i}") for i in range(machines)
+    ])
+    seeded_slots = VendingMachineSlot.objects.bulk_create([
+        VendingMachineSlot(machine=machine, product=product, quantity=STOCK, row=row, column=column)
+        for machine in seeded_machines
+        for product, (row, column) in zip(products, GRID)
+    ], batch_size=1000)
+    seeded_users = User.objects.bulk_create([
+        User(name=f"Benchmark user {i}", normalized_name=f"benchmark user {i}", balance=BALANCE)
+        for i in range(users)
+    ])
+    bump_inventory_version()
+    return Dataset(users=seeded_users, slots=seeded_slots, machines=seeded_machines)
+
+
+def restock(dataset: Dataset, lines: int = 1, cycle_slots: bool = True) -> None:
+    """
+    Refills slots and balances for a case that orders `lines` slots per
+    call, either cycling through the slots or always the same ones, and
+    cycling through the users. measure() adds one untimed warm-up call.
+    """
+    calls = dataset.iterations + 1
+    takes_per_slot = ceil(calls * lines / len(dataset.slots)) if cycle_slots else calls
+    products_per_user = ceil(calls / len(dataset.users)) * lines
+    VendingMachineSlot.objects.update(quantity=max(STOCK, takes_per_slot))
+    User.objects.update(balance=max(BALANCE, PRICE * products_per_user))
+    bump_inventory_version()
+
+
+CASES: dict[str, Callable[[Dataset], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    def register(factory):
+        CASES[name] = factory
+        return factory
+    return register
+
+
+@case("service:balance")
+def balance_service(dataset: Dataset):
+    users = cycle(dataset.users)
+    service = BalanceOperatorService()
+    return lambda: service.execute(BalanceOperationDto(
+        user_id=next(users).id, type_operation=BalanceTypeOperation.ADD, amount=Money(0)))
+
+
+@case("service:order")
+def order_service(dataset: Dataset):
+    restock(dataset)
+    users, slots = cycle(dataset.users), cycle(dataset.slots)
+    service = OrderOperatorService()
+    return lambda: service.execute(OrderOperationDto(
+        user_id=next(users).id, slot_id=next(slots).id))
+
+
+@case("service:batch_order")
+def batch_order_service(dataset: Dataset):
+    lines = [OrderLineDto(slot_id=slot.id) for slot in dataset.slots[:3]]
+    restock(dataset, lines=len(lines), cycle_slots=False)
+    users = cycle(dataset.users)
+    service = BatchOrderOperatorService()
+    return lambda: service.execute(BatchOrderOperationDto(
+        user_id=next(users).id, lines=lines))
+
+
+# Baskets of this many lines are priced the way the batch order service
+# does it, both with Decimal units, as money was handled before it moved to
+# integer cents, and with cents.
+MONEY_LINES = 5000
+
+CENTS = Decimal("0.01")
+
+
+@case("money:decimal")
+def decimal_money(dataset: Dataset):
+    lines = [(price.to_decimal(), quantity) for price, quantity in _money_lines(dataset)]
+
+    def price_basket():
+        totals = [price * quantity for price, quantity in lines]
+        return f"{sum(totals, Decimal('0.00')).quantize(CENTS):f}"
+    return price_basket
+
+
+@case("money:cents")
+def cents_money(dataset: Dataset):
+    lines = _money_lines(dataset)
+
+    def price_basket():
+        totals = [price * quantity for price, quantity in lines]
+        return format_cents(sum(totals))
+    return price_basket
+
+
+def _money_lines(dataset: Dataset) -> list[tuple[Money, int]]:
+    prices = list(Product.objects.values_list("price", flat=True))
+    return [(prices[i % len(prices)], i % 5 + 1) for i in range(MONEY_LINES)]
+
+
+# Slot lists are repeated up to this size to compare both renderers on the
+# large listings a fleet produces.
+LARGE_SLOT_LIST = 5000
+
+
+@case("serializer:slots")
+def slots_serializer(dataset: Dataset):
+    slots = list(VendingMachineSlot.objects.select_related("product"))
+    return lambda: VendingMachineSlotSerializer(slots, many=True).data
+
+
+@case("render:slots:drf")
+def drf_slots_renderer(dataset: Dataset):
+    slots = list(VendingMachineSlot.objects.select_related("product"))
+    slots = slots * max(1, LARGE_SLOT_LIST // len(slots))
+    renderer = JSONRenderer()
+    return lambda: renderer.render(VendingMachineSlotSerializer(slots, many=True).data)
+
+
+@case("render:slots:fast")
+def fast_slots_renderer(dataset: Dataset):
+    rows = list(slot_rows(VendingMachineSlot.objects.all()))
+    rows = rows * max(1, LARGE_SLOT_LIST // len(rows))
+    return lambda: render_slots(rows)
+
+
+@case("serializer:user")
+def user_serializer(dataset: Dataset):
+    user = dataset.users[0]
+    return lambda: UserSerializer(user).data
+
+
+@case("render:planogram")
+def planogram_renderer(dataset: Dataset):
+    return render_planogram
+
+
+def _get(path: str):
+    def factory(dataset: Dataset):
+        client = Client()
+        return lambda: client.get(path)
+    return factory
+
+
+def _stream(path: str):
+    def factory(dataset: Dataset):
+        client = Client()
+        return lambda: b"".join(client.get(path).streaming_content)
+    return factory
+
+
+case("http:healthcheck")(_get("/healthcheck/"))
+case("http:slots")(_get("/slots/"))
+case("http:slots:low_stock")(_get("/slots/?quantity=10"))
+case("http:slots:stream")(_stream("/slots/?stream=true"))
+case("http:products")(_get("/products/"))
+case("http:products:stream")(_stream("/products/?stream=true"))
+case("http:schema")(_get("/schema/"))
+case("http:docs")(_get("/docs/"))
+case("http:admin_login")(_get("/admin/login/"))
+
+
+@case("http:slot_detail")
+def slot_detail_endpoint(dataset: Dataset):
+    client = Client()
+    path = f"/slots/{dataset.slots[0].id}"
+    return lambda: client.get(path)
+
+
+@case("http:machine:slots")
+def machine_slots_endpoint(dataset: Dataset):
+    client = Client()
+    path = f"/machines/{dataset.machines[-1].id}/slots/"
+    return lambda: client.get(path)
+
+
+@case("http:machine:products")
+def machine_products_endpoint(dataset: Dataset):
+    client = Client()
+    path = f"/machines/{dataset.machines[-1].id}/products/"
+    return lambda: client.get(path)
+
+
+@case("http:machine:products:uncached")
+def uncached_machine_products_endpoint(dataset: Dataset):
+    client = Client()
+    path = f"/machines/{dataset.machines[-1].id}/products/"
+
+    def get_products():
+        bump_inventory_version()
+        return client.get(path)
+    return get_products
+
+
+@case("http:products:uncached")
+def uncached_products_endpoint(dataset: Dataset):
+    client = Client()
+
+    def get_products():
+        bump_inventory_version()
+        return client.get("/products/")
+    return get_products
+
+
+@case("http:login")
+def login_endpoint(dataset: Dataset):
+    client = Client()
+    users = cycle(dataset.users)
+    return lambda: client.post("/login/", {"name": next(users).name})
+
+
+@case("http:balance")
+def balance_endpoint(dataset: Dataset):
+    client = Client()
+    users = cycle(dataset.users)
+    return lambda: client.post("/balance/", {
+        "user_id": next(users).id,
+        "type_operation": BalanceTypeOperation.ADD.value,
+        "amount": "0.00",
+    })
+
+
+@case("http:order")
+def order_endpoint(dataset: Dataset):
+    restock(dataset)
+    client = Client()
+    users, slots = cycle(dataset.users), cycle(dataset.slots)
+    return lambda: client.post("/order/", {
+        "user_id": next(users).id, "slot_id": next(slots).id})
+
+
+@case("http:batch_order")
+def batch_order_endpoint(dataset: Dataset):
+    slot_ids = [str(slot.id) for slot in dataset.slots[:3]]
+    restock(dataset, lines=len(slot_ids), cycle_slots=False)
+    client = Client()
+    users = cycle(dataset.users)
+    return lambda: client.post("/order/batch/", {
+        "user_id": str(next(users).id), "slot_ids": slot_ids,
+    }, content_type="application/json")
+
+
+def _staff_client() -> Client:
+    # The planogram upload and sales report endpoints take a staff session.
+    staff, _ = get_user_model().objects.get_or_create(
+        username="benchmark", defaults={"is_staff": True})
+    client = Client()
+    client.force_login(staff)
+    return client
+
+
+@case("http:slots:bulk")
+def bulk_slots_endpoint(dataset: Dataset):
+    client = _staff_client()
+    machine_id = dataset.machines[0].id
+    slots = [
+        {"machine_id": str(slot.machine_id), "row": slot.row, "column": slot.column,
+         "product_id": str(slot.product_id), "quantity": STOCK}
+        for slot in dataset.slots if slot.machine_id == machine_id
+    ]
+    return lambda: client.post("/slots/bulk/", {"slots": slots}, content_type="application/json")
+
+
+@case("http:sales_report")
+def sales_report_endpoint(dataset: Dataset):
+    client = _staff_client()
+    return lambda: client.get("/reports/sales/?period=hour&group_by=slot")
+
+
+@case("http:products:events")
+def product_events_endpoint(dataset: Dataset):
+    client = Client()
+
+    def first_event():
+        # The stream stays open for minutes; this times opening it and
+        # reading its first event, then hangs up.
+        response = client.get("/products/stream/")
+        try:
+            return next(iter(response.streaming_content))
+        finally:
+            response.close()
+    return first_event
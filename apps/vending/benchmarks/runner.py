@@ -0,0 +1,99 @@
+import json
+import platform
+import statistics
+from dataclasses import asdict, dataclass, replace
+from time import perf_counter
+from typing import Callable
+
+import django
+from django.db import connection
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    iterations: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    throughput: float
+    queries: int
+
+
+def measure(name: str, operation: Callable[[], object], iterations: int) -> BenchmarkResult:
+    # The first call warms caches up and counts queries; counting slows the
+    # cursor down, so the timed calls run without it. A wrapper is used
+    # rather than connection.queries, which every request resets.
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        operation()
+
+    timings = []
+    started = perf_counter()
+    for _ in range(iterations):
+        start = perf_counter()
+        operation()
+        timings.append(perf_counter() - start)
+    elapsed = perf_counter() - started
+
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return BenchmarkResult(
+        name=name,
+        iterations=iterations,
+        p50_ms=cuts[49] * 1000,
+        p95_ms=cuts[94] * 1000,
+        p99_ms=cuts[98] * 1000,
+        throughput=iterations / elapsed,
+        queries=len(queries),
+    )
+
+
+def run_benchmarks(cases: dict[str, Callable], dataset, iterations: int) -> list[BenchmarkResult]:
+    dataset = replace(dataset, iterations=iterations)
+    return [
+        measure(name, factory(dataset), iterations)
+        for name, factory in cases.items()
+    ]
+
+
+def find_regressions(results: list[BenchmarkResult], baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares results with a saved baseline. A case regresses when its p50
+    grows by more than `threshold` (0.2 = 20%) or when it runs more queries.
+    """
+    regressions = []
+    for result in results:
+        previous = baseline["results"].get(result.name)
+        if previous is None:
+            continue
+        if result.p50_ms > previous["p50_ms"] * (1 + threshold):
+            regressions.append(
+                f"{result.name}: p50 {previous['p50_ms']:.3f}ms -> {result.p50_ms:.3f}ms")
+        if result.queries > previous["queries"]:
+            regressions.append(
+                f"{result.name}: queries {previous['queries']} -> {result.queries}")
+    return regressions
+
+
+def save_baseline(path: str, results: list[BenchmarkResult], dataset_size: dict) -> None:
+    baseline = {
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+        },
+        "dataset": dataset_size,
+        "results": {result.name: asdict(result) for result in results},
+    }
+    with open(path, "w") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
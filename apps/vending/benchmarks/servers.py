@@ -0,0 +1,149 @@
+import asyncio
+import io
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import cycle
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+
+# Concurrent-connection throughput of the WSGI and ASGI handler stacks,
+# driven in process so no server needs to be installed: WSGI requests are
+# served by a fixed pool of worker threads like a threaded server, ASGI
+# requests by one event loop.
+
+
+@dataclass
+class ConcurrencyResult:
+    mode: str
+    connections: int
+    requests: int
+    p50_ms: float
+    p99_ms: float
+    throughput: float
+    errors: int
+
+
+def _result(mode: str, connections: int, timings: list[float], statuses: list[int],
+            elapsed: float) -> ConcurrencyResult:
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return ConcurrencyResult(
+        mode=mode,
+        connections=connections,
+        requests=len(timings),
+        p50_ms=cuts[49] * 1000,
+        p99_ms=cuts[98] * 1000,
+        throughput=len(timings) / elapsed,
+        errors=sum(status >= 400 for status in statuses),
+    )
+
+
+def _wsgi_environ(path: str) -> dict:
+    url = urlsplit(path)
+    return {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": url.path,
+        "QUERY_STRING": url.query,
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+
+
+def run_wsgi(paths: list[str], connections: int, requests: int, threads: int) -> ConcurrencyResult:
+    """
+    Serves `requests` GETs cycling over `paths` with `threads` worker
+    threads while `connections` clients keep one request in flight each.
+    """
+    handler = WSGIHandler()
+    in_flight = threading.Semaphore(connections)
+    timings, statuses = [], []
+
+    def serve(path: str, queued: float) -> None:
+        status = []
+        try:
+            body = handler(_wsgi_environ(path), lambda code, headers: status.append(int(code[:3])))
+            b"".join(body)
+            body.close()
+        finally:
+            timings.append(perf_counter() - queued)
+            statuses.append(status[0] if status else 500)
+            in_flight.release()
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        paths = cycle(paths)
+        for _ in range(requests):
+            in_flight.acquire()
+            pool.submit(serve, next(paths), perf_counter())
+    elapsed = perf_counter() - started
+    return _result("wsgi", connections, timings, statuses, elapsed)
+
+
+def _asgi_scope(path: str) -> dict:
+    url = urlsplit(path)
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+
+
+async def _asgi_clients(paths: list[str], connections: int, requests: int):
+    handler = ASGIHandler()
+    paths = cycle(paths)
+    remaining = requests
+    timings, statuses = [], []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            status = []
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            start = perf_counter()
+            await handler(_asgi_scope(next(paths)), receive, send)
+            timings.append(perf_counter() - start)
+            statuses.append(status[0] if status else 500)
+
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return timings, statuses
+
+
+def run_asgi(paths: list[str], connections: int, requests: int) -> ConcurrencyResult:
+    """
+    Serves `requests` GETs cycling over `paths` on one event loop with
+    `connections` clients keeping one request in flight each.
+    """
+    started = perf_counter()
+    timings, statuses = asyncio.run(_asgi_clients(paths, connections, requests))
+    elapsed = perf_counter() - started
+    return _result("asgi", connections, timings, statuses, elapsed)
@@ -0,0 +1,96 @@
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+
+from django.conf import settings
+
+# Worker boot and per-request cost of a settings profile, measured in a
+# fresh interpreter run with -X importtime, since a process can neither
+# re-import Django nor switch settings once configured.
+
+# Runs in the child: boots the WSGI application, serves the first request
+# (which imports the URLconf and views) and then times `requests` more.
+STARTUP_SCRIPT = """
+import io, json, statistics, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+path, requests = sys.argv[1], int(sys.argv[2])
+
+def get():
+    status = []
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "",
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1", "wsgi.version": (1, 0), "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr, "wsgi.multithread": True,
+        "wsgi.multiprocess": False, "wsgi.run_once": False,
+    }
+    body = application(environ, lambda code, headers: status.append(int(code[:3])))
+    b"".join(body)
+    body.close()
+    return status[0]
+
+first_status = get()
+boot = time.perf_counter() - started
+timings = []
+for _ in range(requests):
+    start = time.perf_counter()
+    get()
+    timings.append(time.perf_counter() - start)
+print(json.dumps({
+    "boot": boot, "status": first_status, "request_p50": statistics.median(timings),
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+@dataclass
+class StartupResult:
+    settings_module: str
+    boot_ms: float
+    import_ms: float
+    modules: int
+    request_p50_us: float
+    status: int
+    # (module, cumulative ms) of the slowest imports made at the top level.
+    slowest_imports: list[tuple[str, float]]
+    imported: set[str]
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, float]]:
+    """
+    -X importtime lines -> (module, nesting level, cumulative ms).
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        module = name.strip()
+        imports.append((module, (len(name) - len(name.lstrip()) - 1) // 2, int(cumulative) / 1000))
+    return imports
+
+
+def measure_startup(settings_module: str, path: str = "/healthcheck/", requests: int = 1000,
+                    top: int = 10) -> StartupResult:
+    environ = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT, path, str(requests)],
+        cwd=settings.BASE_DIR, env=environ, capture_output=True, text=True)
+    if child.returncode:
+        raise RuntimeError(f"{settings_module} failed to start:\n{child.stderr[-2000:]}")
+    report = json.loads(child.stdout.splitlines()[-1])
+    top_level = [(module, ms) for module, level, ms in parse_importtime(child.stderr) if level == 0]
+    return StartupResult(
+        settings_module=settings_module,
+        boot_ms=report["boot"] * 1000,
+        import_ms=sum(ms for _, ms in top_level),
+        modules=len(report["modules"]),
+        request_p50_us=report["request_p50"] * 1_000_000,
+        status=report["status"],
+        slowest_imports=sorted(top_level, key=lambda item: -item[1])[:top],
+        imported=set(report["modules"]),
+    )
@@ -6,3 +6,8 @@ class BalanceTypeOperation(str, Enum):
     ADD = "add"
     REFUND = "refund"
     ORDER_PRODUCT = "order_product"
+
+
+class SalesPeriod(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import threading
+import time
+from typing import AsyncIterator, Iterator
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest, StreamingHttpResponse
+
+from apps.vending.inventory import inventory_engine
+from apps.vending.models import VendingMachineSlot
+from apps.vending.money import format_cents
+
+# Server-Sent Events for kiosks: committed changes to slot quantities and
+# prices are published once per process and fanned out to every open
+# /products/stream/ connection, so kiosks only fetch /products/ on connect
+# and when told to resync.
+
+DELTA_COLUMNS = ("id", "quantity", "machine_id", "product_id", "product__price")
+
+HEARTBEAT = b": heartbeat\n\n"
+
+
+class Subscription:
+    """
+    The deltas waiting to be sent to one client. Deltas are coalesced per
+    slot, so a slow client holds at most one pending delta per slot and the
+    publisher never waits for it; past settings.SSE_MAX_PENDING slots the
+    deltas are dropped and the client is told to resync instead.
+    """
+
+    def __init__(self, machine_id=None, resync: bool = False):
+        self.machine_id = machine_id
+        self._lock = threading.Lock()
+        self._pending: dict[str, dict] = {}
+        self._resync = resync
+        self._ready = threading.Event()
+        self._loop = None
+        self._async_ready = None
+        if resync:
+            self._ready.set()
+
+    def bind_loop(self) -> None:
+        """
+        Lets aget() be woken from publishing threads. Call on the loop that
+        will await it.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._async_ready = asyncio.Event()
+        if self._ready.is_set():
+            self._async_ready.set()
+
+    def push(self, deltas: list[dict]) -> None:
+        with self._lock:
+            for delta in deltas:
+                if self.machine_id is not None and delta["machine_id"] != str(self.machine_id):
+                    continue
+                # Re-inserted so the dict stays in publishing order.
+                self._pending.pop(delta["slot_id"], None)
+                self._pending[delta["slot_id"]] = delta
+            if len(self._pending) > settings.SSE_MAX_PENDING:
+                self._pending.clear()
+                self._resync = True
+            if not self._pending and not self._resync:
+                return
+        self._ready.set()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._async_ready.set)
+            except RuntimeError:
+                # The loop is closed: the client is gone.
+                pass
+
+    def _take(self) -> tuple[list[dict], bool]:
+        with self._lock:
+            deltas, self._pending = list(self._pending.values()), {}
+            resync, self._resync = self._resync, False
+        return deltas, resync
+
+    def get(self, timeout: float) -> tuple[list[dict], bool]:
+        """
+        Waits up to `timeout` seconds and returns the pending deltas and
+        whether the client has to resync.
+        """
+        self._ready.wait(timeout)
+        self._ready.clear()
+        return self._take()
+
+    async def aget(self, timeout: float) -> tuple[list[dict], bool]:
+        try:
+            await asyncio.wait_for(self._async_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._async_ready.clear()
+        self._ready.clear()
+        return self._take()
+
+
+class InventoryPublisher:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: set[Subscription] = set()
+        # Id of the last published event, sent as the SSE event id.
+        self.sequence = 0
+
+    def subscribe(self, machine_id=None, last_event_id: str | None = None) -> Subscription:
+        """
+        A reconnecting client that missed events (or whose last event came
+        from another process run) starts with a resync.
+        """
+        resync = last_event_id is not None and last_event_id != str(self.sequence)
+        subscription = Subscription(machine_id, resync=resync)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def publish_slots(self, slot_ids) -> None:
+        """
+        Sends the current quantity and price of the given slots to every
+        subscriber. Meant for transaction.on_commit(); reads nothing when no
+        client is connected.
+        """
+        if not self.has_subscribers:
+            return
+        rows = inventory_engine.overlay(VendingMachineSlot.objects.using(DEFAULT_DB_ALIAS).filter(
+            id__in=list(slot_ids)).values_list(*DELTA_COLUMNS))
+        self.publish([
+            {"slot_id": str(id), "machine_id": str(machine_id), "product_id": str(product_id),
+             "quantity": quantity, "price": format_cents(price)}
+            for id, quantity, machine_id, product_id, price in rows
+        ])
+
+    def publish_products(self, product_ids) -> None:
+        if not self.has_subscribers:
+            return
+        self.publish_slots(VendingMachineSlot.objects.using(DEFAULT_DB_ALIAS).filter(
+            product_id__in=list(product_ids)).values_list("id", flat=True))
+
+    def publish(self, deltas: list[dict]) -> None:
+        if not deltas:
+            return
+        with self._lock:
+            for delta in deltas:
+                self.sequence += 1
+                delta["id"] = self.sequence
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.push(deltas)
+
+
+inventory_publisher = InventoryPublisher()
+
+
+def _encode(deltas: list[dict], resync: bool) -> bytes:
+    events = []
+    if resync:
+        events.append(f"event: resync\nid: {inventory_publisher.sequence}\ndata: {{}}\n\n")
+    for delta in deltas:
+        data = {key: value for key, value in delta.items() if key != "id"}
+        events.append(f"event: slot\nid: {delta['id']}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n")
+    return "".join(events).encode()
+
+
+# Streams end after settings.SSE_MAX_STREAM_SECONDS and clients reconnect
+# with their Last-Event-ID: Django does not notice a client that goes away
+# while a streaming body is sent, so an endless stream of a gone client
+# would stay subscribed, and keep publish_slots() reading, forever.
+
+def event_stream(machine_id, last_event_id: str | None, heartbeat: float,
+                 lifetime: float) -> Iterator[bytes]:
+    # Subscribed once the body is read: a generator that never starts
+    # would never unsubscribe.
+    subscription = inventory_publisher.subscribe(machine_id, last_event_id)
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n".encode()
+        deadline = time.monotonic() + lifetime
+        while (remaining := deadline - time.monotonic()) > 0:
+            deltas, resync = subscription.get(min(heartbeat, remaining))
+            yield _encode(deltas, resync) if deltas or resync else HEARTBEAT
+    finally:
+        inventory_publisher.unsubscribe(subscription)
+
+
+async def aevent_stream(machine_id, last_event_id: str | None, heartbeat: float,
+                        lifetime: float) -> AsyncIterator[bytes]:
+    subscription = inventory_publisher.subscribe(machine_id, last_event_id)
+    subscription.bind_loop()
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n".encode()
+        deadline = time.monotonic() + lifetime
+        while (remaining := deadline - time.monotonic()) > 0:
+            deltas, resync = await subscription.aget(min(heartbeat, remaining))
+            yield _encode(deltas, resync) if deltas or resync else HEARTBEAT
+    finally:
+        inventory_publisher.unsubscribe(subscription)
+
+
+def event_stream_response(request: HttpRequest, machine_id=None) -> StreamingHttpResponse:
+    """
+    Streams the slot deltas of one machine, or of all of them, as SSE.
+    """
+    last_event_id = request.headers.get("Last-Event-ID")
+    heartbeat, lifetime = settings.SSE_HEARTBEAT_INTERVAL, settings.SSE_MAX_STREAM_SECONDS
+    # Over WSGI each open stream holds a worker thread; serve kiosks over ASGI.
+    if isinstance(request, ASGIRequest):
+        content = aevent_stream(machine_id, last_event_id, heartbeat, lifetime)
+    else:
+        content = event_stream(machine_id, last_event_id, heartbeat, lifetime)
+    response = StreamingHttpResponse(content, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keeps nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
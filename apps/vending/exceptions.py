@@ -3,6 +3,10 @@ class UserNotFound(Exception):
     pass
 
 
+class MachineNotFound(Exception):
+    pass
+
+
 class VendingMachineSlotNotFound(Exception):
     pass
 
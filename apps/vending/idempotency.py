@@ -0,0 +1,106 @@
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY = "vending:idempotency:{path}:{key}"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """
+    Remembers the response given to each Idempotency-Key for
+    settings.IDEMPOTENCY_KEY_TTL seconds. A key is claimed with an atomic
+    cache.add() before the request runs, so a concurrent duplicate sees the
+    claim and waits for the stored response instead of running again.
+    """
+
+    def _cache_key(self, path: str, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return IDEMPOTENCY_KEY.format(path=path, key=digest)
+
+    def claim(self, path: str, key: str, fingerprint: str) -> bool:
+        return cache.add(self._cache_key(path, key), {"fingerprint": fingerprint},
+                         timeout=settings.IDEMPOTENCY_CLAIM_TTL)
+
+    def get(self, path: str, key: str) -> dict | None:
+        """
+        Returns {"fingerprint"} while the first request runs and
+        {"fingerprint", "status", "data"} once it has answered.
+        """
+        return cache.get(self._cache_key(path, key))
+
+    def complete(self, path: str, key: str, fingerprint: str, response: Response) -> None:
+        cache.set(self._cache_key(path, key), {
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "data": response.data,
+        }, timeout=settings.IDEMPOTENCY_KEY_TTL)
+
+    def release(self, path: str, key: str) -> None:
+        cache.delete(self._cache_key(path, key))
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _fingerprint(data) -> str:
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(record: dict) -> Response:
+    response = Response(data=record["data"], status=record["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(post):
+    """
+    Honors an optional Idempotency-Key header on an APIView post(): the
+    first request with a key runs, later ones with the same key and body get
+    its response back without running the view again. Server errors are not
+    stored, so the request can be retried.
+    """
+
+    @functools.wraps(post)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return post(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={
+                "message": f"{IDEMPOTENCY_KEY_HEADER} must have 1 to {MAX_KEY_LENGTH} characters"})
+
+        fingerprint = _fingerprint(request.data)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        while not idempotency_store.claim(request.path, key, fingerprint):
+            record = idempotency_store.get(request.path, key)
+            if record is not None and record["fingerprint"] != fingerprint:
+                return Response(status=status.HTTP_422_UNPROCESSABLE_ENTITY, data={
+                    "message": f"{IDEMPOTENCY_KEY_HEADER} was already used with another request"})
+            if record is not None and "status" in record:
+                return _replay(record)
+            if time.monotonic() > deadline:
+                return Response(status=status.HTTP_409_CONFLICT, data={
+                    "message": f"A request with this {IDEMPOTENCY_KEY_HEADER} is still in progress"})
+            time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+        response = None
+        try:
+            response = post(self, request, *args, **kwargs)
+        finally:
+            # The claim is always replaced or dropped, never left to expire.
+            if response is not None and response.status_code < 500:
+                idempotency_store.complete(request.path, key, fingerprint, response)
+            else:
+                idempotency_store.release(request.path, key)
+        return response
+
+    return wrapper
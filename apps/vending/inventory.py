@@ -0,0 +1,253 @@
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import UUID
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from apps.vending.exceptions import OrderError, VendingMachineSlotNotFound
+from apps.vending.models import VendingMachineSlot
+from apps.vending.transactions import write_transaction
+
+logger = logging.getLogger(__name__)
+
+# Stock taken inside InventoryEngine.reserving(), returned if the block fails.
+_reservation: ContextVar[list | None] = ContextVar("inventory_reservation", default=None)
+
+
+class InventoryEngine:
+    """
+    Authoritative per-slot stock counters held in process memory, enabled
+    with settings.INVENTORY_ENGINE. Orders take stock under a per-slot lock
+    without touching the database; changed counters are written back to
+    VendingMachineSlot.quantity in batched transactions by a background
+    flusher every settings.INVENTORY_FLUSH_INTERVAL seconds, or sooner once
+    settings.INVENTORY_FLUSH_BATCH_SIZE slots are dirty.
+
+    Counters are loaded from the database on first use. The process owns
+    the stock between flushes, so every process taking orders must share
+    one engine (run a single worker process), and takes not yet flushed are
+    lost if the process dies.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._slot_locks: dict[UUID, threading.Lock] = {}
+        self._stock: dict[UUID, int] = {}
+        self._dirty: set[UUID] = set()
+        self._loaded = False
+        self._wake = threading.Event()
+        self._flusher: threading.Thread | None = None
+        self._stopping = False
+
+    def load(self) -> None:
+        """
+        Rebuilds every counter from the database, dropping unflushed takes.
+        """
+        stock = dict(VendingMachineSlot.objects.using(DEFAULT_DB_ALIAS).values_list("id", "quantity"))
+        with self._lock:
+            self._stock = stock
+            self._dirty = set()
+            self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            self.load()
+        if settings.INVENTORY_FLUSH_INTERVAL is not None:
+            self.start()
+
+    def _key(self, slot_id) -> UUID:
+        return VendingMachineSlot._meta.pk.to_python(slot_id)
+
+    def _slot_lock(self, slot_id: UUID) -> threading.Lock:
+        lock = self._slot_locks.get(slot_id)
+        if lock is None:
+            with self._lock:
+                lock = self._slot_locks.setdefault(slot_id, threading.Lock())
+        return lock
+
+    def _fetch(self, slot_id: UUID) -> int:
+        # Only slots created after the load miss the counters.
+        quantity = VendingMachineSlot.objects.using(DEFAULT_DB_ALIAS).filter(
+            id=slot_id).values_list("quantity", flat=True).first()
+        if quantity is None:
+            raise VendingMachineSlotNotFound(f"Slot not found with ID {slot_id}")
+        return self._stock.setdefault(slot_id, quantity)
+
+    def _mark_dirty(self, slot_id: UUID) -> int:
+        # Under the lock flush() swaps the set under, so a change is never
+        # added to a set that is already being written.
+        with self._lock:
+            self._dirty.add(slot_id)
+            return len(self._dirty)
+
+    def _mark_clean(self, slot_id: UUID) -> None:
+        with self._lock:
+            self._dirty.discard(slot_id)
+
+    def take(self, slot_id: UUID, quantity: int = 1) -> int:
+        """
+        Takes stock from a slot and returns what is left. Raises
+        VendingMachineSlotNotFound or OrderError like the database path.
+        """
+        self._ensure_loaded()
+        slot_id = self._key(slot_id)
+        with self._slot_lock(slot_id):
+            stock = self._stock.get(slot_id)
+            if stock is None:
+                stock = self._fetch(slot_id)
+            if stock < quantity:
+                raise OrderError("Not enough product quantity")
+            self._stock[slot_id] = stock - quantity
+            dirty = self._mark_dirty(slot_id)
+        if (taken := _reservation.get()) is not None:
+            taken.append((slot_id, quantity))
+        if dirty >= settings.INVENTORY_FLUSH_BATCH_SIZE:
+            self._wake.set()
+        return stock - quantity
+
+    def put_back(self, slot_id: UUID, quantity: int = 1) -> None:
+        slot_id = self._key(slot_id)
+        with self._slot_lock(slot_id):
+            if slot_id in self._stock:
+                self._stock[slot_id] += quantity
+                self._mark_dirty(slot_id)
+
+    @contextmanager
+    def reserving(self):
+        """
+        Puts back every take made inside the block if it raises, e.g. when
+        the order's transaction rolls back.
+        """
+        taken = []
+        token = _reservation.set(taken)
+        try:
+            yield
+        except BaseException:
+            for slot_id, quantity in reversed(taken):
+                self.put_back(slot_id, quantity)
+            raise
+        finally:
+            _reservation.reset(token)
+
+    def quantity(self, slot_id: UUID) -> int | None:
+        return self._stock.get(self._key(slot_id))
+
+    def reset(self, slot_id: UUID, quantity: int) -> None:
+        """
+        Replaces a counter with a quantity just saved to the database.
+        """
+        if not self._loaded:
+            return
+        slot_id = self._key(slot_id)
+        with self._slot_lock(slot_id):
+            self._stock[slot_id] = quantity
+            self._mark_clean(slot_id)
+
+    def forget(self, slot_id: UUID) -> None:
+        slot_id = self._key(slot_id)
+        with self._slot_lock(slot_id):
+            self._stock.pop(slot_id, None)
+            self._mark_clean(slot_id)
+
+    def overlay(self, rows: list) -> list:
+        """
+        Replaces the quantity of SLOT_COLUMNS rows with the live counters,
+        which are ahead of the database until the next flush.
+        """
+        if not self._loaded:
+            return rows
+        stock = self._stock
+        return [(id, stock.get(id, quantity), *rest) for id, quantity, *rest in rows]
+
+    def flush(self) -> int:
+        """
+        Writes the changed counters to the database in one transaction and
+        returns how many slots were written.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        slots = [
+            VendingMachineSlot(id=slot_id, quantity=self._stock[slot_id])
+            for slot_id in dirty if slot_id in self._stock
+        ]
+        try:
+            with write_transaction():
+                VendingMachineSlot.objects.bulk_update(
+                    slots, ["quantity"], batch_size=settings.INVENTORY_FLUSH_BATCH_SIZE)
+        except BaseException:
+            with self._lock:
+                self._dirty |= dirty
+            raise
+        return len(slots)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._flush_forever, name="inventory-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """
+        Stops the flusher after a last flush.
+        """
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+        if flusher is None:
+            return
+        atexit.unregister(self.stop)
+        self._stopping = True
+        self._wake.set()
+        flusher.join()
+        self._stopping = False
+
+    def _flush_forever(self) -> None:
+        while not self._stopping:
+            self._wake.wait(settings.INVENTORY_FLUSH_INTERVAL)
+            self._wake.clear()
+            if not self._dirty:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Inventory flush failed, retrying on the next interval")
+                connection.close()
+        connection.close()
+
+    def clear(self) -> None:
+        """
+        Drops every counter; the next use loads them again.
+        """
+        with self._lock:
+            self._stock = {}
+            self._dirty = set()
+            self._loaded = False
+
+
+inventory_engine = InventoryEngine()
+
+
+class LiveQuantityEncoder:
+    """
+    Wraps a streaming encoder so rows are rendered with live quantities.
+    """
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    def encode(self, rows) -> bytes:
+        return self.encoder.encode(inventory_engine.overlay(rows))
+
+    def close(self) -> bytes:
+        return self.encoder.close()
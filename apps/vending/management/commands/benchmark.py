@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from apps.vending.benchmarks import CASES, find_regressions, load_baseline, run_benchmarks, save_baseline, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Times services, serializers and endpoints against a seeded throwaway "
+        "database and reports p50/p95/p99 latency, throughput and query counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100,
+                            help="Users to seed (default: 100).")
+        parser.add_argument("--slots", type=int, default=50,
+                            help="Slots to seed per machine, up to the 10x5 grid (default: 50).")
+        parser.add_argument("--machines", type=int, default=1,
+                            help="Machines to seed (default: 1).")
+        parser.add_argument("--iterations", type=int, default=200,
+                            help="Timed calls per case (default: 200).")
+        parser.add_argument("--case", action="append", dest="cases", default=[],
+                            help="Only run cases whose name starts with this prefix. Repeatable.")
+        parser.add_argument("--save", metavar="PATH",
+                            help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="PATH",
+                            help="Compare the results with a JSON baseline.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Allowed p50 slowdown against the baseline (default: 0.2).")
+
+    def handle(self, *args, **options):
+        cases = {
+            name: factory for name, factory in CASES.items()
+            if not options["cases"] or name.startswith(tuple(options["cases"]))
+        }
+        if not cases:
+            raise CommandError("No benchmark matches the given --case prefixes")
+        if options["iterations"] < 2:
+            raise CommandError("--iterations must be at least 2")
+
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            dataset = seed_dataset(
+                users=options["users"], slots=options["slots"], machines=options["machines"])
+            # The seeded users would run out of tokens long before the end.
+            with override_settings(RATE_LIMITS={}):
+                results = run_benchmarks(cases, dataset, options["iterations"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'case':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'queries':>9}")
+        for result in results:
+            self.stdout.write(
+                f"{result.name:<34}{result.p50_ms:>10.3f}{result.p95_ms:>10.3f}"
+                f"{result.p99_ms:>10.3f}{result.throughput:>10.1f}{result.queries:>9}")
+
+        if options["save"]:
+            save_baseline(options["save"], results, {
+                "users": options["users"], "slots": options["slots"],
+                "machines": options["machines"]})
+            self.stdout.write(f"Baseline saved to {options['save']}")
+
+        if options["compare"]:
+            regressions = find_regressions(
+                results, load_baseline(options["compare"]), options["threshold"])
+            if regressions:
+                raise CommandError(
+                    "Regressions against baseline:\n" + "\n".join(regressions))
+            self.stdout.write("No regressions against baseline")
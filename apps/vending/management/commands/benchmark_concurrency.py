@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.vending.benchmarks import run_asgi, run_wsgi, seed_dataset
+
+READ_PATHS = ["/products/", "/slots/", "/healthcheck/"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares concurrent-connection throughput of the read endpoints "
+        "served through the WSGI and the ASGI handlers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, action="append", default=[],
+                            help="Concurrent clients. Repeatable (default: 1, 10 and 50).")
+        parser.add_argument("--threads", type=int, default=4,
+                            help="WSGI worker threads (default: 4).")
+        parser.add_argument("--requests", type=int, default=2000,
+                            help="Requests per mode and connection count (default: 2000).")
+        parser.add_argument("--path", action="append", dest="paths", default=[],
+                            help=f"Paths to request in turn. Repeatable (default: {' '.join(READ_PATHS)}).")
+        parser.add_argument("--machines", type=int, default=1,
+                            help="Machines to seed (default: 1).")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 2:
+            raise CommandError("--requests must be at least 2")
+        paths = options["paths"] or READ_PATHS
+
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            dataset = seed_dataset(users=1, slots=50, machines=options["machines"])
+            paths = [path.format(machine_id=dataset.machines[0].id) for path in paths]
+            results = []
+            for connections in options["connections"] or [1, 10, 50]:
+                results.append(run_wsgi(paths, connections, options["requests"], options["threads"]))
+                results.append(run_asgi(paths, connections, options["requests"]))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'mode':<6}{'conns':>7}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}")
+        for result in results:
+            self.stdout.write(
+                f"{result.mode:<6}{result.connections:>7}{result.p50_ms:>10.3f}"
+                f"{result.p99_ms:>10.3f}{result.throughput:>10.1f}{result.errors:>8}")
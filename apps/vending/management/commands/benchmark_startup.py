@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.vending.benchmarks import measure_startup
+
+PROFILES = ["vending_machine.settings", "vending_machine.settings_api"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares worker boot time (-X importtime), imported modules and "
+        "per-request handler cost of settings profiles, each in a fresh interpreter."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", action="append", dest="profiles", default=[],
+                            help=f"Settings module to measure. Repeatable (default: {' '.join(PROFILES)}).")
+        parser.add_argument("--path", default="/healthcheck/",
+                            help="Path requested through the WSGI handler (default: /healthcheck/).")
+        parser.add_argument("--requests", type=int, default=2000,
+                            help="Timed requests per profile (default: 2000).")
+        parser.add_argument("--top", type=int, default=5,
+                            help="Slowest top-level imports to list per profile (default: 5).")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1")
+        try:
+            results = [
+                measure_startup(profile, options["path"], options["requests"], options["top"])
+                for profile in options["profiles"] or PROFILES
+            ]
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{'profile':<32}{'boot ms':>10}{'imports ms':>12}{'modules':>9}{'req p50 us':>12}{'status':>8}")
+        for result in results:
+            self.stdout.write(
+                f"{result.settings_module:<32}{result.boot_ms:>10.1f}{result.import_ms:>12.1f}"
+                f"{result.modules:>9}{result.request_p50_us:>12.1f}{result.status:>8}")
+        for result in results:
+            self.stdout.write(f"\nSlowest imports with {result.settings_module}:")
+            for module, ms in result.slowest_imports:
+                self.stdout.write(f"  {ms:>8.1f} ms  {module}")
@@ -0,0 +1,22 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.vending.schema import write_schema
+
+
+class Command(BaseCommand):
+    help = "Writes the OpenAPI schema as YAML and JSON for /schema/ to serve from memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default=None,
+            help="Directory to write schema.yaml and schema.json to "
+                 "(default: OPENAPI_SCHEMA_DIR, or build/ when unset).")
+
+    def handle(self, *args, **options):
+        directory = (options["output"] or settings.OPENAPI_SCHEMA_DIR
+                     or os.path.join(settings.BASE_DIR, "build"))
+        for path in write_schema(directory):
+            self.stdout.write(f"Wrote {path}")
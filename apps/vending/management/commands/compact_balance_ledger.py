@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.vending.services import LedgerCompactionService
+
+
+class Command(BaseCommand):
+    help = "Folds old balance ledger entries into per-user snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days", type=int, default=30,
+            help="Fold entries created more than this many days ago (default: 30).")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+        folded = LedgerCompactionService().execute(cutoff)
+        self.stdout.write(f"Folded {folded} ledger entries older than {cutoff.isoformat()}")
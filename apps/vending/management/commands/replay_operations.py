@@ -0,0 +1,52 @@
+import json
+import os
+
+import attr
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.vending.replay import WorkerDied, replay_operations
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays an NDJSON log of balance and order operations recorded offline, "
+        "partitioned by user_id over parallel worker processes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, one /balance/ or /order/ request body per line.")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Worker processes (default: one per CPU).")
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Operations each worker commits per transaction (default: 500).")
+        parser.add_argument(
+            "--failures", metavar="PATH",
+            help="Write failed operations to this NDJSON file instead of stderr.")
+
+    def handle(self, *args, **options):
+        if settings.INVENTORY_ENGINE:
+            raise CommandError(
+                "The inventory engine keeps slot stock in the server process, unset INVENTORY_ENGINE to replay")
+        if options["workers"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--workers and --batch-size must be at least 1")
+        try:
+            with open(options["path"], encoding="utf-8") as log:
+                result = replay_operations(log, workers=options["workers"], batch_size=options["batch_size"])
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        except WorkerDied as e:
+            raise CommandError(str(e))
+
+        if options["failures"]:
+            with open(options["failures"], "w", encoding="utf-8") as failures:
+                for failure in result.failures:
+                    failures.write(json.dumps(attr.asdict(failure)) + "\n")
+        else:
+            for failure in result.failures:
+                self.stderr.write(f"line {failure.line} ({failure.operation or 'invalid'}): {failure.error}")
+        self.stdout.write(
+            f"Replayed {result.operations} operations in {result.seconds:.2f}s "
+            f"({result.operations_per_second:.0f} ops/s): "
+            f"{result.succeeded} succeeded, {len(result.failures)} failed")
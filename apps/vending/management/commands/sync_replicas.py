@@ -0,0 +1,40 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from apps.vending.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database into every replica file with the "
+        "SQLite online backup API, so replicas serve a consistent snapshot."
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("sync_replicas only copies SQLite databases")
+        aliases = replica_aliases()
+        if not aliases:
+            self.stdout.write("No replicas configured")
+            return
+
+        source = sqlite3.connect(primary.settings_dict["NAME"])
+        try:
+            for alias in aliases:
+                name = connections[alias].settings_dict["NAME"]
+                if name == primary.settings_dict["NAME"]:
+                    # A test mirror of the primary.
+                    continue
+                # Replicas keep their connections; the backup replaces the
+                # pages under them in one transaction.
+                target = sqlite3.connect(name)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"Synced {alias} from {DEFAULT_DB_ALIAS}")
+        finally:
+            source.close()
@@ -0,0 +1,47 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.vending.exceptions import MachineNotFound, ProductNotFound
+from apps.vending.parsers import parse_planogram_csv
+from apps.vending.services import PlanogramUploadService
+from apps.vending.validators import PlanogramUploadValidator
+
+
+class Command(BaseCommand):
+    help = "Creates or updates slots from a planogram JSON or CSV file, like POST /slots/bulk/."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Planogram file.")
+        parser.add_argument(
+            "--format", choices=["json", "csv"],
+            help="File format (default: taken from the file extension).")
+
+    def handle(self, *args, **options):
+        if settings.INVENTORY_ENGINE:
+            raise CommandError(
+                "The inventory engine keeps slot stock in the server process, unset INVENTORY_ENGINE "
+                "or restock through POST /slots/bulk/")
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        try:
+            text = path.read_text(encoding="utf-8-sig")
+            if file_format == "csv":
+                data = parse_planogram_csv(text)
+            elif file_format == "json":
+                data = json.loads(text)
+            else:
+                raise CommandError("Unknown file format, pass --format json or --format csv")
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        validator = PlanogramUploadValidator(data=data)
+        if not validator.is_valid():
+            raise CommandError(f"Invalid planogram: {json.dumps(validator.errors)}")
+        try:
+            result = PlanogramUploadService().execute(validator.to_dto())
+        except (MachineNotFound, ProductNotFound) as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Created {result.created} slots, updated {result.updated} slots")
@@ -0,0 +1,193 @@
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from apps.vending.routers import RoutingState, _routing_state
+
+logger = logging.getLogger("apps.vending.server_timing")
+
+_request_timings: ContextVar["RequestTimings | None"] = ContextVar(
+    "request_timings", default=None)
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.view_started = None
+        self.view_finished = None
+        self.render_finished = None
+        self.spans = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.db_queries += 1
+
+
+@contextmanager
+def server_timing(name: str):
+    """
+    Times a block of a view as a named Server-Timing metric. Costs a context
+    variable lookup when ServerTimingMiddleware is not installed.
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.spans[name] = timings.spans.get(name, 0.0) + perf_counter() - start
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _request_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+def _instrument_connections():
+    # Execute wrappers belong to the connection objects of the current
+    # thread, one per alias. The wrapper stays installed and finds the
+    # request it times through the context variable, which sync_to_async
+    # carries into the thread that async views run their queries on.
+    for conn in connections.all():
+        if _time_query not in conn.execute_wrappers:
+            conn.execute_wrappers.append(_time_query)
+
+
+class ServerTimingMiddleware:
+    """
+    Reports DB query count and time over every database alias, view time,
+    response rendering time and any server_timing() blocks as a
+    Server-Timing header plus one JSON log line per request. Only installed
+    when settings.SERVER_TIMING is on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _instrument_connections()
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._report(request, response, timings, perf_counter() - start)
+
+    async def __acall__(self, request):
+        await sync_to_async(_instrument_connections)()
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._report(request, response, timings, perf_counter() - start)
+
+    def _report(self, request, response, timings, total):
+        metrics = {"db": timings.db_time}
+        if timings.view_started is not None:
+            view_finished = timings.view_finished or perf_counter()
+            metrics["view"] = view_finished - timings.view_started
+            if timings.render_finished is not None:
+                metrics["render"] = timings.render_finished - view_finished
+        metrics.update(timings.spans)
+        metrics["total"] = total
+
+        response["Server-Timing"] = ", ".join(
+            f'db;dur={metrics["db"] * 1000:.3f};desc="{timings.db_queries} queries"'
+            if name == "db" else f"{name};dur={duration * 1000:.3f}"
+            for name, duration in metrics.items()
+        )
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "db_queries": timings.db_queries,
+            **{f"{name}_ms": round(duration * 1000, 3) for name, duration in metrics.items()},
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _request_timings.get().view_started = perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = _request_timings.get()
+        timings.view_finished = perf_counter()
+
+        def render_finished(response):
+            timings.render_finished = perf_counter()
+        response.add_post_render_callback(render_finished)
+        return response
+
+
+PRIMARY_PIN_COOKIE = "vending_primary_pin"
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Gives PrimaryReplicaRouter its per-request state. A request that writes
+    pins its client to the primary with a cookie for
+    settings.REPLICA_PIN_SECONDS, so the client reads its own writes while
+    the replicas catch up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(pinned=PRIMARY_PIN_COOKIE in request.COOKIES)
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=PRIMARY_PIN_COOKIE in request.COOKIES)
+        token = _routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        return self._pin(state, response)
+
+    def _pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+from django.utils import timezone
+
+
+def open_balance_snapshots(apps, schema_editor):
+    User = apps.get_model("vending", "User")
+    BalanceSnapshot = apps.get_model("vending", "BalanceSnapshot")
+    taken_at = timezone.now()
+    BalanceSnapshot.objects.bulk_create([
+        BalanceSnapshot(user_id=user_id, balance=balance, taken_at=taken_at)
+        for user_id, balance in User.objects.exclude(balance=0).values_list("id", "balance")
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vending', '0014_alter_product_id_alter_user_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('entries_count', models.IntegerField(default=0)),
+                ('taken_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='vending.user')),
+            ],
+            options={
+                'db_table': 'balance_snapshot',
+                'indexes': [models.Index(fields=['user', '-taken_at'], name='snapshot_user_taken_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceLedgerEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('type_operation', models.CharField(choices=[('add', 'ADD'), ('refund', 'REFUND'), ('order_product', 'ORDER_PRODUCT')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='vending.user')),
+            ],
+            options={
+                'db_table': 'balance_ledger_entry',
+                'indexes': [models.Index(fields=['user', 'created_at'], name='ledger_user_created_idx'), models.Index(fields=['created_at'], name='ledger_created_idx')],
+            },
+        ),
+        migrations.RunPython(open_balance_snapshots, migrations.RunPython.noop),
+    ]
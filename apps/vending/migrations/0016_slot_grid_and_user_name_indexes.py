@@ -0,0 +1,26 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:41
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vending', '0015_balance_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='user_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendingmachineslot',
+            index=models.Index(fields=['quantity'], name='slot_quantity_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vendingmachineslot',
+            constraint=models.UniqueConstraint(fields=('row', 'column'), name='slot_grid_position_unique'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+def normalize_names(apps, schema_editor):
+    User = apps.get_model("vending", "User")
+    seen = set()
+    users = []
+    # Names that only differ by case were possible before. The oldest user
+    # keeps the name and the others are renamed to "<name> (2)", "<name> (3)"...
+    # instead of merged, as each of them has its own balance and ledger.
+    for user in User.objects.order_by("created_at"):
+        name = user.name
+        suffix = 1
+        while name.casefold() in seen:
+            suffix += 1
+            tail = f" ({suffix})"
+            name = user.name[:200 - len(tail)] + tail
+        seen.add(name.casefold())
+        user.name = name
+        user.normalized_name = name.casefold()
+        users.append(user)
+    User.objects.bulk_update(users, ["name", "normalized_name"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vending', '0016_slot_grid_and_user_name_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_name_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=200, null=True),
+        ),
+        migrations.RunPython(normalize_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=200, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.2 on 2026-10-18 21:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def assign_slots_to_machine(apps, schema_editor):
+    Machine = apps.get_model("vending", "Machine")
+    VendingMachineSlot = apps.get_model("vending", "VendingMachineSlot")
+    # Existing deployments run a single machine: it keeps all their slots.
+    if VendingMachineSlot.objects.exists():
+        machine = Machine.objects.create(name="Vending machine")
+        VendingMachineSlot.objects.update(machine=machine)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vending', '0017_user_normalized_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Machine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'machine',
+            },
+        ),
+        migrations.AddField(
+            model_name='vendingmachineslot',
+            name='machine',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='vending.machine'),
+        ),
+        migrations.RunPython(assign_slots_to_machine, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vendingmachineslot',
+            name='machine',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='vending.machine'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='vendingmachineslot',
+            name='slot_grid_position_unique',
+        ),
+        migrations.AddConstraint(
+            model_name='vendingmachineslot',
+            constraint=models.UniqueConstraint(fields=('machine', 'row', 'column'), name='slot_machine_grid_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='vendingmachineslot',
+            index=models.Index(fields=['row', 'column', 'id'], name='slot_grid_idx'),
+        ),
+    ]
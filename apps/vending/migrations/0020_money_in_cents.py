@@ -0,0 +1,57 @@
+import django.core.validators
+from django.db import migrations, models
+
+import apps.vending.money
+
+# Every money column becomes integer cents. Each one is added next to the
+# decimal column, filled from it in SQL, and renamed over it once the
+# decimal column is dropped, which works the same on SQLite and PostgreSQL.
+# The decimal column is made nullable so the migration can be reversed
+# on tables that have rows.
+MONEY_COLUMNS = [
+    # (model, table, column, decimal max_digits, cents default, non-negative)
+    ("product", "product", "price", 4, None, True),
+    ("user", "user", "balance", 4, 0, True),
+    ("balanceledgerentry", "balance_ledger_entry", "amount", 6, None, False),
+    ("balancesnapshot", "balance_snapshot", "balance", 6, None, False),
+    ("orderevent", "order_event", "unit_price", 4, None, False),
+    ("orderevent", "order_event", "total_price", 6, None, False),
+    ("salesrollup", "sales_rollup", "revenue", 12, 0, False),
+]
+
+
+def money_in_cents(model, table, column, max_digits, default, non_negative):
+    cents = f"{column}_cents"
+    validators = [django.core.validators.MinValueValidator(0)] if non_negative else []
+    return [
+        migrations.AddField(
+            model_name=model,
+            name=cents,
+            field=apps.vending.money.MoneyField(default=0, validators=validators),
+            preserve_default=default is not None,
+        ),
+        migrations.AlterField(
+            model_name=model,
+            name=column,
+            field=models.DecimalField(max_digits=max_digits, decimal_places=2, null=True),
+        ),
+        migrations.RunSQL(
+            f'UPDATE "{table}" SET "{cents}" = CAST(ROUND("{column}" * 100) AS INTEGER)',
+            f'UPDATE "{table}" SET "{column}" = "{cents}" / 100.0',
+        ),
+        migrations.RemoveField(model_name=model, name=column),
+        migrations.RenameField(model_name=model, old_name=cents, new_name=column),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vending', '0019_sales_rollups'),
+    ]
+
+    operations = [
+        operation
+        for money_column in MONEY_COLUMNS
+        for operation in money_in_cents(*money_column)
+    ]
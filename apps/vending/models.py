@@ -1,7 +1,11 @@
 from django.db import models
 import uuid
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
-from decimal import Decimal
+from django.utils import timezone
+
+from apps.vending.enums import BalanceTypeOperation, SalesPeriod
+from apps.vending.money import MoneyField
 
 
 class Product(models.Model):
@@ -15,18 +19,43 @@ class Product(models.Model):
         primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200)
     description = models.CharField(max_length=1000, null=True)
-    price = models.DecimalField(max_digits=4, decimal_places=2, validators=[
-                                MinValueValidator(Decimal("0.00"))])
+    price = MoneyField(validators=[MinValueValidator(0)])
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(null=True)
 
 
+class Machine(models.Model):
+    class Meta:
+        db_table = "machine"
+
+    def __str__(self):
+        return self.name
+
+    id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
 class VendingMachineSlot(models.Model):
     class Meta:
         db_table = "vending_machine_slot"
+        constraints = [
+            # Also the index behind every per-machine read: machine_id=?
+            # ordered by (row, column).
+            models.UniqueConstraint(
+                fields=["machine", "row", "column"], name="slot_machine_grid_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["quantity"], name="slot_quantity_idx"),
+            models.Index(fields=["row", "column", "id"], name="slot_grid_idx"),
+        ]
 
     id = models.UUIDField(
         primary_key=True, default=uuid.uuid4, editable=False)
+    # db_index=False: slot_machine_grid_unique already leads with machine_id.
+    machine = models.ForeignKey(
+        "Machine", on_delete=models.CASCADE, related_name="slots", db_index=False)
     product = models.ForeignKey("Product", on_delete=models.CASCADE)
     quantity = models.IntegerField(
         validators=[MaxValueValidator(100), MinValueValidator(0)])
@@ -43,11 +72,116 @@ class User(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.normalized_name = self.normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        super().clean()
+        if self.name and User.objects.filter(
+                normalized_name=self.normalize_name(self.name)).exclude(pk=self.pk).exists():
+            raise ValidationError({"name": "A user with this name already exists"})
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        return name.casefold()
+
     id = models.UUIDField(
         primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200)
-    balance = models.DecimalField(max_digits=4,
-                                  decimal_places=2,
-                                  default=Decimal("0.00"),
-                                  validators=[MinValueValidator(Decimal("0.00"))])
+    normalized_name = models.CharField(
+        max_length=200, unique=True, null=True, editable=False)
+    balance = MoneyField(default=0, validators=[MinValueValidator(0)])
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class BalanceLedgerEntry(models.Model):
+    class Meta:
+        db_table = "balance_ledger_entry"
+        indexes = [
+            models.Index(fields=["user", "created_at"],
+                         name="ledger_user_created_idx"),
+            models.Index(fields=["created_at"], name="ledger_created_idx"),
+        ]
+
+    id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        "User", on_delete=models.CASCADE, related_name="ledger_entries")
+    type_operation = models.CharField(max_length=20, choices=[
+        (operation.value, operation.name) for operation in BalanceTypeOperation])
+    amount = MoneyField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+class BalanceSnapshot(models.Model):
+    class Meta:
+        db_table = "balance_snapshot"
+        indexes = [
+            models.Index(fields=["user", "-taken_at"],
+                         name="snapshot_user_taken_idx"),
+        ]
+
+    id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        "User", on_delete=models.CASCADE, related_name="balance_snapshots")
+    balance = MoneyField()
+    entries_count = models.IntegerField(default=0)
+    taken_at = models.DateTimeField()
+
+
+class OrderEvent(models.Model):
+    """
+    One line of a placed order, written in the order's transaction. Slots,
+    products and users are referenced without database constraints, so the
+    sales history outlives them, and without indexes nothing reads.
+    """
+    class Meta:
+        db_table = "order_event"
+        indexes = [
+            models.Index(fields=["created_at"], name="order_event_created_idx"),
+        ]
+
+    id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    # Shared by the lines of one batch order.
+    order_id = models.UUIDField(default=uuid.uuid4)
+    user = models.ForeignKey(
+        "User", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+")
+    slot = models.ForeignKey(
+        "VendingMachineSlot", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+")
+    product = models.ForeignKey(
+        "Product", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+")
+    quantity = models.IntegerField()
+    unit_price = MoneyField()
+    total_price = MoneyField()
+    # Not auto_now_add: the order passes the time its rollup buckets use.
+    created_at = models.DateTimeField(default=timezone.now)
+
+
+class SalesRollup(models.Model):
+    """
+    Order events summed per hour or day bucket, slot and product, kept up
+    to date in the order's transaction.
+    """
+    class Meta:
+        db_table = "sales_rollup"
+        constraints = [
+            # Also the index reports read: period=? AND bucket BETWEEN ? AND ?.
+            models.UniqueConstraint(
+                fields=["period", "bucket", "slot", "product"], name="sales_rollup_bucket_unique"),
+        ]
+
+    id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    period = models.CharField(max_length=4, choices=[
+        (period.value, period.name) for period in SalesPeriod])
+    bucket = models.DateTimeField()
+    slot = models.ForeignKey(
+        "VendingMachineSlot", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+")
+    product = models.ForeignKey(
+        "Product", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+")
+    quantity = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    revenue = MoneyField(default=0)
@@ -0,0 +1,90 @@
+from decimal import Decimal, InvalidOperation
+
+from django import forms
+from django.core import validators
+from django.db import models
+
+# Money is stored and computed as integer cents. Decimals only appear at the
+# edges: amounts are parsed from "10.40" strings and rendered back to them.
+
+# Amounts are capped well below the 64-bit column limit, so sums of many of
+# them can't overflow in SQL.
+MONEY_MAX_CENTS = 10 ** 15
+
+
+def format_cents(cents: int) -> str:
+    """
+    1040 -> "10.40", the format the API has always used for money.
+    """
+    if cents < 0:
+        return "-" + format_cents(-cents)
+    return "%d.%02d" % divmod(cents, 100)
+
+
+class Money(int):
+    """
+    An amount of money in integer cents. Money(1040), Money("10.40") and
+    Money(Decimal("10.40")) are the same amount: ints are cents, strings and
+    Decimals are currency units with at most two decimal places. Floats are
+    rejected.
+
+    Arithmetic is plain int arithmetic, so sums and products of prices are
+    ints (still cents) computed at C speed; wrap them in Money to render.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, value=0):
+        if isinstance(value, int):
+            return super().__new__(cls, value)
+        if isinstance(value, float):
+            raise TypeError("Money can't be built from a float, use a str or Decimal")
+        try:
+            units = value if isinstance(value, Decimal) else Decimal(value)
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount of money: {value!r}")
+        if not units.is_finite():
+            raise ValueError(f"Invalid amount of money: {value!r}")
+        cents = units.scaleb(2)
+        if cents != cents.to_integral_value():
+            raise ValueError(f"Money has at most two decimal places: {value!r}")
+        return super().__new__(cls, int(cents))
+
+    def __str__(self) -> str:
+        return format_cents(self)
+
+    def __repr__(self) -> str:
+        return f"Money('{self}')"
+
+    def to_decimal(self) -> Decimal:
+        return Decimal(int(self)).scaleb(-2)
+
+
+class MoneyField(models.BigIntegerField):
+    """
+    Integer cents in the database, Money in Python. Accepts anything Money
+    does, so Decimal and "10.40" values are still stored correctly.
+    """
+
+    default_validators = [validators.MaxValueValidator(MONEY_MAX_CENTS)]
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else Money(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Money):
+            return value
+        try:
+            return Money(value)
+        except (TypeError, ValueError) as error:
+            raise validators.ValidationError(str(error), code="invalid")
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, "resolve_expression"):
+            return value
+        return int(value if isinstance(value, int) else Money(value))
+
+    def formfield(self, **kwargs):
+        # Edited in currency units; the widget renders Money as "10.40".
+        return models.Field.formfield(self, **{
+            "form_class": forms.DecimalField, "decimal_places": 2, **kwargs})
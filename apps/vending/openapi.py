@@ -0,0 +1,107 @@
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from drf_spectacular import generators
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
+from rest_framework import serializers
+from rest_framework.views import APIView
+
+import apps.vending.views as vending_views
+from apps.health.views import healthcheck
+from apps.vending.schema import SCHEMA_MEDIA_TYPES
+from apps.vending.serializers import PlanogramProductSerializer, VendingMachineSlotSerializer
+from apps.vending.validators import ListProductsValidator, ListSlotsValidator
+
+# The read endpoints are plain Django views, which drf-spectacular skips.
+# Each of them gets an APIView that carries its schema and hands requests
+# on to the plain view. The schema generator walks the URLconf as usual
+# and describes a plain view's paths with that APIView.
+
+NOT_FOUND = OpenApiResponse(description="Machine or slot not found.")
+
+
+def documented(view, **schema) -> type[APIView]:
+    callback = view.as_view() if isinstance(view, type) else view
+    if iscoroutinefunction(callback):
+        callback = async_to_sync(callback)
+
+    class DocumentedView(APIView):
+
+        @extend_schema(**schema)
+        def get(self, request, *args, **kwargs):
+            return callback(request._request, *args, **kwargs)
+
+    DocumentedView.__name__ = DocumentedView.__qualname__ = f"Documented{view.__name__}"
+    return DocumentedView
+
+
+HealthcheckDocs = documented(healthcheck, responses={(200, "text/plain"): OpenApiTypes.STR})
+
+SlotListDocs = documented(
+    vending_views.VendingMachineSlotView,
+    parameters=[ListSlotsValidator],
+    responses={200: VendingMachineSlotSerializer(many=True), 404: NOT_FOUND},
+    description="One page of slots; the Link header points to the next one.",
+)
+
+SlotDetailDocs = documented(
+    vending_views.VendingMachineSlotDetailView,
+    responses={200: VendingMachineSlotSerializer, 404: NOT_FOUND},
+)
+
+ProductGridDocs = documented(
+    vending_views.ProductView,
+    parameters=[ListProductsValidator],
+    responses={
+        200: serializers.ListSerializer(child=serializers.ListField(child=PlanogramProductSerializer())),
+        404: NOT_FOUND,
+    },
+    description="Products with their slot quantity, one list per machine row.",
+)
+
+ProductStreamDocs = documented(
+    vending_views.ProductStreamView,
+    responses={(200, "text/event-stream"): OpenApiTypes.STR, 404: NOT_FOUND},
+    description="Server-sent events with the slots whose quantity or price changed.",
+)
+
+SchemaDocs = documented(
+    vending_views.SchemaView,
+    parameters=[OpenApiParameter("format", OpenApiTypes.STR, enum=list(SCHEMA_MEDIA_TYPES))],
+    responses={(200, media_type): OpenApiTypes.OBJECT for media_type in SCHEMA_MEDIA_TYPES.values()},
+    description="This OpenAPI schema. Send If-None-Match to revalidate it.",
+)
+
+DOCUMENTATION = {
+    view: documentation.as_view()
+    for view, documentation in [
+        (healthcheck, HealthcheckDocs),
+        (vending_views.VendingMachineSlotView, SlotListDocs),
+        (vending_views.VendingMachineSlotDetailView, SlotDetailDocs),
+        (vending_views.ProductView, ProductGridDocs),
+        (vending_views.ProductStreamView, ProductStreamDocs),
+        (vending_views.SchemaView, SchemaDocs),
+    ]
+}
+
+
+def _documentation(callback):
+    return DOCUMENTATION.get(getattr(callback, "view_class", callback))
+
+
+class EndpointEnumerator(generators.EndpointEnumerator):
+
+    def should_include_endpoint(self, path, callback):
+        return _documentation(callback) is not None or super().should_include_endpoint(path, callback)
+
+    def get_allowed_methods(self, callback):
+        return super().get_allowed_methods(_documentation(callback) or callback)
+
+    def _get_api_endpoints(self, patterns, prefix):
+        return [
+            (path, path_regex, method, _documentation(callback) or callback)
+            for path, path_regex, method, callback in super()._get_api_endpoints(patterns, prefix)
+        ]
+
+
+class SchemaGenerator(generators.SchemaGenerator):
+    endpoint_inspector_cls = EndpointEnumerator
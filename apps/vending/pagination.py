@@ -0,0 +1,78 @@
+import base64
+import json
+from uuid import UUID
+
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
+
+# Keyset pagination: pages are ordered by a unique key and each page starts
+# right after the last key of the previous one, so fetching a page is an
+# index seek no matter how deep it is.
+
+SLOT_KEYSET = ("row", "column", "id")
+
+
+def encode_cursor(key: tuple) -> str:
+    row, column, id = key
+    payload = json.dumps([row, column, str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Raises ValueError when the cursor was not produced by encode_cursor.
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        row, column, id = json.loads(payload)
+        if not isinstance(row, int) or not isinstance(column, int):
+            raise ValueError
+        return row, column, UUID(id)
+    except (TypeError, ValueError, AttributeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _after(key: tuple) -> Q:
+    row, column, id = key
+    # row >= x first, so the planner can seek the (row, column) index.
+    return Q(row__gte=row) & (
+        Q(row__gt=row) | Q(column__gt=column) | Q(column=column, id__gt=id))
+
+
+def ordered_after(slots: QuerySet, after: tuple | None) -> QuerySet:
+    """
+    Orders slots by SLOT_KEYSET, starting right after the `after` key.
+    """
+    if after is not None:
+        slots = slots.filter(_after(after))
+    return slots.order_by(*SLOT_KEYSET)
+
+
+def _page_query(slots: QuerySet, after: tuple | None, page_size: int) -> QuerySet:
+    return ordered_after(slots, after)[:page_size + 1]
+
+
+def _page(rows: list, page_size: int) -> tuple[list, tuple | None]:
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    id, _, row, column, *_ = rows[-1]
+    return rows, (row, column, id)
+
+
+def slots_page(slots: QuerySet, after: tuple | None, page_size: int) -> tuple[list, tuple | None]:
+    """
+    Returns one page of slot rows (SLOT_COLUMNS values) and the key to
+    continue from, or None on the last page.
+    """
+    return _page(list(_page_query(slots, after, page_size)), page_size)
+
+
+async def aslots_page(slots: QuerySet, after: tuple | None, page_size: int) -> tuple[list, tuple | None]:
+    return _page([row async for row in _page_query(slots, after, page_size)], page_size)
+
+
+def next_page_link(request: HttpRequest, cursor: str) -> str:
+    query = request.GET.copy()
+    query["cursor"] = cursor
+    return f'<{request.build_absolute_uri(request.path)}?{query.urlencode()}>; rel="next"'
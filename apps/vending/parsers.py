@@ -0,0 +1,32 @@
+import csv
+import io
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+PLANOGRAM_CSV_COLUMNS = ("machine_id", "row", "column", "product_id", "quantity")
+
+
+def parse_planogram_csv(text: str) -> dict:
+    """
+    Reads a planogram CSV with a PLANOGRAM_CSV_COLUMNS header into the
+    {"slots": [...]} data PlanogramUploadValidator expects. Raises
+    ValueError when a column is missing.
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    missing = [column for column in PLANOGRAM_CSV_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV header is missing the columns {', '.join(missing)}")
+    return {"slots": [{column: row[column] for column in PLANOGRAM_CSV_COLUMNS} for row in reader]}
+
+
+class PlanogramCSVParser(BaseParser):
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            return parse_planogram_csv(stream.read().decode(encoding))
+        except (UnicodeDecodeError, ValueError, csv.Error) as e:
+            raise ParseError(f"CSV parse error - {e}")
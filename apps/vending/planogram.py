@@ -0,0 +1,93 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from apps.vending.exceptions import MachineNotFound
+from apps.vending.inventory import inventory_engine
+from apps.vending.models import Machine, VendingMachineSlot
+from apps.vending.renderers import render_product_grid, slot_rows
+
+INVENTORY_VERSION_KEY = "vending:inventory-version"
+PLANOGRAM_KEY = "vending:planogram:{version}"
+MACHINE_PLANOGRAM_KEY = "vending:planogram:{machine_id}:{version}"
+PLANOGRAM_HITS_KEY = "vending:planogram:hits"
+PLANOGRAM_MISSES_KEY = "vending:planogram:misses"
+
+
+def get_inventory_version() -> int:
+    version = cache.get(INVENTORY_VERSION_KEY)
+    if version is None:
+        # Seeding from the clock keeps the version increasing even if the key
+        # was evicted, so a stale planogram can never be picked up again.
+        cache.add(INVENTORY_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(INVENTORY_VERSION_KEY)
+    return version
+
+
+def bump_inventory_version() -> None:
+    try:
+        cache.incr(INVENTORY_VERSION_KEY)
+    except ValueError:
+        cache.add(INVENTORY_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _increment(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def render_planogram(machine_id=None) -> bytes:
+    """
+    Renders the planogram of one machine, or of every slot when machine_id
+    is None. Raises MachineNotFound for an unknown machine.
+    """
+    # Read from the primary: the render is cached under the inventory version
+    # its commit bumped, which a lagging replica may not have yet.
+    slots = VendingMachineSlot.objects.using(DEFAULT_DB_ALIAS).order_by("row", "column")
+    if machine_id is None:
+        return render_product_grid(inventory_engine.overlay(slot_rows(slots)))
+    rows = list(slot_rows(slots.filter(machine_id=machine_id)))
+    if not rows and not Machine.objects.using(DEFAULT_DB_ALIAS).filter(id=machine_id).exists():
+        raise MachineNotFound("Machine not found")
+    return render_product_grid(inventory_engine.overlay(rows))
+
+
+class PlanogramCache:
+
+    def get(self, machine_id=None) -> tuple[bytes, bool]:
+        """
+        Returns the rendered planogram JSON and whether it came from the cache.
+        """
+        version = get_inventory_version()
+        if machine_id is None:
+            key = PLANOGRAM_KEY.format(version=version)
+        else:
+            key = MACHINE_PLANOGRAM_KEY.format(machine_id=machine_id, version=version)
+        content = cache.get(key)
+        if content is not None:
+            _increment(PLANOGRAM_HITS_KEY)
+            return content, True
+        _increment(PLANOGRAM_MISSES_KEY)
+        content = render_planogram(machine_id)
+        cache.set(key, content)
+        return content, False
+
+    async def aget(self, machine_id=None) -> tuple[bytes, bool]:
+        # A hit is a few in-memory cache reads; running the whole lookup in
+        # one thread hop is cheaper than awaiting each cache call.
+        return await sync_to_async(self.get)(machine_id)
+
+    def stats(self) -> dict[str, int]:
+        counters = cache.get_many([PLANOGRAM_HITS_KEY, PLANOGRAM_MISSES_KEY])
+        return {
+            "hits": counters.get(PLANOGRAM_HITS_KEY, 0),
+            "misses": counters.get(PLANOGRAM_MISSES_KEY, 0),
+        }
+
+
+planogram_cache = PlanogramCache()
@@ -0,0 +1,101 @@
+from json.encoder import encode_basestring
+
+from django.db.models import QuerySet
+
+from apps.vending.money import format_cents
+
+# Read fast path for slot listings: rows are projected with values_list()
+# and rendered with string templates into the exact bytes that DRF's
+# JSONRenderer produces for VendingMachineSlotSerializer data.
+
+SLOT_COLUMNS = (
+    "id", "quantity", "row", "column",
+    "product_id", "product__name", "product__description", "product__price",
+)
+
+SLOT_TEMPLATE = (
+    '{"id":"%s","quantity":%d,"row":%d,"column":%d,'
+    '"product":{"id":"%s","name":%s,"description":%s,"price":"%s"}}'
+)
+
+PLANOGRAM_PRODUCT_TEMPLATE = (
+    '{"id":"%s","name":%s,"description":%s,"price":"%s","quantity":%d,"slot_id":"%s"}'
+)
+
+
+def slot_rows(slots: QuerySet) -> QuerySet:
+    return slots.values_list(*SLOT_COLUMNS)
+
+
+def _string(value: str | None) -> str:
+    return "null" if value is None else encode_basestring(str(value))
+
+
+def _finish(content: str) -> bytes:
+    # Same escaping JSONRenderer applies to keep the output valid JavaScript.
+    return content.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029").encode()
+
+
+def _render_slot(row: tuple) -> str:
+    id, quantity, slot_row, column, product_id, name, description, price = row
+    return SLOT_TEMPLATE % (
+        id, quantity, slot_row, column,
+        product_id, _string(name), _string(description), format_cents(price))
+
+
+def render_slot(row: tuple) -> bytes:
+    return _finish(_render_slot(row))
+
+
+def render_slots(rows) -> bytes:
+    return _finish("[" + ",".join(map(_render_slot, rows)) + "]")
+
+
+def render_product_grid(rows) -> bytes:
+    """
+    Renders slot rows ordered by (row, column) as the /products/ grid: one
+    list per machine row with each product merged with its slot's quantity.
+    """
+    encoder = ProductGridEncoder()
+    return encoder.encode(rows) + encoder.close()
+
+
+# Incremental encoders for streaming responses: encode() renders one chunk
+# of rows and close() ends the document. Joined, their output is the same as
+# render_slots() / render_product_grid() over all the rows.
+
+class SlotsEncoder:
+
+    def __init__(self):
+        self.separator = "["
+
+    def encode(self, rows) -> bytes:
+        if not rows:
+            return b""
+        content = self.separator + ",".join(map(_render_slot, rows))
+        self.separator = ","
+        return _finish(content)
+
+    def close(self) -> bytes:
+        return b"[]" if self.separator == "[" else b"]"
+
+
+class ProductGridEncoder:
+
+    def __init__(self):
+        self.current_row = None
+
+    def encode(self, rows) -> bytes:
+        parts = []
+        for id, quantity, slot_row, column, product_id, name, description, price in rows:
+            if slot_row != self.current_row:
+                parts.append("[[" if self.current_row is None else "],[")
+                self.current_row = slot_row
+            else:
+                parts.append(",")
+            parts.append(PLANOGRAM_PRODUCT_TEMPLATE % (
+                product_id, _string(name), _string(description), format_cents(price), quantity, id))
+        return _finish("".join(parts))
+
+    def close(self) -> bytes:
+        return b"[]" if self.current_row is None else b"]]"
@@ -0,0 +1,189 @@
+import json
+import multiprocessing
+import queue
+import time
+import zlib
+from collections.abc import Iterable
+from uuid import UUID
+
+from django.db import connections, transaction
+
+from apps.vending.exceptions import OrderError, UserNotFound, VendingMachineSlotNotFound
+from apps.vending.response_dto import ReplayFailure, ReplayResult
+from apps.vending.services import BalanceOperatorService, OrderOperatorService
+from apps.vending.transactions import write_transaction
+from apps.vending.validators import BalanceViewValidator, OrderViewValidator
+
+# Replays NDJSON logs of balance and order operations recorded by machines
+# that were offline. Operations are partitioned by user_id, so each user's
+# operations run in file order in a single worker process, and each worker
+# commits them in batches through the same validators and services as the
+# /balance/ and /order/ endpoints.
+
+OPERATIONS = {
+    # kind: (validator, service)
+    "balance": (BalanceViewValidator, BalanceOperatorService),
+    "order": (OrderViewValidator, OrderOperatorService),
+}
+
+# Errors the endpoints answer with a 4xx, reported with their message only.
+OPERATION_ERRORS = (UserNotFound, VendingMachineSlotNotFound, OrderError, ValueError)
+
+# Batches that may wait for each worker, so the reader can't run ahead and
+# hold the whole file in memory.
+QUEUED_BATCHES = 4
+
+# Seconds between checks that the workers are still alive while waiting on
+# them, so a killed worker fails the replay instead of hanging it.
+WORKER_CHECK_INTERVAL = 1.0
+
+
+class WorkerDied(Exception):
+    pass
+
+
+def operation_kind(data: dict) -> str:
+    return "order" if "slot_id" in data else "balance"
+
+
+def partition(user_id, partitions: int) -> int:
+    """
+    Stable worker index for a user_id, whatever way its UUID is spelled.
+    """
+    try:
+        key = str(UUID(str(user_id)))
+    except ValueError:
+        key = str(user_id)
+    return zlib.crc32(key.encode()) % partitions
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, OPERATION_ERRORS):
+        return str(error)
+    return f"{type(error).__name__}: {error}"
+
+
+def replay_batch(batch: list[tuple[int, dict]]) -> list[ReplayFailure]:
+    """
+    Runs (line, operation) pairs in order in one transaction and returns
+    the ones that failed. Each operation runs in its own savepoint, so
+    whatever it raises only rolls back that operation.
+    """
+    failures = []
+    with write_transaction():
+        for line, data in batch:
+            kind = operation_kind(data)
+            validator_class, service_class = OPERATIONS[kind]
+            validator = validator_class(data=data)
+            if not validator.is_valid():
+                failures.append(ReplayFailure(line=line, operation=kind, error=json.dumps(validator.errors)))
+                continue
+            try:
+                with transaction.atomic():
+                    service_class().execute(validator.to_dto())
+            except Exception as e:
+                failures.append(ReplayFailure(line=line, operation=kind, error=_error_message(e)))
+    return failures
+
+
+def _replay_worker(batches: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    succeeded, failures = 0, []
+    try:
+        while (batch := batches.get()) is not None:
+            try:
+                batch_failures = replay_batch(batch)
+            except Exception as e:
+                # The batch was rolled back, so every operation in it failed.
+                error = f"{type(e).__name__}: {e}"
+                batch_failures = [
+                    ReplayFailure(line=line, operation=operation_kind(data), error=error)
+                    for line, data in batch
+                ]
+            succeeded += len(batch) - len(batch_failures)
+            failures.extend(batch_failures)
+    finally:
+        connections.close_all()
+        results.put((succeeded, failures))
+
+
+def _read_operation(line: str) -> dict:
+    data = json.loads(line)
+    if not isinstance(data, dict) or "user_id" not in data:
+        raise ValueError("An operation must be an object with a user_id")
+    return data
+
+
+def _send(batches: multiprocessing.Queue, batch: list | None, process) -> None:
+    while True:
+        try:
+            batches.put(batch, timeout=WORKER_CHECK_INTERVAL)
+            return
+        except queue.Full:
+            if process.exitcode is not None:
+                raise WorkerDied("A replay worker died, its operations may be partly applied")
+
+
+def _receive(results: multiprocessing.Queue, processes: list) -> tuple[int, list[ReplayFailure]]:
+    while True:
+        try:
+            return results.get(timeout=WORKER_CHECK_INTERVAL)
+        except queue.Empty:
+            if any(process.exitcode not in (None, 0) for process in processes):
+                raise WorkerDied("A replay worker died, its operations may be partly applied")
+
+
+def replay_operations(lines: Iterable[str], workers: int = 4, batch_size: int = 500) -> ReplayResult:
+    """
+    Replays NDJSON lines (balance or order operations, the shape of the
+    /balance/ and /order/ request bodies) in `workers` forked processes,
+    committing every `batch_size` operations of a worker at once.
+    """
+    started = time.perf_counter()
+    context = multiprocessing.get_context("fork")
+    queues = [context.Queue(QUEUED_BATCHES) for _ in range(workers)]
+    results = context.Queue()
+    # Forked workers must not share the parent's database connections.
+    connections.close_all()
+    processes = [
+        context.Process(target=_replay_worker, args=(batches, results), daemon=True)
+        for batches in queues
+    ]
+    for process in processes:
+        process.start()
+
+    operations, succeeded, failures = 0, 0, []
+    batches = [[] for _ in range(workers)]
+    try:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            operations += 1
+            try:
+                data = _read_operation(line)
+            except ValueError as e:
+                failures.append(ReplayFailure(line=number, operation=None, error=str(e)))
+                continue
+            index = partition(data["user_id"], workers)
+            batches[index].append((number, data))
+            if len(batches[index]) >= batch_size:
+                _send(queues[index], batches[index], processes[index])
+                batches[index] = []
+        for batch, batches_queue, process in zip(batches, queues, processes):
+            if batch:
+                _send(batches_queue, batch, process)
+            _send(batches_queue, None, process)
+
+        for _ in processes:
+            worker_succeeded, worker_failures = _receive(results, processes)
+            succeeded += worker_succeeded
+            failures.extend(worker_failures)
+    finally:
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+    failures.sort(key=lambda failure: failure.line)
+    return ReplayResult(
+        operations=operations, succeeded=succeeded, failures=failures,
+        seconds=time.perf_counter() - started)
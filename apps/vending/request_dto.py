@@ -1,18 +1,58 @@
-from decimal import Decimal
+from datetime import datetime
 from uuid import UUID
 from attr import dataclass
 
-from apps.vending.enums import BalanceTypeOperation
+from apps.vending.enums import BalanceTypeOperation, SalesPeriod
+from apps.vending.money import Money
+
+
+@dataclass
+class LoginDto:
+    name: str
 
 
 @dataclass
 class BalanceOperationDto:
     user_id: UUID
     type_operation: BalanceTypeOperation
-    amount: Decimal | None = None
+    amount: Money | None = None
 
 
 @dataclass
 class OrderOperationDto:
     slot_id: UUID
     user_id: UUID
+
+
+@dataclass
+class OrderLineDto:
+    slot_id: UUID
+    quantity: int = 1
+
+
+@dataclass
+class BatchOrderOperationDto:
+    user_id: UUID
+    lines: list[OrderLineDto]
+
+
+@dataclass
+class PlanogramSlotDto:
+    machine_id: UUID
+    row: int
+    column: int
+    product_id: UUID
+    quantity: int
+
+
+@dataclass
+class PlanogramUploadDto:
+    slots: list[PlanogramSlotDto]
+
+
+@dataclass
+class SalesReportDto:
+    period: SalesPeriod
+    start: datetime
+    end: datetime
+    group_by: str = "product"
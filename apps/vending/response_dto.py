@@ -0,0 +1,66 @@
+from datetime import datetime
+from uuid import UUID
+from attr import dataclass
+
+from apps.vending.enums import SalesPeriod
+from apps.vending.models import User
+from apps.vending.money import Money
+
+
+@dataclass
+class OrderLineResult:
+    slot_id: UUID
+    quantity: int
+    unit_price: Money
+    total_price: Money
+
+
+@dataclass
+class BatchOrderResult:
+    user: User
+    lines: list[OrderLineResult]
+    total_price: Money
+
+
+@dataclass
+class PlanogramUploadResult:
+    created: int
+    updated: int
+
+
+@dataclass
+class SalesReportRow:
+    bucket: datetime
+    slot_id: UUID | None
+    product_id: UUID | None
+    quantity: int
+    orders: int
+    revenue: Money
+
+
+@dataclass
+class SalesReport:
+    period: SalesPeriod
+    start: datetime
+    end: datetime
+    rows: list[SalesReportRow]
+
+
+@dataclass
+class ReplayFailure:
+    line: int
+    # "balance" or "order", None when the line isn't an operation at all.
+    operation: str | None
+    error: str
+
+
+@dataclass
+class ReplayResult:
+    operations: int
+    succeeded: int
+    failures: list[ReplayFailure]
+    seconds: float
+
+    @property
+    def operations_per_second(self) -> float:
+        return self.operations / self.seconds if self.seconds else 0.0
@@ -0,0 +1,52 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState:
+
+    def __init__(self, pinned: bool):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Set by ReplicaRoutingMiddleware for the duration of a request.
+_routing_state: ContextVar[RoutingState | None] = ContextVar("routing_state", default=None)
+
+
+def replica_aliases() -> list[str]:
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary ("default"). Reads go to a random replica, but
+    only inside a request that has not written yet and whose client is not
+    pinned to the primary after a recent write. Reads inside a transaction,
+    such as the ones services make, stay on the primary with the writes.
+    Outside requests (commands, shells) everything uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state is None or state.pinned or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated on their own.
+        return db == DEFAULT_DB_ALIAS
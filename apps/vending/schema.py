@@ -0,0 +1,101 @@
+import functools
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseBase
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+# The OpenAPI schema is generated once and served from memory: read from
+# the files `manage.py build_schema` writes to settings.OPENAPI_SCHEMA_DIR,
+# or, when that is unset, generated by drf-spectacular on the first
+# /schema/ request.
+
+SCHEMA_MEDIA_TYPES = {
+    "yaml": "application/vnd.oai.openapi",
+    "json": "application/vnd.oai.openapi+json",
+}
+
+
+class RenderedSchema:
+
+    def __init__(self, schema_format: str, content: bytes):
+        self.format = schema_format
+        self.content = content
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def schema_path(schema_format: str, directory: str | None = None) -> str:
+    return os.path.join(directory or settings.OPENAPI_SCHEMA_DIR, f"schema.{schema_format}")
+
+
+def generate_schema() -> dict[str, bytes]:
+    """
+    Renders the schema the way drf-spectacular's SpectacularAPIView does,
+    in every format. Imports drf-spectacular, which workers only need here.
+    """
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    schema = spectacular_settings.DEFAULT_GENERATOR_CLASS().get_schema(request=None, public=True)
+    return {
+        "yaml": OpenApiYamlRenderer().render(schema, renderer_context={}),
+        "json": OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def write_schema(directory: str) -> list[str]:
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for schema_format, content in generate_schema().items():
+        path = schema_path(schema_format, directory)
+        with open(path, "wb") as schema_file:
+            schema_file.write(content)
+        paths.append(path)
+    return paths
+
+
+def read_schema() -> dict[str, bytes]:
+    contents = {}
+    for schema_format in SCHEMA_MEDIA_TYPES:
+        try:
+            with open(schema_path(schema_format), "rb") as schema_file:
+                contents[schema_format] = schema_file.read()
+        except FileNotFoundError:
+            raise ImproperlyConfigured(
+                f"No schema built in {settings.OPENAPI_SCHEMA_DIR}, run `manage.py build_schema`")
+    return contents
+
+
+@functools.cache
+def load_schema() -> dict[str, RenderedSchema]:
+    contents = read_schema() if settings.OPENAPI_SCHEMA_DIR else generate_schema()
+    return {
+        schema_format: RenderedSchema(schema_format, content)
+        for schema_format, content in contents.items()
+    }
+
+
+def _requested_format(request: HttpRequest) -> str:
+    # Same negotiation as SpectacularAPIView: ?format=, then Accept, YAML
+    # by default.
+    if schema_format := request.GET.get("format"):
+        if schema_format not in SCHEMA_MEDIA_TYPES:
+            raise Http404("Unknown schema format")
+        return schema_format
+    return "json" if "json" in request.headers.get("Accept", "") else "yaml"
+
+
+def schema_response(request: HttpRequest) -> HttpResponseBase:
+    schema = load_schema()[_requested_format(request)]
+    # Clients revalidate on every use and get a bodiless 304 while the
+    # schema is unchanged.
+    response = get_conditional_response(request, etag=schema.etag)
+    if response is None:
+        response = HttpResponse(schema.content, content_type=SCHEMA_MEDIA_TYPES[schema.format])
+        response["Content-Disposition"] = f'inline; filename="schema.{schema.format}"'
+    response["ETag"] = schema.etag
+    response["Vary"] = "Accept"
+    patch_cache_control(response, no_cache=True)
+    return response
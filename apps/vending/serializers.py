@@ -1,11 +1,58 @@
+from decimal import Decimal
+
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from apps.vending.money import MONEY_MAX_CENTS, Money
+
+
+@extend_schema_field({"type": "string", "format": "decimal", "pattern": r"^-?\d+(?:\.\d{0,2})?$"})
+class MoneyField(serializers.Field):
+    """
+    Money as a "10.40" string, the same JSON the decimal fields it replaced
+    produced. Accepts strings and JSON numbers of currency units with at
+    most two decimal places.
+    """
+
+    default_error_messages = {
+        "invalid": "A valid amount of money is required.",
+        "max_decimal_places": "Ensure that there are no more than 2 decimal places.",
+        "min_value": "Ensure this value is greater than or equal to {min_value}.",
+        "max_value": "Ensure this value is less than or equal to {max_value}.",
+    }
+
+    def __init__(self, *, min_value: Money | None = None, max_value: Money = Money(MONEY_MAX_CENTS), **kwargs):
+        self.min_value = min_value
+        self.max_value = max_value
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data) -> Money:
+        if isinstance(data, bool) or not isinstance(data, (str, int, float, Decimal)):
+            self.fail("invalid")
+        try:
+            # str() keeps JSON numbers in units: 5 is 5.00, not 5 cents.
+            units = Decimal(str(data).strip())
+        except ArithmeticError:
+            self.fail("invalid")
+        try:
+            amount = Money(units)
+        except ValueError:
+            self.fail("max_decimal_places" if units.is_finite() else "invalid")
+        if self.min_value is not None and amount < self.min_value:
+            self.fail("min_value", min_value=self.min_value)
+        if amount > self.max_value:
+            self.fail("max_value", max_value=self.max_value)
+        return amount
+
+    def to_representation(self, value) -> str:
+        return str(value if isinstance(value, Money) else Money(value))
+
 
 class ProductSerializer(serializers.Serializer):
     id = serializers.UUIDField()
     name = serializers.CharField()
     description = serializers.CharField()
-    price = serializers.DecimalField(max_digits=4, decimal_places=2)
+    price = MoneyField()
 
 
 class VendingMachineSlotSerializer(serializers.Serializer):
@@ -16,8 +63,46 @@ class VendingMachineSlotSerializer(serializers.Serializer):
     product = ProductSerializer()
 
 
+class PlanogramProductSerializer(ProductSerializer):
+    quantity = serializers.IntegerField()
+    slot_id = serializers.UUIDField()
+
+
 class UserSerializer(serializers.Serializer):
     id = serializers.UUIDField()
     name = serializers.CharField()
-    balance = serializers.DecimalField(
-        max_digits=4, decimal_places=2, default=0.00)
+    balance = MoneyField(default=Money(0))
+
+
+class OrderLineSerializer(serializers.Serializer):
+    slot_id = serializers.UUIDField()
+    quantity = serializers.IntegerField()
+    unit_price = MoneyField()
+    total_price = MoneyField()
+
+
+class BatchOrderSerializer(serializers.Serializer):
+    user = UserSerializer()
+    lines = OrderLineSerializer(many=True)
+    total_price = MoneyField()
+
+
+class PlanogramUploadSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    updated = serializers.IntegerField()
+
+
+class SalesReportRowSerializer(serializers.Serializer):
+    bucket = serializers.DateTimeField()
+    slot_id = serializers.UUIDField(allow_null=True)
+    product_id = serializers.UUIDField(allow_null=True)
+    quantity = serializers.IntegerField()
+    orders = serializers.IntegerField()
+    revenue = MoneyField()
+
+
+class SalesReportSerializer(serializers.Serializer):
+    period = serializers.CharField(source="period.value")
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    rows = SalesReportRowSerializer(many=True)
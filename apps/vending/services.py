@@ -1,55 +1,371 @@
-from decimal import Decimal
-from apps.vending.exceptions import OrderError, UserNotFound, VendingMachineSlotNotFound
-from apps.vending.models import User, VendingMachineSlot
+from contextlib import contextmanager
+from datetime import datetime
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from apps.vending.enums import SalesPeriod
+from apps.vending.events import inventory_publisher
+from apps.vending.exceptions import MachineNotFound, OrderError, ProductNotFound, UserNotFound, VendingMachineSlotNotFound
+from apps.vending.inventory import inventory_engine
+from apps.vending.money import Money
+from apps.vending.models import BalanceLedgerEntry, BalanceSnapshot, Machine, OrderEvent, Product, SalesRollup, User, VendingMachineSlot
+from apps.vending.planogram import bump_inventory_version
+from apps.vending.request_dto import BatchOrderOperationDto, LoginDto, PlanogramUploadDto, SalesReportDto
+from apps.vending.response_dto import BatchOrderResult, OrderLineResult, PlanogramUploadResult, SalesReport, SalesReportRow
+from apps.vending.transactions import write_transaction
 from apps.vending.validators import BalanceOperationDto, BalanceTypeOperation, BalanceViewValidator, OrderOperationDto
 
 
+UPDATE_BALANCE_SQL = """
+    UPDATE "user" SET "balance" = "balance" + %s WHERE "id" = %s
+"""
+
+NO_OVERDRAFT_SQL = """ AND "balance" + %s >= 0"""
+
+UPSERT_SALES_ROLLUP_SQL = """
+    INSERT INTO "sales_rollup" ("id", "period", "bucket", "slot_id", "product_id", "quantity", "orders", "revenue")
+    VALUES {values}
+    ON CONFLICT ("period", "bucket", "slot_id", "product_id") DO UPDATE SET
+        "quantity" = "sales_rollup"."quantity" + excluded."quantity",
+        "orders" = "sales_rollup"."orders" + excluded."orders",
+        "revenue" = "sales_rollup"."revenue" + excluded."revenue"
+"""
+
+
+@contextmanager
+def _order_transaction():
+    """
+    write_transaction() for orders. With the inventory engine, stock taken
+    from its counters is put back if the transaction fails.
+    """
+    if not settings.INVENTORY_ENGINE:
+        with write_transaction():
+            yield
+        return
+    with inventory_engine.reserving(), write_transaction():
+        yield
+
+
+def _take_products(slot_id: UUID, quantity: int = 1) -> None:
+    if settings.INVENTORY_ENGINE:
+        inventory_engine.take(slot_id, quantity)
+        return
+    taken = VendingMachineSlot.objects.filter(
+        id=slot_id, quantity__gte=quantity).update(quantity=F("quantity") - quantity)
+    if taken:
+        return
+    if not VendingMachineSlot.objects.filter(id=slot_id).exists():
+        raise VendingMachineSlotNotFound(
+            f"Slot not found with ID {slot_id}")
+    raise OrderError("Not enough product quantity")
+
+
+def _can_return_from_update() -> bool:
+    # Django only flags INSERT ... RETURNING, and MariaDB has that without
+    # UPDATE ... RETURNING. PostgreSQL has both, SQLite both since 3.35,
+    # the version its INSERT flag checks.
+    if connection.vendor == "postgresql":
+        return True
+    return connection.vendor == "sqlite" and connection.features.can_return_columns_from_insert
+
+
+def _change_balance(user_id: UUID, amount: int, type_operation: BalanceTypeOperation,
+                    allow_overdraft: bool = True) -> User | None:
+    """
+    Adds a signed amount of cents to the user's running balance and
+    appends the matching ledger entry. Returns None when the user does not
+    exist or, without overdraft, when the balance is not enough.
+    """
+    user_param = User._meta.pk.get_db_prep_value(user_id, connection)
+    sql, params = UPDATE_BALANCE_SQL, [int(amount), user_param]
+    if not allow_overdraft:
+        sql, params = sql + NO_OVERDRAFT_SQL, params + [int(amount)]
+
+    # RETURNING hands back the user as written, without reading it again.
+    if _can_return_from_update():
+        changed = list(User.objects.raw(
+            f'{sql} RETURNING "id", "name", "balance"', params))
+        user = changed[0] if changed else None
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            changed = cursor.rowcount
+        # The row is locked by this transaction, so the read is consistent.
+        user = User.objects.get(id=user_id) if changed else None
+
+    if user is not None:
+        BalanceLedgerEntry.objects.create(
+            user_id=user.id, type_operation=type_operation.value, amount=amount)
+    return user
+
+
+def _charge_user(user_id: UUID, amount: int) -> User:
+    user = _change_balance(
+        user_id, -amount, BalanceTypeOperation.ORDER_PRODUCT, allow_overdraft=False)
+    if user is not None:
+        return user
+    if not User.objects.filter(id=user_id).exists():
+        raise UserNotFound(f"User not found with ID {user_id}")
+    raise OrderError("Not enough balance")
+
+
+def sales_buckets(at: datetime) -> dict[SalesPeriod, datetime]:
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    return {SalesPeriod.HOUR: hour, SalesPeriod.DAY: hour.replace(hour=0)}
+
+
+def _rollup_param(field: str, value):
+    return SalesRollup._meta.get_field(field).get_db_prep_value(value, connection)
+
+
+def _record_sales(user_id: UUID, lines: list[OrderLineResult], product_ids: dict[UUID, UUID]) -> None:
+    """
+    Appends one order event per line and adds the lines to their hour and
+    day rollups with a single upsert, inside the order's transaction.
+    """
+    now = timezone.now()
+    order_id = uuid4()
+    OrderEvent.objects.bulk_create([
+        OrderEvent(
+            order_id=order_id, user_id=user_id, slot_id=line.slot_id,
+            product_id=product_ids[line.slot_id], quantity=line.quantity,
+            unit_price=line.unit_price, total_price=line.total_price, created_at=now)
+        for line in lines
+    ])
+    values, params = [], []
+    for period, bucket in sales_buckets(now).items():
+        for line in lines:
+            values.append("(%s, %s, %s, %s, %s, %s, 1, %s)")
+            params += [
+                _rollup_param("id", uuid4()), period.value, _rollup_param("bucket", bucket),
+                _rollup_param("slot", line.slot_id), _rollup_param("product", product_ids[line.slot_id]),
+                line.quantity, int(line.total_price),
+            ]
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_SALES_ROLLUP_SQL.format(values=", ".join(values)), params)
+
+
+class LoginService:
+
+    def execute(self, dto: LoginDto) -> tuple[User, bool]:
+        # normalized_name is unique, so a repeat login is one indexed read.
+        # It is a plain read rather than get_or_create, which routes as a
+        # write and would pin the client to the primary on every login.
+        normalized_name = User.normalize_name(dto.name)
+        user = User.objects.filter(normalized_name=normalized_name).first()
+        if user is not None:
+            return user, False
+        # Concurrent logins of a new name end up with one user: the losing
+        # insert falls back to a get.
+        return User.objects.get_or_create(normalized_name=normalized_name, defaults={"name": dto.name})
+
+
 class BalanceOperatorService:
 
     def execute(self, dto: BalanceOperationDto) -> User:
-        try:
-            user = User.objects.get(id=dto.user_id)
-        except User.DoesNotExist:
-            raise UserNotFound(f"User not found with ID {dto.user_id}")
+        if dto.type_operation != BalanceTypeOperation.REFUND and dto.amount < 0:
+            raise ValueError("Amount cannot be a negative number")
 
-        if dto.type_operation == BalanceTypeOperation.REFUND:
-            user.balance = Decimal("0.00")
-        else:
-            if dto.amount < Decimal("0.00"):
-                raise ValueError("Amount cannot be a negative number")
-            if dto.type_operation == BalanceTypeOperation.ORDER_PRODUCT:
-                user.balance -= dto.amount
+        with write_transaction():
+            if dto.type_operation == BalanceTypeOperation.REFUND:
+                balance = User.objects.select_for_update().filter(
+                    id=dto.user_id).values_list("balance", flat=True).first()
+                amount = -balance if balance is not None else 0
+            elif dto.type_operation == BalanceTypeOperation.ORDER_PRODUCT:
+                amount = -dto.amount
             else:
-                user.balance += dto.amount
-        user.save()
+                amount = dto.amount
+            user = _change_balance(dto.user_id, amount, dto.type_operation)
+
+        if user is None:
+            raise UserNotFound(f"User not found with ID {dto.user_id}")
         return user
 
 
 class OrderOperatorService:
 
     def execute(self, dto: OrderOperationDto) -> User:
-        try:
-            user = User.objects.get(id=dto.user_id)
-        except User.DoesNotExist:
-            raise UserNotFound(f"User not found with ID {dto.user_id}")
-        try:
-            slot = VendingMachineSlot.objects.get(id=dto.slot_id)
-        except VendingMachineSlot.DoesNotExist:
-            raise VendingMachineSlotNotFound(
-                f"Slot not found with ID {dto.slot_id}")
-
-        if user.balance < slot.product.price:
-            raise OrderError("Not enough balance")
-        if slot.quantity == 0:
-            raise OrderError("Not enough product quantity")
-
-        balance_service = BalanceOperatorService()
-        dto = BalanceOperationDto(
-            user_id=user.id,
-            type_operation=BalanceTypeOperation.ORDER_PRODUCT,
-            amount=slot.product.price
-        )
-        user = balance_service.execute(dto)
-        slot.quantity -= 1
-        slot.save()
+        # Conditional UPDATEs in one transaction: concurrent orders can't
+        # oversell the slot or overdraw the balance.
+        with _order_transaction():
+            _take_products(dto.slot_id)
+            product_id, price = VendingMachineSlot.objects.filter(
+                id=dto.slot_id).values_list("product_id", "product__price").get()
+            user = _charge_user(dto.user_id, price)
+            slot_id = VendingMachineSlot._meta.pk.to_python(dto.slot_id)
+            _record_sales(user.id, [OrderLineResult(
+                slot_id=slot_id, quantity=1, unit_price=price, total_price=price,
+            )], {slot_id: product_id})
+            # Bulk UPDATEs skip model signals, so invalidate by hand.
+            transaction.on_commit(bump_inventory_version)
+            transaction.on_commit(lambda: inventory_publisher.publish_slots([slot_id]))
         return user
+
+
+class BatchOrderOperatorService:
+
+    def execute(self, dto: BatchOrderOperationDto) -> BatchOrderResult:
+        quantities = {}
+        for line in dto.lines:
+            slot_id = VendingMachineSlot._meta.pk.to_python(line.slot_id)
+            quantities[slot_id] = quantities.get(slot_id, 0) + line.quantity
+        with _order_transaction():
+            # Sorted so concurrent baskets lock shared slots in the same order.
+            for slot_id in sorted(quantities):
+                try:
+                    _take_products(slot_id, quantities[slot_id])
+                except OrderError:
+                    raise OrderError(
+                        f"Not enough product quantity in slot {slot_id}")
+            products = {
+                slot_id: (product_id, price)
+                for slot_id, product_id, price in VendingMachineSlot.objects.filter(
+                    id__in=quantities).values_list("id", "product_id", "product__price")
+            }
+            prices = {slot_id: price for slot_id, (_, price) in products.items()}
+            lines = [
+                OrderLineResult(
+                    slot_id=slot_id,
+                    quantity=quantity,
+                    unit_price=prices[slot_id],
+                    total_price=Money(prices[slot_id] * quantity),
+                )
+                for slot_id, quantity in quantities.items()
+            ]
+            total_price = Money(sum(line.total_price for line in lines))
+            user = _charge_user(dto.user_id, total_price)
+            _record_sales(user.id, lines, {
+                slot_id: product_id for slot_id, (product_id, _) in products.items()})
+            transaction.on_commit(bump_inventory_version)
+            transaction.on_commit(lambda: inventory_publisher.publish_slots(quantities))
+        return BatchOrderResult(user=user, lines=lines, total_price=total_price)
+
+
+class SalesReportService:
+    """
+    Reads sales from the rollups: one row per bucket and product (or slot)
+    in the window, however many orders it had.
+    """
+
+    def execute(self, dto: SalesReportDto) -> SalesReport:
+        key = f"{dto.group_by}_id"
+        rows = SalesRollup.objects.filter(
+            period=dto.period.value, bucket__gte=dto.start, bucket__lt=dto.end,
+        ).values("bucket", key).annotate(
+            total_quantity=Sum("quantity"), total_orders=Sum("orders"), total_revenue=Sum("revenue"),
+        ).order_by("bucket", key)
+        return SalesReport(
+            period=dto.period,
+            start=dto.start,
+            end=dto.end,
+            rows=[
+                SalesReportRow(
+                    bucket=row["bucket"],
+                    slot_id=row.get("slot_id"),
+                    product_id=row.get("product_id"),
+                    quantity=row["total_quantity"],
+                    orders=row["total_orders"],
+                    revenue=row["total_revenue"],
+                )
+                for row in rows
+            ],
+        )
+
+
+def _missing_ids(model, ids: set[UUID]) -> list[UUID]:
+    found = set(model.objects.filter(id__in=ids).values_list("id", flat=True))
+    return sorted(ids - found, key=str)
+
+
+def _planogram_uploaded(slots: list[VendingMachineSlot]) -> None:
+    bump_inventory_version()
+    for slot in slots:
+        inventory_engine.reset(slot.id, slot.quantity)
+    inventory_publisher.publish_slots([slot.id for slot in slots])
+
+
+class PlanogramUploadService:
+    """
+    Applies a planogram upload in one transaction: uploaded positions that
+    already have a slot get the new product and quantity, the rest are
+    created. Slots missing from the upload are left as they are.
+    """
+
+    def execute(self, dto: PlanogramUploadDto) -> PlanogramUploadResult:
+        machine_ids = {slot.machine_id for slot in dto.slots}
+        product_ids = {slot.product_id for slot in dto.slots}
+        with write_transaction():
+            if missing := _missing_ids(Machine, machine_ids):
+                raise MachineNotFound(f"Machines not found: {', '.join(map(str, missing))}")
+            if missing := _missing_ids(Product, product_ids):
+                raise ProductNotFound(f"Products not found: {', '.join(map(str, missing))}")
+
+            existing = {
+                (slot.machine_id, slot.row, slot.column): slot
+                for slot in VendingMachineSlot.objects.filter(
+                    machine_id__in=machine_ids).only("id", "machine_id", "row", "column")
+            }
+            created, updated = [], []
+            for line in dto.slots:
+                slot = existing.get((line.machine_id, line.row, line.column))
+                if slot is None:
+                    created.append(VendingMachineSlot(
+                        machine_id=line.machine_id, row=line.row, column=line.column,
+                        product_id=line.product_id, quantity=line.quantity))
+                else:
+                    slot.product_id, slot.quantity = line.product_id, line.quantity
+                    updated.append(slot)
+            VendingMachineSlot.objects.bulk_create(created)
+            VendingMachineSlot.objects.bulk_update(updated, ["product", "quantity"])
+            # Bulk writes skip model signals: invalidate once for the upload.
+            transaction.on_commit(lambda: _planogram_uploaded(created + updated))
+        return PlanogramUploadResult(created=len(created), updated=len(updated))
+
+
+class LedgerCompactionService:
+    """
+    Folds ledger entries older than a cutoff into one new snapshot per user,
+    so the ledger only keeps recent history. A user's balance always equals
+    their latest snapshot plus the ledger entries recorded after it.
+    """
+
+    def execute(self, cutoff: datetime) -> int:
+        with write_transaction():
+            old_entries = BalanceLedgerEntry.objects.filter(created_at__lt=cutoff)
+            folded = list(old_entries.values("user_id").annotate(
+                amount=Sum("amount"), entries_count=Count("id")))
+            previous = _latest_snapshot_balances(
+                [row["user_id"] for row in folded])
+            BalanceSnapshot.objects.bulk_create([
+                BalanceSnapshot(
+                    user_id=row["user_id"],
+                    balance=previous.get(row["user_id"], 0) + row["amount"],
+                    entries_count=row["entries_count"],
+                    taken_at=cutoff,
+                )
+                for row in folded
+            ])
+            old_entries.delete()
+        return sum(row["entries_count"] for row in folded)
+
+
+def _latest_snapshot_balances(user_ids: list[UUID]) -> dict[UUID, Money]:
+    latest = BalanceSnapshot.objects.filter(
+        user_id=OuterRef("user_id")).order_by("-taken_at")
+    return dict(BalanceSnapshot.objects.filter(
+        user_id__in=user_ids, id=Subquery(latest.values("id")[:1]),
+    ).values_list("user_id", "balance"))
+
+
+def get_ledger_balance(user_id: UUID) -> Money:
+    snapshot = BalanceSnapshot.objects.filter(
+        user_id=user_id).order_by("-taken_at").first()
+    entries = BalanceLedgerEntry.objects.filter(user_id=user_id)
+    if snapshot is not None:
+        entries = entries.filter(created_at__gte=snapshot.taken_at)
+    balance = snapshot.balance if snapshot is not None else 0
+    return Money(balance + (entries.aggregate(total=Sum("amount"))["total"] or 0))
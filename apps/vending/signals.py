@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.vending.events import inventory_publisher
+from apps.vending.inventory import inventory_engine
+from apps.vending.models import Product, VendingMachineSlot
+from apps.vending.planogram import bump_inventory_version
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=VendingMachineSlot)
+@receiver(post_delete, sender=VendingMachineSlot)
+def invalidate_planogram(sender, **kwargs):
+    transaction.on_commit(bump_inventory_version)
+
+
+@receiver(post_save, sender=VendingMachineSlot)
+def reset_inventory(sender, instance, **kwargs):
+    # A saved slot (e.g. restocked from the admin) replaces its live counter.
+    transaction.on_commit(lambda: inventory_engine.reset(instance.id, instance.quantity))
+
+
+@receiver(post_save, sender=VendingMachineSlot)
+def publish_slot(sender, instance, **kwargs):
+    transaction.on_commit(lambda: inventory_publisher.publish_slots([instance.id]))
+
+
+@receiver(post_save, sender=Product)
+def publish_product(sender, instance, **kwargs):
+    transaction.on_commit(lambda: inventory_publisher.publish_products([instance.id]))
+
+
+@receiver(post_delete, sender=VendingMachineSlot)
+def forget_inventory(sender, instance, **kwargs):
+    transaction.on_commit(lambda: inventory_engine.forget(instance.id))
@@ -0,0 +1,47 @@
+from itertools import islice
+from typing import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import QuerySet
+from django.http import HttpRequest, StreamingHttpResponse
+
+# Streams listings as the database returns them: rows are read with
+# iterator() in chunks of settings.STREAMING_CHUNK_SIZE and each
+# chunk is encoded and sent before the next one is fetched, so memory stays
+# flat however many slots there are and the first bytes leave early.
+
+
+def stream(rows: QuerySet, encoder, chunk_size: int) -> Iterator[bytes]:
+    rows = rows.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield encoder.encode(chunk)
+    yield encoder.close()
+
+
+async def astream(rows: QuerySet, encoder, chunk_size: int) -> AsyncIterator[bytes]:
+    # values_list().aiterator() runs its query on the event loop in Django
+    # 4.2, so each chunk is read and encoded from a sync iterator in a thread.
+    rows = rows.iterator(chunk_size=chunk_size)
+
+    def next_chunk() -> bytes:
+        return encoder.encode(list(islice(rows, chunk_size)))
+
+    while chunk := await sync_to_async(next_chunk)():
+        yield chunk
+    yield encoder.close()
+
+
+def streaming_response(request: HttpRequest, rows: QuerySet, encoder) -> StreamingHttpResponse:
+    chunk_size = settings.STREAMING_CHUNK_SIZE
+    # The body is read after the view returns: pick the database now, while
+    # the request's routing state is still in place.
+    rows = rows.using(rows.db)
+    # ASGI servers need an async iterator and WSGI servers a plain one;
+    # Django buffers the whole response to convert between the two.
+    if isinstance(request, ASGIRequest):
+        content = astream(rows, encoder, chunk_size)
+    else:
+        content = stream(rows, encoder, chunk_size)
+    return StreamingHttpResponse(content, content_type="application/json")
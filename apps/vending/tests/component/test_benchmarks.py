@@ -0,0 +1,94 @@
+from dataclasses import replace
+
+import pytest
+from rest_framework import status
+
+from apps.vending.benchmarks import CASES, BenchmarkResult, find_regressions, measure_startup, run_benchmarks, seed_dataset
+from apps.vending.benchmarks.cases import STOCK
+from apps.vending.benchmarks.startup import parse_importtime
+
+
+def benchmark_result(name: str, p50_ms: float, queries: int) -> BenchmarkResult:
+    return BenchmarkResult(name=name, iterations=10, p50_ms=p50_ms, p95_ms=p50_ms,
+                           p99_ms=p50_ms, throughput=1000 / p50_ms, queries=queries)
+
+
+@pytest.mark.django_db
+class TestBenchmarks:
+
+    def test_every_case_runs_against_a_seeded_dataset(self):
+        dataset = seed_dataset(users=3, slots=5, machines=2)
+
+        results = run_benchmarks(CASES, dataset, iterations=2)
+
+        assert [result.name for result in results] == list(CASES)
+        assert all(result.p50_ms <= result.p95_ms <= result.p99_ms for result in results)
+        assert all(result.throughput > 0 for result in results)
+
+    @pytest.mark.parametrize("name", ["service:order", "service:batch_order", "http:order", "http:batch_order"])
+    def test_order_cases_have_stock_and_balance_for_every_call(self, name, settings):
+        # As in the benchmark command, which turns rate limiting off.
+        settings.RATE_LIMITS = {}
+        dataset = replace(seed_dataset(users=1, slots=2), iterations=STOCK + 50)
+        operation = CASES[name](dataset)
+
+        # one warm-up call plus the timed ones
+        responses = [operation() for _ in range(dataset.iterations + 1)]
+
+        if name.startswith("http:"):
+            assert {response.status_code for response in responses} == {status.HTTP_200_OK}
+
+    @pytest.mark.parametrize("name", ["http:slots:bulk", "http:sales_report", "http:products:events"])
+    def test_staff_and_stream_cases_succeed(self, name):
+        operation = CASES[name](seed_dataset(users=1, slots=2))
+
+        result = operation()
+
+        if name == "http:products:events":
+            assert result.startswith(b"retry:")
+        else:
+            assert result.status_code == status.HTTP_200_OK
+
+
+class TestFindRegressions:
+
+    def test_flags_slower_p50_and_extra_queries(self):
+        baseline = {"results": {
+            "http:slots": {"p50_ms": 1.0, "queries": 1},
+            "http:order": {"p50_ms": 2.0, "queries": 5},
+        }}
+        results = [
+            benchmark_result("http:slots", p50_ms=1.5, queries=1),
+            benchmark_result("http:order", p50_ms=2.1, queries=6),
+            benchmark_result("http:new", p50_ms=9.0, queries=9),
+        ]
+
+        regressions = find_regressions(results, baseline, threshold=0.2)
+
+        assert regressions == [
+            "http:slots: p50 1.000ms -> 1.500ms",
+            "http:order: queries 5 -> 6",
+        ]
+
+
+class TestStartup:
+
+    def test_parses_importtime_levels(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |     django.utils\n"
+            "import time:       200 |       1500 |   django.conf\n"
+            "import time:       300 |       2000 | django.core.wsgi\n"
+        )
+
+        assert parse_importtime(output) == [
+            ("django.utils", 2, 0.1), ("django.conf", 1, 1.5), ("django.core.wsgi", 0, 2.0)]
+
+    def test_api_profile_boots_without_admin_apps(self):
+        full = measure_startup("vending_machine.settings", requests=5)
+        api = measure_startup("vending_machine.settings_api", requests=5)
+
+        assert full.status == api.status == 200
+        assert api.modules < full.modules
+        assert {"django.contrib.sessions.middleware", "drf_spectacular.openapi"} <= full.imported - api.imported
+        assert api.import_ms > 0 and api.slowest_imports
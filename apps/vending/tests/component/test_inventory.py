@@ -0,0 +1,257 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection
+
+from apps.vending.exceptions import OrderError, VendingMachineSlotNotFound
+from apps.vending.inventory import inventory_engine
+from apps.vending.models import User, VendingMachineSlot
+from apps.vending.money import Money
+from apps.vending.request_dto import BatchOrderOperationDto, OrderLineDto, OrderOperationDto, PlanogramSlotDto, PlanogramUploadDto
+from apps.vending.services import BatchOrderOperatorService, OrderOperatorService, PlanogramUploadService
+from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
+
+
+@pytest.fixture
+def engine(settings):
+    # Flushed by hand: a flusher thread would not see the test transaction.
+    settings.INVENTORY_ENGINE = True
+    settings.INVENTORY_FLUSH_INTERVAL = None
+    return inventory_engine
+
+
+@pytest.fixture
+def fast_thread_switching():
+    # Switches threads as often as possible, so races show up in a few runs.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def persisted_quantity(slot: VendingMachineSlot) -> int:
+    return VendingMachineSlot.objects.get(id=slot.id).quantity
+
+
+@pytest.mark.django_db
+class TestInventoryEngine:
+
+    def test_takes_stock_in_memory_and_flushes_it_in_one_batch(self, engine, django_assert_num_queries):
+        slots = [VendingMachineSlotFactory(quantity=5, row=1, column=column) for column in range(1, 4)]
+        engine.load()
+
+        with django_assert_num_queries(0):
+            for slot in slots:
+                engine.take(slot.id, 2)
+
+        assert [persisted_quantity(slot) for slot in slots] == [5, 5, 5]
+        assert engine.flush() == 3
+        assert [persisted_quantity(slot) for slot in slots] == [3, 3, 3]
+        assert engine.flush() == 0
+
+    def test_rejects_orders_beyond_the_stock(self, engine):
+        slot = VendingMachineSlotFactory(quantity=1)
+
+        engine.take(slot.id)
+
+        with pytest.raises(OrderError):
+            engine.take(slot.id)
+        assert engine.quantity(slot.id) == 0
+
+    def test_unknown_slot_is_not_found(self, engine):
+        with pytest.raises(VendingMachineSlotNotFound):
+            engine.take(VendingMachineSlot._meta.pk.default())
+
+    def test_slots_created_after_the_load_are_fetched_once(self, engine, django_assert_num_queries):
+        engine.load()
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        with django_assert_num_queries(1):
+            engine.take(slot.id)
+            engine.take(slot.id)
+
+        assert engine.quantity(slot.id) == 3
+
+    def test_load_rebuilds_counters_from_the_database(self, engine):
+        slot = VendingMachineSlotFactory(quantity=5)
+        engine.take(slot.id)
+        engine.flush()
+        engine.take(slot.id)
+
+        engine.clear()
+        engine.load()
+
+        assert engine.quantity(slot.id) == 4
+
+    def test_saved_slots_replace_their_counter(self, engine, django_capture_on_commit_callbacks):
+        slot = VendingMachineSlotFactory(quantity=5)
+        engine.take(slot.id)
+
+        slot.quantity = 50
+        with django_capture_on_commit_callbacks(execute=True):
+            slot.save()
+
+        assert engine.quantity(slot.id) == 50
+        assert engine.flush() == 0
+
+    def test_concurrent_takes_never_oversell(self, engine):
+        slot = VendingMachineSlotFactory(quantity=100)
+        engine.load()
+
+        def take(_):
+            try:
+                return engine.take(slot.id)
+            except OrderError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(take, range(500)))
+
+        assert sum(result is not None for result in results) == 100
+        assert engine.quantity(slot.id) == 0
+
+
+@pytest.mark.django_db
+class TestServicesWithInventoryEngine:
+
+    def test_order_takes_stock_without_writing_the_slot(self, engine):
+        user = UserFactory(balance=Money("20.00"))
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        user = OrderOperatorService().execute(OrderOperationDto(user_id=user.id, slot_id=slot.id))
+
+        assert user.balance == Money("9.60")
+        assert engine.quantity(slot.id) == 4
+        assert persisted_quantity(slot) == 5
+        engine.flush()
+        assert persisted_quantity(slot) == 4
+
+    def test_failed_charge_puts_the_stock_back(self, engine):
+        user = UserFactory(balance=Money("1.00"))
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        with pytest.raises(OrderError, match="Not enough balance"):
+            OrderOperatorService().execute(OrderOperationDto(user_id=user.id, slot_id=slot.id))
+
+        assert engine.quantity(slot.id) == 5
+
+    def test_failed_batch_puts_back_every_slot(self, engine):
+        user = UserFactory(balance=Money("50.00"))
+        full = VendingMachineSlotFactory(quantity=5, row=1)
+        short = VendingMachineSlotFactory(quantity=1, row=2)
+
+        with pytest.raises(OrderError):
+            BatchOrderOperatorService().execute(BatchOrderOperationDto(user_id=user.id, lines=[
+                OrderLineDto(slot_id=full.id, quantity=2), OrderLineDto(slot_id=short.id, quantity=2)]))
+
+        assert engine.quantity(full.id) == 5
+        assert engine.quantity(short.id) == 1
+        assert User.objects.get(id=user.id).balance == Money("50.00")
+
+    def test_planogram_upload_restocks_the_counters(self, engine, django_capture_on_commit_callbacks):
+        slot = VendingMachineSlot.objects.get(id=VendingMachineSlotFactory(quantity=5).id)
+        engine.take(slot.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            PlanogramUploadService().execute(PlanogramUploadDto(slots=[PlanogramSlotDto(
+                machine_id=slot.machine_id, row=slot.row, column=slot.column,
+                product_id=slot.product_id, quantity=20)]))
+
+        assert engine.quantity(slot.id) == 20
+        assert engine.flush() == 0
+
+    def test_listings_show_live_quantities(self, engine, client):
+        user = UserFactory(balance=Money("20.00"))
+        slot = VendingMachineSlotFactory(quantity=5)
+        OrderOperatorService().execute(OrderOperationDto(user_id=user.id, slot_id=slot.id))
+
+        assert client.get("/slots/").json()[0]["quantity"] == 4
+        assert client.get(f"/slots/{slot.id}").json()["quantity"] == 4
+        assert client.get("/products/").json()[0][0]["quantity"] == 4
+        streamed = b"".join(client.get("/slots/?stream=true").streaming_content)
+        assert b'"quantity":4' in streamed
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWriteBehind:
+
+    def test_flusher_thread_writes_takes_behind(self, settings):
+        settings.INVENTORY_ENGINE = True
+        settings.INVENTORY_FLUSH_INTERVAL = 0.01
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        try:
+            inventory_engine.take(slot.id)
+            deadline = time.monotonic() + 5
+            while persisted_quantity(slot) != 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert persisted_quantity(slot) == 4
+        finally:
+            inventory_engine.stop()
+
+    def test_concurrent_takes_and_flushes_write_back_every_take(self, engine, fast_thread_switching):
+        slots = [VendingMachineSlotFactory(quantity=1000, row=1, column=column) for column in range(1, 6)]
+        engine.load()
+        taking = threading.Event()
+        taking.set()
+
+        def take(worker):
+            for index in range(200):
+                engine.take(slots[(worker + index) % len(slots)].id)
+
+        def flush_while_taking():
+            try:
+                while taking.is_set():
+                    engine.flush()
+            finally:
+                connection.close()
+
+        flusher = threading.Thread(target=flush_while_taking)
+        flusher.start()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(take, range(8)))
+        taking.clear()
+        flusher.join()
+        engine.flush()
+
+        assert sum(persisted_quantity(slot) for slot in slots) == 5 * 1000 - 8 * 200
+
+    def test_take_racing_a_flush_is_written_back(self, engine):
+        slot = VendingMachineSlotFactory(quantity=5)
+        engine.load()
+
+        def flush():
+            try:
+                engine.flush()
+            finally:
+                connection.close()
+
+        class FlushingSet(set):
+            # A flush starts while the take is marking its slot dirty.
+            def add(self, slot_id):
+                flusher = threading.Thread(target=flush)
+                flusher.start()
+                flusher.join(timeout=0.2)
+                super().add(slot_id)
+                flushers.append(flusher)
+
+        flushers = []
+        engine._dirty = FlushingSet()
+        engine.take(slot.id)
+        flushers[0].join()
+        engine.flush()
+
+        assert persisted_quantity(slot) == 4
+
+    def test_stopping_flushes_pending_takes(self, settings):
+        settings.INVENTORY_ENGINE = True
+        settings.INVENTORY_FLUSH_INTERVAL = 60
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        inventory_engine.take(slot.id)
+        inventory_engine.stop()
+
+        assert persisted_quantity(slot) == 4
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+import pytest
+from django.db.models import Sum
+
+from apps.vending.models import BalanceLedgerEntry
+from apps.vending.money import Money, format_cents
+from apps.vending.serializers import MoneyField
+from apps.vending.tests.factories import UserFactory
+
+
+class TestMoney:
+
+    @pytest.mark.parametrize("value", [1040, "10.40", "10.4", Decimal("10.40"), Money(1040)])
+    def test_ints_are_cents_and_strings_and_decimals_are_units(self, value):
+        assert Money(value) == 1040
+
+    @pytest.mark.parametrize("value,expected_error", [
+        (10.4, TypeError),
+        ("10.405", ValueError),
+        ("ten", ValueError),
+        ("NaN", ValueError),
+    ])
+    def test_rejects_floats_and_fractions_of_a_cent(self, value, expected_error):
+        with pytest.raises(expected_error):
+            Money(value)
+
+    @pytest.mark.parametrize("cents,expected", [(0, "0.00"), (5, "0.05"), (1040, "10.40"), (-1040, "-10.40")])
+    def test_formats_cents_as_units(self, cents, expected):
+        assert format_cents(cents) == str(Money(cents)) == expected
+
+    def test_arithmetic_stays_in_cents(self):
+        total = Money("0.10") * 3 + Money("0.05")
+
+        assert total == 35
+        assert Money(total).to_decimal() == Decimal("0.35")
+
+
+class TestMoneyField:
+
+    @pytest.mark.parametrize("data", ["10.40", "10.4", 10.4, Decimal("10.40")])
+    def test_reads_currency_units(self, data):
+        assert MoneyField().run_validation(data) == Money(1040)
+
+    def test_renders_the_decimal_string_format(self):
+        assert MoneyField().to_representation(Money(5)) == "0.05"
+
+
+@pytest.mark.django_db
+class TestMoneyColumns:
+
+    def test_values_and_aggregates_come_back_as_money(self):
+        user = UserFactory(balance=Decimal("12.34"))
+        BalanceLedgerEntry.objects.bulk_create([
+            BalanceLedgerEntry(user=user, type_operation="add", amount=Money("0.10")) for _ in range(3)])
+
+        user.refresh_from_db()
+        total = BalanceLedgerEntry.objects.aggregate(total=Sum("amount"))["total"]
+
+        assert user.balance == Money(1234) and isinstance(user.balance, Money)
+        assert total == Money("0.30") and isinstance(total, Money)
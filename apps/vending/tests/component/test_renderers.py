@@ -0,0 +1,96 @@
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from apps.vending.models import VendingMachineSlot
+from apps.vending.money import Money
+from apps.vending.renderers import (
+    ProductGridEncoder, SlotsEncoder, render_product_grid, render_slot, render_slots, slot_rows)
+from apps.vending.serializers import VendingMachineSlotSerializer
+from apps.vending.tests.factories import VendingMachineSlotFactory
+
+
+@pytest.fixture
+def tricky_slots() -> list[VendingMachineSlot]:
+    products = [
+        {"name": "Snickers Bar", "description": "Delicious chocolate bar with peanuts", "price": Money("10.40")},
+        {"name": 'Crème "brûlée"', "description": None, "price": Money("0.00")},
+        {"name": "Pocky \\ ポッキー 🍫", "description": "line\nbreak\tand \u2028 separators \u2029", "price": Money("99.99")},
+        {"name": "", "description": "", "price": Money("1.5")},
+    ]
+    return [
+        VendingMachineSlotFactory(
+            row=row, column=column, quantity=row * column,
+            **{f"product__{field}": value for field, value in product.items()})
+        for (row, column), product in zip([(1, 1), (1, 2), (2, 1), (2, 2)], products)
+    ]
+
+
+def drf_planogram(slots) -> bytes:
+    result = []
+    for slot in VendingMachineSlotSerializer(slots, many=True).data:
+        new_product = {
+            **slot["product"],
+            "quantity": slot["quantity"],
+            "slot_id": slot["id"]
+        }
+        if len(result) < slot["row"]:
+            result.append([new_product])
+        else:
+            result[slot["row"] - 1].append(new_product)
+    return JSONRenderer().render(result)
+
+
+@pytest.mark.django_db
+class TestRenderers:
+
+    def test_render_slots_matches_drf_serializer_bytes(self, tricky_slots):
+        slots = VendingMachineSlot.objects.order_by("row", "column")
+
+        expected = JSONRenderer().render(VendingMachineSlotSerializer(
+            slots.select_related("product"), many=True).data)
+
+        assert render_slots(slot_rows(slots)) == expected
+
+    def test_render_slot_matches_drf_serializer_bytes(self, tricky_slots):
+        for slot in tricky_slots:
+            slot.refresh_from_db()
+            row = slot_rows(VendingMachineSlot.objects.filter(id=slot.id)).get()
+
+            assert render_slot(row) == JSONRenderer().render(
+                VendingMachineSlotSerializer(slot).data)
+
+    def test_render_empty_slots_matches_drf_serializer_bytes(self):
+        slots = VendingMachineSlot.objects.all()
+
+        assert render_slots(slot_rows(slots)) == JSONRenderer().render(
+            VendingMachineSlotSerializer(slots, many=True).data)
+
+    def test_render_product_grid_matches_drf_planogram_bytes(self, tricky_slots):
+        slots = VendingMachineSlot.objects.order_by("row", "column")
+
+        expected = drf_planogram(slots.select_related("product"))
+
+        assert render_product_grid(slot_rows(slots)) == expected
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 10])
+    def test_slots_encoder_chunks_join_into_render_slots_bytes(self, tricky_slots, chunk_size):
+        rows = list(slot_rows(VendingMachineSlot.objects.order_by("row", "column")))
+        encoder = SlotsEncoder()
+
+        chunks = [encoder.encode(rows[i:i + chunk_size]) for i in range(0, len(rows), chunk_size)]
+
+        assert b"".join(chunks) + encoder.close() == render_slots(rows)
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 10])
+    def test_product_grid_encoder_chunks_join_into_render_product_grid_bytes(self, tricky_slots, chunk_size):
+        slots = VendingMachineSlot.objects.order_by("row", "column")
+        rows = list(slot_rows(slots))
+        encoder = ProductGridEncoder()
+
+        chunks = [encoder.encode(rows[i:i + chunk_size]) for i in range(0, len(rows), chunk_size)]
+
+        assert b"".join(chunks) + encoder.close() == drf_planogram(slots.select_related("product"))
+
+    def test_encoders_close_empty_documents(self):
+        assert SlotsEncoder().close() == b"[]"
+        assert ProductGridEncoder().close() == b"[]"
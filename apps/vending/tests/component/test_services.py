@@ -1,49 +1,259 @@
-from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 import pytest
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
 from apps.vending.enums import BalanceTypeOperation
-from apps.vending.exceptions import OrderError
-from apps.vending.request_dto import BalanceOperationDto, OrderOperationDto
-from apps.vending.services import BalanceOperatorService, OrderOperatorService
+from apps.vending.exceptions import OrderError, UserNotFound, VendingMachineSlotNotFound
+from apps.vending.money import Money
+from apps.vending.request_dto import LoginDto, BalanceOperationDto, BatchOrderOperationDto, OrderLineDto, OrderOperationDto
+from apps.vending.models import BalanceLedgerEntry, BalanceSnapshot, User
+from apps.vending.services import BalanceOperatorService, BatchOrderOperatorService, LedgerCompactionService, LoginService, OrderOperatorService, get_ledger_balance
 
 from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
 
 
+def place_orders_in_parallel(dto: OrderOperationDto, orders: int, workers: int = 16) -> list:
+    def place_order(_):
+        try:
+            return OrderOperatorService().execute(dto)
+        except OrderError as e:
+            return e
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(place_order, range(orders)))
+
+
+@pytest.mark.django_db
+class TestLoginService:
+
+    def test_should_create_user_on_first_login(self):
+        user, created = LoginService().execute(LoginDto(name="Juan Praderas"))
+        assert created
+        assert user.normalized_name == "juan praderas"
+
+    def test_should_resolve_existing_user_ignoring_case(self):
+        existing = UserFactory(name="Juan Praderas")
+        user, created = LoginService().execute(LoginDto(name="JUAN praderas"))
+        assert not created
+        assert user.id == existing.id
+
+    def test_should_resolve_repeat_login_with_one_indexed_read(self, django_assert_num_queries):
+        existing = UserFactory(name="Juan Praderas")
+        User.objects.filter(id=existing.id).update(balance=Money("3.30"))
+
+        with django_assert_num_queries(1) as captured:
+            user, created = LoginService().execute(LoginDto(name="juan praderas"))
+
+        assert '"user"."normalized_name" =' in captured.captured_queries[0]["sql"]
+        assert not created
+        assert user.balance == Money("3.30")
+
+    def test_should_create_new_user_for_the_old_name_after_rename(self):
+        existing = UserFactory(name="Juan Praderas")
+        LoginService().execute(LoginDto(name="Juan Praderas"))
+        existing.name = "Joan Pradels"
+        existing.save()
+
+        user, created = LoginService().execute(LoginDto(name="Juan Praderas"))
+
+        assert created
+        assert user.id != existing.id
+
+
+# Concurrent write requests the SQLite profile must absorb without lock errors.
+TARGET_CONCURRENCY = 32
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWriteConcurrency:
+
+    def test_write_paths_begin_immediate_transactions(self):
+        user = UserFactory(balance=Money("5.00"))
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            BalanceOperatorService().execute(BalanceOperationDto(
+                user_id=user.id, type_operation=BalanceTypeOperation.REFUND, amount=Money("0.00")))
+
+        assert statements[0] == "BEGIN IMMEDIATE"
+
+    def test_mixed_write_traffic_raises_no_lock_errors(self):
+        users = [UserFactory(name=f"User {i}", balance=Money("50.00")) for i in range(4)]
+        slot = VendingMachineSlotFactory(product__price=Money("0.50"), quantity=1000)
+        operations = [
+            operation
+            for user in users
+            for operation in [
+                (OrderOperatorService(), OrderOperationDto(user_id=user.id, slot_id=slot.id)),
+                (BalanceOperatorService(), BalanceOperationDto(
+                    user_id=user.id, type_operation=BalanceTypeOperation.ADD, amount=Money("1.00"))),
+                (BatchOrderOperatorService(), BatchOrderOperationDto(
+                    user_id=user.id, lines=[OrderLineDto(slot_id=slot.id, quantity=2)])),
+                # Refunds read the balance before writing: the case a deferred
+                # transaction cannot upgrade to a write without failing.
+                (BalanceOperatorService(), BalanceOperationDto(
+                    user_id=user.id, type_operation=BalanceTypeOperation.REFUND, amount=Money("0.00"))),
+            ]
+        ]
+
+        def run(i):
+            service, dto = operations[i % len(operations)]
+            try:
+                return service.execute(dto)
+            except (OrderError, OperationalError) as e:
+                return e
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=TARGET_CONCURRENCY) as executor:
+            results = list(executor.map(run, range(640)))
+
+        assert [str(result) for result in results if isinstance(result, OperationalError)] == []
+        for user in users:
+            user.refresh_from_db()
+            # The factory balance predates the ledger.
+            assert Money("50.00") + get_ledger_balance(user.id) == user.balance
+
+
+@pytest.mark.django_db(transaction=True)
+class TestLoginServiceConcurrency:
+
+    def test_parallel_logins_of_a_new_name_create_one_user(self):
+        def login(name):
+            try:
+                return LoginService().execute(LoginDto(name=name))
+            finally:
+                connections.close_all()
+
+        names = ["Juan Praderas", "juan praderas", "JUAN PRADERAS"] * 20
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(login, names))
+
+        assert User.objects.count() == 1
+        assert sum(created for _, created in results) == 1
+        assert len({user.id for user, _ in results}) == 1
+
+
 @pytest.mark.django_db
 class TestBalanceOperatorService:
 
     def test_should_increase_balance_of_user(self):
-        user = UserFactory(balance=Decimal("0.00"))
-        dto = BalanceOperationDto(user_id=user.id, amount=Decimal(
+        user = UserFactory(balance=Money("0.00"))
+        dto = BalanceOperationDto(user_id=user.id, amount=Money(
             "10.00"), type_operation=BalanceTypeOperation.ADD)
         service = BalanceOperatorService()
         service.execute(dto)
         user.refresh_from_db()
-        assert user.balance == Decimal("10.00")
+        assert user.balance == Money("10.00")
+
+    @pytest.mark.parametrize("returning", [True, False], ids=["update_returning", "update_then_read"])
+    def test_should_return_the_updated_user(self, monkeypatch, returning):
+        monkeypatch.setattr("apps.vending.services._can_return_from_update", lambda: returning)
+        user = UserFactory(balance=Money("10.00"))
+        dto = BalanceOperationDto(user_id=user.id, amount=Money(
+            "4.00"), type_operation=BalanceTypeOperation.ADD)
+        service = BalanceOperatorService()
+        assert service.execute(dto).balance == Money("14.00")
 
     def test_should_raise_error_if_increase_a_negative_number(self):
-        user = UserFactory(balance=Decimal("1.00"))
-        dto = BalanceOperationDto(user_id=user.id, amount=Decimal(
+        user = UserFactory(balance=Money("1.00"))
+        dto = BalanceOperationDto(user_id=user.id, amount=Money(
             "-10.00"), type_operation=BalanceTypeOperation.ADD)
         service = BalanceOperatorService()
         with pytest.raises(ValueError):
             service.execute(dto)
 
     def test_should_reset_balance_if_user_refund(self):
-        user = UserFactory(balance=Decimal("10.00"))
+        user = UserFactory(balance=Money("10.00"))
         dto = BalanceOperationDto(
             user_id=user.id, type_operation=BalanceTypeOperation.REFUND)
         service = BalanceOperatorService()
         service.execute(dto)
         user.refresh_from_db()
-        assert user.balance == Decimal("0.00")
+        assert user.balance == Money("0.00")
+
+    def test_should_raise_error_if_user_not_exist(self):
+        dto = BalanceOperationDto(user_id=UserFactory.build().id, amount=Money(
+            "10.00"), type_operation=BalanceTypeOperation.ADD)
+        service = BalanceOperatorService()
+        with pytest.raises(UserNotFound):
+            service.execute(dto)
+        assert not BalanceLedgerEntry.objects.exists()
+
+
+@pytest.mark.django_db
+class TestBalanceLedger:
+
+    def test_should_append_one_entry_per_operation(self):
+        user = UserFactory(balance=Money("0.00"))
+        slot = VendingMachineSlotFactory(product__price=Money("2.00"))
+        BalanceOperatorService().execute(BalanceOperationDto(
+            user_id=user.id, amount=Money("10.00"), type_operation=BalanceTypeOperation.ADD))
+        OrderOperatorService().execute(OrderOperationDto(
+            user_id=user.id, slot_id=slot.id))
+        BalanceOperatorService().execute(BalanceOperationDto(
+            user_id=user.id, type_operation=BalanceTypeOperation.REFUND))
+
+        entries = BalanceLedgerEntry.objects.filter(
+            user_id=user.id).order_by("created_at")
+        assert [(entry.type_operation, entry.amount) for entry in entries] == [
+            ("add", Money("10.00")),
+            ("order_product", Money("-2.00")),
+            ("refund", Money("-8.00")),
+        ]
+        user.refresh_from_db()
+        assert user.balance == get_ledger_balance(user.id) == Money("0.00")
+
+    def test_compaction_folds_old_entries_into_a_snapshot(self):
+        user = UserFactory(balance=Money("0.00"))
+        service = BalanceOperatorService()
+        for amount in ("10.00", "5.50"):
+            service.execute(BalanceOperationDto(
+                user_id=user.id, amount=Money(amount), type_operation=BalanceTypeOperation.ADD))
+        cutoff = timezone.now()
+        service.execute(BalanceOperationDto(
+            user_id=user.id, amount=Money("1.25"), type_operation=BalanceTypeOperation.ORDER_PRODUCT))
+
+        folded = LedgerCompactionService().execute(cutoff)
+
+        assert folded == 2
+        snapshot = BalanceSnapshot.objects.get(user_id=user.id)
+        assert (snapshot.balance, snapshot.entries_count) == (Money("15.50"), 2)
+        assert BalanceLedgerEntry.objects.filter(user_id=user.id).count() == 1
+        user.refresh_from_db()
+        assert user.balance == get_ledger_balance(user.id) == Money("14.25")
+
+    def test_compaction_builds_on_the_previous_snapshot(self):
+        user = UserFactory(balance=Money("0.00"))
+        service = BalanceOperatorService()
+        service.execute(BalanceOperationDto(
+            user_id=user.id, amount=Money("10.00"), type_operation=BalanceTypeOperation.ADD))
+        LedgerCompactionService().execute(timezone.now())
+        service.execute(BalanceOperationDto(
+            user_id=user.id, amount=Money("3.00"), type_operation=BalanceTypeOperation.ADD))
+
+        LedgerCompactionService().execute(timezone.now() + timedelta(seconds=1))
+
+        latest = BalanceSnapshot.objects.filter(
+            user_id=user.id).order_by("-taken_at").first()
+        assert latest.balance == Money("13.00")
+        assert not BalanceLedgerEntry.objects.filter(user_id=user.id).exists()
+        assert get_ledger_balance(user.id) == Money("13.00")
 
 
 @pytest.mark.django_db
 class TestOrderOperatorService:
 
     def test_should_raise_error_if_order_product_with_price_higher_than_balance(self):
-        user = UserFactory(balance=Decimal("1.00"))
-        slot = VendingMachineSlotFactory(product__price=Decimal("2.00"))
+        user = UserFactory(balance=Money("1.00"))
+        slot = VendingMachineSlotFactory(product__price=Money("2.00"))
         dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
         service = OrderOperatorService()
         with pytest.raises(OrderError):
@@ -51,9 +261,9 @@ class TestOrderOperatorService:
 
     @pytest.mark.django_db
     def test_should_raise_error_if_order_a_slot_with_quantity_zero(self):
-        user = UserFactory(balance=Decimal("1.00"))
+        user = UserFactory(balance=Money("1.00"))
         slot = VendingMachineSlotFactory(
-            product__price=Decimal("2.00"), quantity=0)
+            product__price=Money("2.00"), quantity=0)
         dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
         service = OrderOperatorService()
         with pytest.raises(OrderError):
@@ -61,13 +271,163 @@ class TestOrderOperatorService:
 
     @pytest.mark.django_db
     def test_should_decrease_quantity_and_update_user_balance_after_order_product(self):
-        user = UserFactory(balance=Decimal("10.00"))
+        user = UserFactory(balance=Money("10.00"))
         slot = VendingMachineSlotFactory(
-            product__price=Decimal("2.00"), quantity=5)
+            product__price=Money("2.00"), quantity=5)
         dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
         service = OrderOperatorService()
         service.execute(dto)
         user.refresh_from_db()
         slot.refresh_from_db()
         assert slot.quantity == 4
-        assert user.balance == Decimal("8.00")
+        assert user.balance == Money("8.00")
+
+    def test_should_return_updated_user_after_order_product(self, django_assert_max_num_queries):
+        user = UserFactory(balance=Money("10.00"))
+        slot = VendingMachineSlotFactory(
+            product__price=Money("2.50"), quantity=5)
+        dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
+        service = OrderOperatorService()
+        # stock, price, debit, ledger entry, order event and rollups, plus the savepoint
+        with django_assert_max_num_queries(8):
+            ordered_user = service.execute(dto)
+        assert ordered_user.id == user.id
+        assert ordered_user.name == user.name
+        assert ordered_user.balance == Money("7.50")
+
+    def test_should_raise_error_if_user_not_exist(self):
+        user = UserFactory.build()
+        slot = VendingMachineSlotFactory(quantity=5)
+        dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
+        service = OrderOperatorService()
+        with pytest.raises(UserNotFound):
+            service.execute(dto)
+        slot.refresh_from_db()
+        assert slot.quantity == 5
+
+    def test_should_raise_error_if_slot_not_exist(self):
+        user = UserFactory(balance=Money("10.00"))
+        slot = VendingMachineSlotFactory.build()
+        dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
+        service = OrderOperatorService()
+        with pytest.raises(VendingMachineSlotNotFound):
+            service.execute(dto)
+
+    def test_should_not_change_quantity_if_balance_is_not_enough(self):
+        user = UserFactory(balance=Money("1.00"))
+        slot = VendingMachineSlotFactory(
+            product__price=Money("2.00"), quantity=5)
+        dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
+        service = OrderOperatorService()
+        with pytest.raises(OrderError):
+            service.execute(dto)
+        slot.refresh_from_db()
+        assert slot.quantity == 5
+
+
+@pytest.mark.django_db
+class TestBatchOrderOperatorService:
+
+    def test_should_decrease_quantities_and_charge_total_once(self, django_assert_max_num_queries):
+        user = UserFactory(balance=Money("20.00"))
+        water = VendingMachineSlotFactory(
+            product__price=Money("1.50"), quantity=5, column=1)
+        chips = VendingMachineSlotFactory(
+            product__price=Money("2.25"), quantity=3, column=2)
+        dto = BatchOrderOperationDto(user_id=user.id, lines=[
+            OrderLineDto(slot_id=water.id, quantity=2),
+            OrderLineDto(slot_id=chips.id),
+            OrderLineDto(slot_id=water.id),
+        ])
+        service = BatchOrderOperatorService()
+        # one UPDATE per slot, prices, debit, ledger entry, order events and
+        # rollups, plus the savepoint
+        with django_assert_max_num_queries(9):
+            result = service.execute(dto)
+        water.refresh_from_db()
+        chips.refresh_from_db()
+        assert water.quantity == 2
+        assert chips.quantity == 2
+        assert result.total_price == Money("6.75")
+        assert result.user.balance == Money("13.25")
+        assert [(str(line.slot_id), line.quantity, line.total_price) for line in result.lines] == [
+            (str(water.id), 3, Money("4.50")),
+            (str(chips.id), 1, Money("2.25")),
+        ]
+
+    def test_should_not_change_anything_if_balance_is_not_enough_for_total(self):
+        user = UserFactory(balance=Money("3.00"))
+        water = VendingMachineSlotFactory(
+            product__price=Money("1.50"), quantity=5, column=1)
+        chips = VendingMachineSlotFactory(
+            product__price=Money("2.25"), quantity=3, column=2)
+        dto = BatchOrderOperationDto(user_id=user.id, lines=[
+            OrderLineDto(slot_id=water.id), OrderLineDto(slot_id=chips.id)])
+        service = BatchOrderOperatorService()
+        with pytest.raises(OrderError):
+            service.execute(dto)
+        water.refresh_from_db()
+        chips.refresh_from_db()
+        user.refresh_from_db()
+        assert (water.quantity, chips.quantity) == (5, 3)
+        assert user.balance == Money("3.00")
+
+    def test_should_raise_error_if_one_slot_has_not_enough_quantity(self):
+        user = UserFactory(balance=Money("20.00"))
+        water = VendingMachineSlotFactory(quantity=5, column=1)
+        chips = VendingMachineSlotFactory(quantity=1, column=2)
+        dto = BatchOrderOperationDto(user_id=user.id, lines=[
+            OrderLineDto(slot_id=water.id), OrderLineDto(slot_id=chips.id, quantity=2)])
+        service = BatchOrderOperatorService()
+        with pytest.raises(OrderError, match=str(chips.id)):
+            service.execute(dto)
+        water.refresh_from_db()
+        assert water.quantity == 5
+
+    def test_should_raise_error_if_one_slot_not_exist(self):
+        user = UserFactory(balance=Money("20.00"))
+        water = VendingMachineSlotFactory(quantity=5)
+        dto = BatchOrderOperationDto(user_id=user.id, lines=[
+            OrderLineDto(slot_id=water.id),
+            OrderLineDto(slot_id=VendingMachineSlotFactory.build().id)])
+        service = BatchOrderOperatorService()
+        with pytest.raises(VendingMachineSlotNotFound):
+            service.execute(dto)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestOrderOperatorServiceConcurrency:
+
+    def test_parallel_orders_never_oversell_a_slot(self):
+        user = UserFactory(balance=Money("99.00"))
+        slot = VendingMachineSlotFactory(
+            product__price=Money("1.00"), quantity=40)
+        dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
+
+        results = place_orders_in_parallel(dto, orders=300)
+
+        sold = [result for result in results if not isinstance(result, OrderError)]
+        assert len(sold) == 40
+        assert all(str(error) == "Not enough product quantity"
+                   for error in results if isinstance(error, OrderError))
+        slot.refresh_from_db()
+        user.refresh_from_db()
+        assert slot.quantity == 0
+        assert user.balance == Money("59.00")
+
+    def test_parallel_orders_never_overdraw_a_balance(self):
+        user = UserFactory(balance=Money("30.00"))
+        slot = VendingMachineSlotFactory(
+            product__price=Money("1.50"), quantity=100)
+        dto = OrderOperationDto(user_id=user.id, slot_id=slot.id)
+
+        results = place_orders_in_parallel(dto, orders=300)
+
+        sold = [result for result in results if not isinstance(result, OrderError)]
+        assert len(sold) == 20
+        assert sorted(result.balance for result in sold) == [
+            Money("1.50") * i for i in range(20)]
+        slot.refresh_from_db()
+        user.refresh_from_db()
+        assert slot.quantity == 80
+        assert user.balance == Money("0.00")
@@ -0,0 +1,52 @@
+import tracemalloc
+
+import pytest
+
+from apps.vending.models import Machine, Product, VendingMachineSlot
+from apps.vending.money import Money
+from apps.vending.renderers import SlotsEncoder, render_slots, slot_rows
+from apps.vending.streaming import stream
+
+
+def seed_slots(count: int) -> None:
+    machine = Machine.objects.create(name="Streaming")
+    product = Product.objects.create(name="Snickers Bar", description="x" * 200, price=Money("1.00"))
+    VendingMachineSlot.objects.bulk_create([
+        VendingMachineSlot(machine=machine, product=product, quantity=10, row=i // 5 + 1, column=i % 5 + 1)
+        for i in range(count)
+    ])
+
+
+def peak_memory(render) -> int:
+    tracemalloc.start()
+    try:
+        render()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.django_db
+class TestStream:
+
+    def test_stream_yields_one_chunk_per_chunk_size_rows(self):
+        seed_slots(25)
+        rows = slot_rows(VendingMachineSlot.objects.order_by("row", "column"))
+
+        chunks = list(stream(rows, SlotsEncoder(), chunk_size=10))
+
+        assert len(chunks) == 4
+        assert b"".join(chunks) == render_slots(rows)
+
+    def test_stream_peak_memory_does_not_grow_with_slots(self):
+        seed_slots(2000)
+        rows = slot_rows(VendingMachineSlot.objects.order_by("row", "column"))
+
+        def consume_stream():
+            for _ in stream(rows, SlotsEncoder(), chunk_size=50):
+                pass
+
+        streamed = peak_memory(consume_stream)
+        buffered = peak_memory(lambda: render_slots(list(rows)))
+
+        assert streamed * 5 < buffered
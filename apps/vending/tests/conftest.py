@@ -0,0 +1,27 @@
+import pytest
+from django.core.cache import cache
+from django.db import connections
+
+from apps.vending.inventory import inventory_engine
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    inventory_engine.clear()
+    yield
+    cache.clear()
+    inventory_engine.clear()
+
+
+@pytest.fixture
+def replica(settings, tmp_path):
+    """adds a file-based SQLite replica, synced from the primary on demand"""
+    config = {**settings.DATABASES["default"], "NAME": str(tmp_path / "replica.sqlite3")}
+    settings.DATABASES = {**settings.DATABASES, "replica": config}
+    connections.settings["replica"] = connections.configure_settings(
+        {"default": config, "replica": config})["replica"]
+    yield "replica"
+    connections["replica"].close()
+    del connections["replica"]
+    del connections.settings["replica"]
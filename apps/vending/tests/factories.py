@@ -1,8 +1,8 @@
-from _decimal import Decimal
 from datetime import datetime
 from factory import Faker, SubFactory
 from factory.django import DjangoModelFactory
-from apps.vending.models import Product, VendingMachineSlot, User
+from apps.vending.models import Machine, Product, VendingMachineSlot, User
+from apps.vending.money import Money
 
 
 class ProductFactory(DjangoModelFactory):
@@ -12,16 +12,25 @@ class ProductFactory(DjangoModelFactory):
     id = Faker("uuid4")
     name = "Snickers Bar"
     description = "Delicious chocolate bar with peanuts"
-    price = Decimal("10.40")
+    price = Money("10.40")
     created_at = datetime(2023, 5, 30, 12)
     updated_at = datetime(2023, 5, 30, 23)
 
 
+class MachineFactory(DjangoModelFactory):
+    class Meta:
+        model = Machine
+        django_get_or_create = ("name",)
+
+    name = "Vending machine"
+
+
 class VendingMachineSlotFactory(DjangoModelFactory):
     class Meta:
         model = VendingMachineSlot
 
     id = Faker("uuid4")
+    machine = SubFactory(MachineFactory)
     product = SubFactory(ProductFactory)
     quantity = 10
     row = 1
@@ -33,5 +42,5 @@ class UserFactory(DjangoModelFactory):
         model = User
 
     name = "Joan Pradels"
-    balance = Decimal("10.40")
+    balance = Money("10.40")
     created_at = datetime(2023, 5, 30, 12)
@@ -0,0 +1,31 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from apps.vending.models import BalanceLedgerEntry, BalanceSnapshot, OrderEvent, SalesRollup
+from apps.vending.money import Money
+from apps.vending.tests.factories import UserFactory
+
+
+@pytest.mark.django_db
+class TestAdmin:
+
+    @pytest.mark.parametrize("model", [BalanceLedgerEntry, BalanceSnapshot, OrderEvent, SalesRollup])
+    def test_history_models_are_read_only(self, admin_client, model):
+        opts = model._meta
+        changelist = admin_client.get(reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist"))
+        add = admin_client.get(reverse(f"admin:{opts.app_label}_{opts.model_name}_add"))
+
+        assert changelist.status_code == status.HTTP_200_OK
+        assert add.status_code == status.HTTP_403_FORBIDDEN
+        assert not changelist.context["cl"].model_admin.has_delete_permission(changelist.wsgi_request)
+
+    def test_user_balance_is_read_only(self, admin_client):
+        user = UserFactory(balance=Money("5.00"))
+
+        response = admin_client.post(
+            reverse("admin:vending_user_change", args=[user.id]), {"name": user.name, "balance": "999"})
+
+        assert response.status_code == status.HTTP_302_FOUND
+        user.refresh_from_db()
+        assert user.balance == Money("5.00")
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from rest_framework import status
+
+from apps.vending.models import VendingMachineSlot
+from apps.vending.money import Money
+from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
+from apps.vending.views import OrderView, ProductView, VendingMachineSlotDetailView, VendingMachineSlotView
+from vending_machine.asgi import application
+
+
+def run(awaitable):
+    async def wait():
+        return await awaitable
+    return async_to_sync(wait)()
+
+
+@pytest.fixture
+def slots() -> list[VendingMachineSlot]:
+    return [
+        VendingMachineSlotFactory(product__name=f"Product {column}", row=1, column=column)
+        for column in range(1, 6)
+    ]
+
+
+@pytest.mark.django_db
+class TestAsgi:
+
+    def test_asgi_entry_point(self):
+        assert isinstance(application, ASGIHandler)
+
+    def test_read_views_are_async_and_write_views_are_not(self):
+        assert VendingMachineSlotView.view_is_async
+        assert VendingMachineSlotDetailView.view_is_async
+        assert ProductView.view_is_async
+        assert not OrderView.view_is_async
+
+    def test_read_endpoints_return_the_same_bytes_as_wsgi(self, client, async_client, slots):
+        paths = ["/products/", "/slots/", f"/slots/{slots[0].id}",
+                 f"/machines/{slots[0].machine_id}/slots/", "/healthcheck/"]
+
+        for path in paths:
+            response = run(async_client.get(path))
+
+            assert response.status_code == status.HTTP_200_OK
+            assert response.content == client.get(path).content
+
+    def test_concurrent_reads_are_served_on_one_event_loop(self, async_client, slots):
+        async def poll():
+            return await asyncio.gather(*(
+                async_client.get(path) for path in ["/products/", "/slots/"] * 10))
+
+        responses = run(poll())
+
+        assert {response.status_code for response in responses} == {status.HTTP_200_OK}
+        assert len({response.content for response in responses}) == 2
+
+    def test_streamed_listings_are_async_iterators_over_asgi(self, client, async_client, slots):
+        async def read(path):
+            response = await async_client.get(path)
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        for path in ["/slots/?stream=true", "/products/?stream=true"]:
+            response, content = run(read(path))
+
+            assert response.is_async
+            assert content == b"".join(client.get(path).streaming_content)
+
+    def test_unknown_slot_returns_not_found(self, async_client):
+        response = run(async_client.get(
+            "/slots/3fa85f64-5717-4562-b3fc-2c963f66afa6"))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {
+            "message": "Slot not found with ID 3fa85f64-5717-4562-b3fc-2c963f66afa6"}
+
+    def test_order_runs_synchronously_over_asgi(self, async_client, slots):
+        user = UserFactory(balance=Money("20.00"))
+
+        response = run(async_client.post(
+            "/order/", {"user_id": str(user.id), "slot_id": str(slots[0].id)},
+            content_type="application/json"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["balance"] == "9.60"
+        assert VendingMachineSlot.objects.get(id=slots[0].id).quantity == 9
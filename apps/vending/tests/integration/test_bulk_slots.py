@@ -0,0 +1,171 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.test import Client
+from rest_framework import status
+
+from apps.vending.models import Machine, Product, VendingMachineSlot
+from apps.vending.planogram import get_inventory_version
+from apps.vending.tests.factories import MachineFactory, ProductFactory, VendingMachineSlotFactory
+
+
+@pytest.fixture
+def client(admin_client) -> Client:
+    # Uploads are for staff only.
+    return admin_client
+
+
+@pytest.fixture
+def machine() -> Machine:
+    return MachineFactory()
+
+
+@pytest.fixture
+def product() -> Product:
+    return ProductFactory()
+
+
+def planogram(machine, product, positions, quantity=7) -> list[dict]:
+    return [
+        {"machine_id": str(machine.id), "row": row, "column": column,
+         "product_id": str(product.id), "quantity": quantity}
+        for row, column in positions
+    ]
+
+
+def as_csv(slots: list[dict]) -> str:
+    columns = ["machine_id", "row", "column", "product_id", "quantity"]
+    return "\n".join([",".join(columns)] + [
+        ",".join(str(slot[column]) for column in columns) for slot in slots])
+
+
+def post_json(client, slots):
+    return client.post("/slots/bulk/", {"slots": slots}, content_type="application/json")
+
+
+@pytest.mark.django_db
+class TestBulkSlots:
+
+    def test_creates_new_positions_and_restocks_existing_ones(self, client, machine, product):
+        existing = VendingMachineSlotFactory(machine=machine, row=1, column=1, quantity=0)
+
+        response = post_json(client, planogram(machine, product, [(1, 1), (1, 2), (2, 1)]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"created": 2, "updated": 1}
+        existing.refresh_from_db()
+        assert (existing.quantity, str(existing.product_id)) == (7, product.id)
+        assert VendingMachineSlot.objects.filter(machine=machine, quantity=7).count() == 3
+
+    def test_accepts_csv(self, client, machine, product):
+        response = client.post("/slots/bulk/", as_csv(planogram(machine, product, [(1, 1), (1, 2)])),
+                               content_type="text/csv")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"created": 2, "updated": 0}
+
+    def test_csv_without_required_columns_is_rejected(self, client):
+        response = client.post("/slots/bulk/", "row,column\n1,1", content_type="text/csv")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "machine_id, product_id, quantity" in response.json()["detail"]
+
+    def test_reports_every_invalid_row_and_writes_nothing(self, client, machine, product):
+        slots = planogram(machine, product, [(1, 1), (11, 1), (1, 6)])
+        slots[0]["quantity"] = 101
+
+        response = post_json(client, slots)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = response.json()["slots"]
+        assert list(errors[0]) == ["quantity"]
+        assert list(errors[1]) == ["row"]
+        assert list(errors[2]) == ["column"]
+        assert not VendingMachineSlot.objects.exists()
+
+    def test_duplicate_positions_are_rejected(self, client, machine, product):
+        response = post_json(client, planogram(machine, product, [(1, 1), (1, 1)]))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"slots": [
+            f"Row 1, column 1 of machine {machine.id} is listed more than once"]}
+
+    def test_unknown_products_are_rejected(self, client, machine, product):
+        slots = planogram(machine, product, [(1, 1), (1, 2)])
+        slots[1]["product_id"] = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+
+        response = post_json(client, slots)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"message": "Products not found: 3fa85f64-5717-4562-b3fc-2c963f66afa6"}
+        assert not VendingMachineSlot.objects.exists()
+
+    @pytest.mark.parametrize("user", [None, "customer"])
+    def test_non_staff_uploads_are_forbidden_and_write_nothing(self, django_user_model, machine, product, user):
+        other = Client()
+        if user:
+            other.force_login(django_user_model.objects.create_user(username=user, password="secret"))
+
+        response = post_json(other, planogram(machine, product, [(1, 1)]))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not VendingMachineSlot.objects.exists()
+
+    def test_query_count_does_not_grow_with_the_upload(self, client, machine, product,
+                                                       django_assert_max_num_queries):
+        VendingMachineSlotFactory(machine=machine, row=10, column=5)
+        small = planogram(machine, product, [(1, 1), (10, 5)])
+        large = planogram(machine, product, [(row, column) for row in range(1, 11) for column in range(1, 6)])
+
+        # Two of them load the staff user's session.
+        with django_assert_max_num_queries(10):
+            post_json(client, small)
+        with django_assert_max_num_queries(10):
+            post_json(client, large)
+
+        assert VendingMachineSlot.objects.count() == 50
+
+    def test_invalidates_cached_listings_once(self, client, machine, product,
+                                              django_capture_on_commit_callbacks):
+        client.get("/products/")
+        version = get_inventory_version()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            post_json(client, planogram(machine, product, [(1, column) for column in range(1, 6)]))
+
+        assert get_inventory_version() == version + 1
+        assert len(client.get("/products/").json()[0]) == 5
+
+
+@pytest.mark.django_db
+class TestUploadPlanogramCommand:
+
+    def test_uploads_json_and_csv_files(self, tmp_path, machine, product, capsys):
+        json_file = tmp_path / "planogram.json"
+        json_file.write_text(json.dumps({"slots": planogram(machine, product, [(1, 1)])}))
+        csv_file = tmp_path / "planogram.csv"
+        csv_file.write_text(as_csv(planogram(machine, product, [(1, 1), (1, 2)], quantity=3)))
+
+        call_command("upload_planogram", str(json_file))
+        call_command("upload_planogram", str(csv_file))
+
+        assert capsys.readouterr().out.splitlines() == [
+            "Created 1 slots, updated 0 slots", "Created 1 slots, updated 1 slots"]
+        assert sorted(VendingMachineSlot.objects.values_list("quantity", flat=True)) == [3, 3]
+
+    def test_invalid_files_raise_command_errors(self, tmp_path, machine, product):
+        csv_file = tmp_path / "planogram.csv"
+        csv_file.write_text(as_csv(planogram(machine, product, [(11, 1)])))
+
+        with pytest.raises(CommandError, match="Invalid planogram"):
+            call_command("upload_planogram", str(csv_file))
+
+    def test_refuses_to_run_with_the_inventory_engine(self, tmp_path, machine, product, settings):
+        settings.INVENTORY_ENGINE = True
+        json_file = tmp_path / "planogram.json"
+        json_file.write_text(json.dumps({"slots": planogram(machine, product, [(1, 1)])}))
+
+        with pytest.raises(CommandError, match="INVENTORY_ENGINE"):
+            call_command("upload_planogram", str(json_file))
+        assert not VendingMachineSlot.objects.exists()
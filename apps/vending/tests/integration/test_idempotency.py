@@ -0,0 +1,167 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connections
+from django.test import Client
+from rest_framework import status
+
+from apps.vending.enums import BalanceTypeOperation
+from apps.vending.idempotency import _fingerprint, idempotency_store
+from apps.vending.models import User, VendingMachineSlot
+from apps.vending.money import Money
+from apps.vending.services import OrderOperatorService
+from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
+
+
+@pytest.fixture
+def user() -> User:
+    return UserFactory(balance=Money("20.00"))
+
+
+@pytest.fixture
+def slot() -> VendingMachineSlot:
+    return VendingMachineSlotFactory(quantity=5)
+
+
+def order(client, user, slot, key=None):
+    headers = {"HTTP_IDEMPOTENCY_KEY": key} if key is not None else {}
+    return client.post("/order/", {"user_id": user.id, "slot_id": slot.id}, **headers)
+
+
+@pytest.mark.django_db
+class TestIdempotencyKey:
+
+    def test_replayed_order_returns_stored_response_without_charging_again(self, client, user, slot):
+        first = order(client, user, slot, key="order-1")
+        replay = order(client, user, slot, key="order-1")
+
+        assert first.status_code == replay.status_code == status.HTTP_200_OK
+        assert replay.json() == first.json()
+        assert "Idempotent-Replayed" not in first
+        assert replay["Idempotent-Replayed"] == "true"
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 4
+        assert User.objects.get(id=user.id).balance == Money("9.60")
+
+    def test_replayed_balance_top_up_adds_once(self, client, user):
+        data = {"user_id": user.id, "type_operation": BalanceTypeOperation.ADD.value, "amount": "5.00"}
+
+        responses = [client.post("/balance/", data, HTTP_IDEMPOTENCY_KEY="top-up") for _ in range(3)]
+
+        assert [response.json()["balance"] for response in responses] == ["25.00"] * 3
+        assert User.objects.get(id=user.id).balance == Money("25.00")
+
+    def test_requests_without_key_run_every_time(self, client, slot):
+        user = UserFactory(balance=Money("50.00"))
+        order(client, user, slot)
+        order(client, user, slot)
+
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 3
+
+    def test_key_reused_with_another_body_is_rejected(self, client, user, slot):
+        order(client, user, slot, key="order-1")
+        other_slot = VendingMachineSlotFactory(row=2)
+
+        response = order(client, user, other_slot, key="order-1")
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert VendingMachineSlot.objects.get(id=other_slot.id).quantity == 10
+
+    def test_keys_are_scoped_to_the_endpoint(self, client, user, slot):
+        order(client, user, slot, key="shared")
+
+        response = client.post("/balance/", {
+            "user_id": user.id, "type_operation": BalanceTypeOperation.ADD.value, "amount": "1.00",
+        }, HTTP_IDEMPOTENCY_KEY="shared")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "Idempotent-Replayed" not in response
+
+    def test_business_errors_are_replayed(self, client, slot):
+        user = UserFactory(balance=Money("1.00"))
+        first = order(client, user, slot, key="order-1")
+        User.objects.filter(id=user.id).update(balance=Money("50.00"))
+
+        replay = order(client, user, slot, key="order-1")
+
+        assert first.status_code == replay.status_code == status.HTTP_400_BAD_REQUEST
+        assert replay.json() == {"message": "Not enough balance"}
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 5
+
+    def test_server_errors_release_the_key(self, user, slot, monkeypatch):
+        client = Client(raise_request_exception=False)
+        execute = OrderOperatorService.execute
+        monkeypatch.setattr(OrderOperatorService, "execute", lambda self, dto: 1 / 0)
+        failed = order(client, user, slot, key="order-1")
+        monkeypatch.setattr(OrderOperatorService, "execute", execute)
+
+        retried = order(client, user, slot, key="order-1")
+
+        assert failed.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert retried.status_code == status.HTTP_200_OK
+        assert "Idempotent-Replayed" not in retried
+
+    def test_stored_responses_expire_after_ttl(self, client, slot, settings, monkeypatch):
+        settings.IDEMPOTENCY_KEY_TTL = 60
+        user = UserFactory(balance=Money("50.00"))
+        order(client, user, slot, key="order-1")
+        now = time.time()
+        monkeypatch.setattr("django.core.cache.backends.locmem.time.time", lambda: now + 61)
+
+        response = order(client, user, slot, key="order-1")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "Idempotent-Replayed" not in response
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 3
+
+    def test_duplicate_of_a_request_in_progress_times_out(self, client, user, slot, settings):
+        settings.IDEMPOTENCY_WAIT_TIMEOUT = 0.1
+        settings.IDEMPOTENCY_POLL_INTERVAL = 0.01
+        data = {"user_id": str(user.id), "slot_id": str(slot.id)}
+        idempotency_store.claim("/order/", "order-1", _fingerprint(data))
+
+        response = client.post("/order/", data, content_type="application/json",
+                               HTTP_IDEMPOTENCY_KEY="order-1")
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 5
+
+    def test_claim_outlives_a_request_waiting_on_the_database(self, client, user, slot, settings, monkeypatch):
+        settings.IDEMPOTENCY_WAIT_TIMEOUT = 0.1
+        settings.IDEMPOTENCY_POLL_INTERVAL = 0.01
+        data = {"user_id": str(user.id), "slot_id": str(slot.id)}
+        idempotency_store.claim("/order/", "order-1", _fingerprint(data))
+        busy_timeout = settings.DATABASES["default"]["OPTIONS"]["timeout"]
+        now = time.time()
+        monkeypatch.setattr("django.core.cache.backends.locmem.time.time", lambda: now + busy_timeout + 10)
+
+        response = client.post("/order/", data, content_type="application/json",
+                               HTTP_IDEMPOTENCY_KEY="order-1")
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 5
+
+    def test_invalid_key_is_rejected(self, client, user, slot):
+        response = order(client, user, slot, key="k" * 256)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db(transaction=True)
+class TestIdempotencyKeyConcurrency:
+
+    def test_concurrent_duplicates_wait_for_the_first_response(self, user, slot):
+        def post(_):
+            try:
+                return order(Client(), user, slot, key="order-1")
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(post, range(8)))
+
+        assert {response.status_code for response in responses} == {status.HTTP_200_OK}
+        assert len({response.content for response in responses}) == 1
+        assert sum("Idempotent-Replayed" in response for response in responses) == 7
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 4
+        assert User.objects.get(id=user.id).balance == Money("9.60")
@@ -0,0 +1,171 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import sync_to_async
+from rest_framework import status
+
+from apps.vending.events import Subscription, inventory_publisher
+from apps.vending.money import Money
+from apps.vending.request_dto import OrderOperationDto
+from apps.vending.services import OrderOperatorService
+from apps.vending.tests.factories import MachineFactory, UserFactory, VendingMachineSlotFactory
+from apps.vending.tests.integration.test_asgi import run
+
+
+@pytest.fixture(autouse=True)
+def heartbeat(settings):
+    settings.SSE_HEARTBEAT_INTERVAL = 0.01
+
+
+def open_stream(client, path="/products/stream/", **headers):
+    response = client.get(path, **headers)
+    events = iter(response.streaming_content)
+    # The first read subscribes and sends the reconnect delay.
+    assert next(events) == b"retry: 3000\n\n"
+    return response, events
+
+
+def parse(chunk: bytes) -> list[tuple[str, dict]]:
+    parsed = []
+    for event in chunk.decode().strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in event.split("\n"))
+        parsed.append((fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+def next_event(events) -> bytes:
+    return next(chunk for chunk in events if not chunk.startswith(b":"))
+
+
+@pytest.mark.django_db
+class TestProductStream:
+
+    def test_sends_heartbeats_while_nothing_changes(self, client):
+        response, events = open_stream(client)
+
+        assert response["Content-Type"] == "text/event-stream"
+        assert response["Cache-Control"] == "no-cache"
+        assert next(events) == b": heartbeat\n\n"
+        response.close()
+
+    def test_orders_push_the_new_quantity(self, client, django_capture_on_commit_callbacks):
+        slot = VendingMachineSlotFactory(quantity=5, product__price=Money("1.10"))
+        response, events = open_stream(client)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            OrderOperatorService().execute(OrderOperationDto(
+                user_id=UserFactory(balance=Money("20.00")).id, slot_id=slot.id))
+
+        assert parse(next_event(events)) == [("slot", {
+            "slot_id": slot.id, "machine_id": str(slot.machine_id), "product_id": slot.product.id,
+            "quantity": 4, "price": "1.10"})]
+        response.close()
+
+    def test_product_edits_push_the_new_price_of_every_slot(self, client, django_capture_on_commit_callbacks):
+        slot = VendingMachineSlotFactory(row=1)
+        VendingMachineSlotFactory(row=2, product=slot.product)
+        response, events = open_stream(client)
+
+        slot.product.price = Money("3.00")
+        with django_capture_on_commit_callbacks(execute=True):
+            slot.product.save()
+
+        assert [data["price"] for _, data in parse(next_event(events))] == ["3.00", "3.00"]
+        response.close()
+
+    def test_machine_streams_only_get_their_slots(self, client, django_capture_on_commit_callbacks):
+        slot = VendingMachineSlotFactory(quantity=5)
+        other = VendingMachineSlotFactory(machine=MachineFactory(name="Other"), quantity=5)
+        response, events = open_stream(client, f"/machines/{slot.machine_id}/products/stream/")
+
+        inventory_publisher.publish_slots([other.id, slot.id])
+
+        assert [data["slot_id"] for _, data in parse(next_event(events))] == [slot.id]
+        response.close()
+
+    def test_unknown_machine_returns_not_found(self, client):
+        response = client.get("/machines/3fa85f64-5717-4562-b3fc-2c963f66afa6/products/stream/")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_reconnecting_client_that_missed_events_is_told_to_resync(self, client):
+        response, events = open_stream(client, HTTP_LAST_EVENT_ID="-1")
+
+        assert parse(next_event(events)) == [("resync", {})]
+        response.close()
+
+    def test_closing_the_stream_unsubscribes(self, client, django_assert_num_queries):
+        slot = VendingMachineSlotFactory()
+        response, _ = open_stream(client)
+        assert inventory_publisher.has_subscribers
+
+        response.close()
+
+        assert not inventory_publisher.has_subscribers
+        with django_assert_num_queries(0):
+            inventory_publisher.publish_slots([slot.id])
+
+    def test_streams_end_and_unsubscribe_after_their_lifetime(self, client, settings):
+        settings.SSE_MAX_STREAM_SECONDS = 0.05
+        response, events = open_stream(client)
+        assert inventory_publisher.has_subscribers
+
+        assert set(events) == {b": heartbeat\n\n"}
+
+        assert not inventory_publisher.has_subscribers
+        response.close()
+
+    def test_async_streams_end_and_unsubscribe_after_their_lifetime(self, async_client, settings):
+        settings.SSE_MAX_STREAM_SECONDS = 0.05
+
+        async def read():
+            response = await async_client.get("/products/stream/")
+            return [chunk async for chunk in response.streaming_content]
+
+        chunks = run(asyncio.wait_for(read(), 5))
+
+        assert chunks[0] == b"retry: 3000\n\n"
+        assert set(chunks[1:]) == {b": heartbeat\n\n"}
+        assert not inventory_publisher.has_subscribers
+
+    def test_async_streams_are_woken_by_publishing_threads(self, async_client):
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        async def read():
+            response = await async_client.get("/products/stream/")
+            events = aiter(response.streaming_content)
+            await anext(events)
+            await sync_to_async(inventory_publisher.publish_slots)([slot.id])
+            chunk = await anext(events)
+            while chunk.startswith(b":"):
+                chunk = await anext(events)
+            await events.aclose()
+            return chunk
+
+        assert parse(run(asyncio.wait_for(read(), 5)))[0][1]["quantity"] == 5
+
+
+class TestSubscription:
+
+    def delta(self, slot_id, quantity):
+        return {"id": quantity, "slot_id": slot_id, "machine_id": "m", "quantity": quantity}
+
+    def test_slow_clients_get_only_the_latest_delta_per_slot(self):
+        subscription = Subscription()
+
+        for quantity in range(10, 0, -1):
+            subscription.push([self.delta("a", quantity), self.delta("b", quantity)])
+
+        deltas, resync = subscription.get(0)
+        assert [(delta["slot_id"], delta["quantity"]) for delta in deltas] == [("a", 1), ("b", 1)]
+        assert not resync
+
+    def test_clients_too_far_behind_resync(self, settings):
+        settings.SSE_MAX_PENDING = 2
+        subscription = Subscription()
+
+        subscription.push([self.delta(slot_id, 1) for slot_id in "abc"])
+
+        assert subscription.get(0) == ([], True)
+        assert subscription.get(0) == ([], False)
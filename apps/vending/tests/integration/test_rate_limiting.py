@@ -0,0 +1,129 @@
+import pytest
+from rest_framework import status
+
+from apps.vending.enums import BalanceTypeOperation
+from apps.vending.money import Money
+from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
+from apps.vending.throttling import parse_rate
+
+
+@pytest.fixture
+def rate_limits(settings):
+    settings.RATE_LIMITS = {
+        "order": {"user": "2/min", "client": "5/min"},
+        "balance": {"user": "2/min"},
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("apps.vending.throttling.time.time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def slot():
+    return VendingMachineSlotFactory(quantity=50, product__price=Money("0.50"))
+
+
+def new_user(name: str):
+    return UserFactory(name=name, balance=Money("50.00"))
+
+
+def order(client, user, slot, **headers):
+    return client.post("/order/", {"user_id": user.id, "slot_id": slot.id}, **headers)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("rate_limits", "clock")
+class TestRateLimiting:
+
+    def test_user_gets_429_with_retry_after_once_the_burst_is_spent(self, client, slot):
+        user = new_user("Ann")
+
+        responses = [order(client, user, slot) for _ in range(3)]
+
+        assert [response.status_code for response in responses] == [
+            status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS]
+        assert responses[2]["Retry-After"] == "30"
+        assert responses[2].json() == {"detail": "Request was throttled. Expected available in 30 seconds."}
+
+    def test_tokens_refill_over_time(self, client, slot, clock):
+        user = new_user("Ann")
+        order(client, user, slot)
+        order(client, user, slot)
+
+        clock[0] += 29
+        assert order(client, user, slot).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        clock[0] += 1
+        assert order(client, user, slot).status_code == status.HTTP_200_OK
+
+    def test_users_have_their_own_buckets_within_the_client_bucket(self, client, slot):
+        statuses = [order(client, new_user(name), slot).status_code for name in "ABCDEF"]
+
+        assert statuses == [status.HTTP_200_OK] * 5 + [status.HTTP_429_TOO_MANY_REQUESTS]
+
+    def test_clients_have_their_own_buckets(self, client, slot):
+        for name in "ABCDE":
+            order(client, new_user(name), slot, REMOTE_ADDR="10.0.0.1")
+
+        assert order(client, new_user("F"), slot, REMOTE_ADDR="10.0.0.2").status_code == status.HTTP_200_OK
+
+    def test_forwarded_for_is_ignored_without_proxies(self, client, slot):
+        for name in "ABCDE":
+            order(client, new_user(name), slot, HTTP_X_FORWARDED_FOR=f"10.0.0.{ord(name)}")
+
+        response = order(client, new_user("F"), slot, HTTP_X_FORWARDED_FOR="10.0.1.1")
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_limits_are_per_endpoint(self, client, slot):
+        user = new_user("Ann")
+        order(client, user, slot)
+        order(client, user, slot)
+
+        response = client.post("/balance/", {
+            "user_id": user.id, "type_operation": BalanceTypeOperation.ADD.value, "amount": "1.00"})
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_batch_orders_share_the_order_buckets(self, client, slot):
+        user = new_user("Ann")
+        order(client, user, slot)
+        order(client, user, slot)
+
+        response = client.post("/order/batch/", {"user_id": user.id, "slot_ids": [slot.id]},
+                               content_type="application/json")
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_throttled_requests_do_no_database_work(self, client, slot, django_assert_num_queries):
+        user = new_user("Ann")
+        order(client, user, slot)
+        order(client, user, slot)
+
+        with django_assert_num_queries(0):
+            response = order(client, user, slot)
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_rejected_requests_do_not_spend_tokens(self, client, slot, settings):
+        settings.RATE_LIMITS = {"order": {"user": "5/min", "client": "1/min"}}
+        user = new_user("Ann")
+        order(client, user, slot, REMOTE_ADDR="10.0.0.1")
+        order(client, user, slot, REMOTE_ADDR="10.0.0.1")
+
+        assert order(client, user, slot, REMOTE_ADDR="10.0.0.2").status_code == status.HTTP_200_OK
+
+    def test_scopes_without_limits_are_not_throttled(self, client, slot, settings):
+        settings.RATE_LIMITS = {}
+        user = new_user("Ann")
+
+        assert {order(client, user, slot).status_code for _ in range(5)} == {status.HTTP_200_OK}
+
+
+def test_parse_rate():
+    assert parse_rate("10/min") == (10, 60)
+    assert parse_rate("5/s") == (5, 1)
+    assert parse_rate("100/day") == (100, 86400)
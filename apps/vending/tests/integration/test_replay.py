@@ -0,0 +1,173 @@
+import json
+import os
+import signal
+from io import StringIO
+from uuid import uuid4
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from apps.vending.enums import BalanceTypeOperation
+from apps.vending.models import BalanceLedgerEntry, OrderEvent, User
+from apps.vending.money import Money
+from apps.vending import replay as replay_module
+from apps.vending.replay import partition, replay_operations
+from apps.vending.services import BalanceOperatorService
+from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
+
+
+def ndjson(*operations) -> str:
+    return "\n".join(op if isinstance(op, str) else json.dumps(op) for op in operations) + "\n"
+
+
+def replay(tmp_path, *operations, **options) -> tuple[str, str]:
+    path = tmp_path / "operations.ndjson"
+    path.write_text(ndjson(*operations))
+    out, err = StringIO(), StringIO()
+    call_command("replay_operations", str(path), stdout=out, stderr=err, **options)
+    return out.getvalue(), err.getvalue()
+
+
+def test_partition_ignores_uuid_spelling():
+    user_id = uuid4()
+
+    assert partition(str(user_id).upper(), 8) == partition(user_id.hex, 8) == partition(user_id, 8)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestReplayOperations:
+
+    def test_keeps_each_users_operations_in_order(self, tmp_path):
+        slot = VendingMachineSlotFactory(quantity=100)
+        users = [UserFactory(name=f"user {index}", balance=Money(0)) for index in range(6)]
+        operations = []
+        for user in users:
+            # Each order only succeeds once the top-up before it is applied.
+            operations += [
+                {"user_id": str(user.id), "type_operation": "add", "amount": "10.40"},
+                {"user_id": str(user.id), "slot_id": str(slot.id)},
+                {"user_id": str(user.id), "type_operation": "add", "amount": "1.00"},
+            ]
+
+        out, err = replay(tmp_path, *operations, workers=3, batch_size=2)
+
+        assert "Replayed 18 operations" in out
+        assert "18 succeeded, 0 failed" in out
+        assert err == ""
+        assert {user.balance for user in User.objects.all()} == {Money("1.00")}
+        assert OrderEvent.objects.count() == 6
+        assert BalanceLedgerEntry.objects.count() == 18
+        slot.refresh_from_db()
+        assert slot.quantity == 94
+
+    def test_reports_failed_operations_and_applies_the_rest(self, tmp_path):
+        slot = VendingMachineSlotFactory(quantity=1)
+        user = UserFactory(balance=Money("20.00"))
+        failures = tmp_path / "failures.ndjson"
+
+        out, _ = replay(
+            tmp_path,
+            {"user_id": str(user.id), "slot_id": str(slot.id)},
+            "{not json",
+            {"user_id": str(user.id), "slot_id": str(slot.id)},
+            {"user_id": str(uuid4()), "type_operation": "add", "amount": "1.00"},
+            {"user_id": str(user.id), "type_operation": "add", "amount": "-1.00"},
+            {"type_operation": "add", "amount": "1.00"},
+            "",
+            {"user_id": str(user.id), "type_operation": "add", "amount": "0.60"},
+            workers=2, batch_size=10, failures=str(failures),
+        )
+
+        assert "Replayed 7 operations" in out
+        assert "2 succeeded, 5 failed" in out
+        reported = [json.loads(line) for line in failures.read_text().splitlines()]
+        assert [(failure["line"], failure["operation"]) for failure in reported] == [
+            (2, None), (3, "order"), (4, "balance"), (5, "balance"), (6, None)]
+        assert reported[1]["error"] == "Not enough product quantity"
+        assert reported[2]["error"].startswith("User not found")
+        assert "Amount must to be greater than 0.00" in reported[3]["error"]
+        user.refresh_from_db()
+        assert user.balance == Money("10.20")
+
+    def test_an_unexpected_error_only_fails_its_own_operation(self, tmp_path, monkeypatch):
+        user = UserFactory(balance=Money(0))
+        execute = BalanceOperatorService.execute
+
+        def fails_on_refunds(service, dto):
+            if dto.type_operation == BalanceTypeOperation.REFUND:
+                raise TypeError("unexpected")
+            return execute(service, dto)
+
+        monkeypatch.setattr(BalanceOperatorService, "execute", fails_on_refunds)
+        add = {"user_id": str(user.id), "type_operation": "add", "amount": "1.00"}
+
+        out, err = replay(tmp_path, add, {"user_id": str(user.id), "type_operation": "refund"}, add,
+                          workers=1, batch_size=10)
+
+        assert "2 succeeded, 1 failed" in out
+        assert err.startswith("line 2 (balance): TypeError: unexpected")
+        user.refresh_from_db()
+        assert user.balance == Money("2.00")
+
+    def test_balance_operations_without_an_amount_are_rejected(self, tmp_path):
+        user = UserFactory(balance=Money("5.00"))
+        order_product = {"user_id": str(user.id), "type_operation": "order_product", "amount": "1.00"}
+        without_amount = {"user_id": str(user.id), "type_operation": "order_product"}
+
+        out, err = replay(tmp_path, order_product, without_amount, order_product,
+                          workers=1, batch_size=10)
+
+        assert "2 succeeded, 1 failed" in out
+        assert "Amount is required when type_operation is order_product" in err
+        user.refresh_from_db()
+        assert user.balance == Money("3.00")
+
+    def test_failures_go_to_stderr_by_default(self, tmp_path):
+        _, err = replay(tmp_path, {"user_id": str(uuid4()), "type_operation": "refund"}, workers=1)
+
+        assert err.startswith("line 1 (balance): User not found with ID")
+
+    def test_rejects_the_inventory_engine(self, tmp_path, settings):
+        settings.INVENTORY_ENGINE = True
+
+        with pytest.raises(CommandError, match="INVENTORY_ENGINE"):
+            replay(tmp_path, {"user_id": str(uuid4()), "type_operation": "refund"})
+
+    @pytest.mark.parametrize("operations", [3, 50])
+    def test_a_killed_worker_fails_the_replay(self, tmp_path, monkeypatch, operations):
+        user = UserFactory(balance=Money(0))
+        replay_batch = replay_module.replay_batch
+
+        def killed_on_the_second_batch(batch):
+            if batch[0][0] == 2:
+                os.kill(os.getpid(), signal.SIGKILL)
+            return replay_batch(batch)
+
+        monkeypatch.setattr(replay_module, "replay_batch", killed_on_the_second_batch)
+        monkeypatch.setattr(replay_module, "WORKER_CHECK_INTERVAL", 0.05)
+        operation = {"user_id": str(user.id), "type_operation": "add", "amount": "1.00"}
+
+        # With 50 operations the reader is blocked on the worker's full queue
+        # when it dies; with 3 it is waiting for the results.
+        with pytest.raises(CommandError, match="A replay worker died"):
+            replay(tmp_path, *[operation] * operations, workers=1, batch_size=1)
+
+        user.refresh_from_db()
+        assert user.balance == Money("1.00")
+
+    def test_missing_file_is_an_error(self, tmp_path):
+        with pytest.raises(CommandError, match="Cannot read"):
+            call_command("replay_operations", str(tmp_path / "missing.ndjson"))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replay_operations_returns_throughput(tmp_path):
+    user = UserFactory(balance=Money(0))
+    lines = [json.dumps({"user_id": str(user.id), "type_operation": "add", "amount": "0.01"})] * 50
+
+    result = replay_operations(lines, workers=2, batch_size=7)
+
+    assert result.operations == result.succeeded == 50
+    assert result.operations_per_second > 0
+    user.refresh_from_db()
+    assert user.balance == Money("0.50")
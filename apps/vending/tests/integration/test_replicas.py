@@ -0,0 +1,116 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from rest_framework import status
+
+from apps.vending.middleware import PRIMARY_PIN_COOKIE
+from apps.vending.models import VendingMachineSlot
+from apps.vending.money import Money
+from apps.vending.routers import PrimaryReplicaRouter
+from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
+
+
+def slot_quantities(response) -> list[int]:
+    return [slot["quantity"] for slot in response.json()]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestReplicaRouting:
+
+    def test_slot_reads_are_served_by_the_replica(self, client, replica):
+        slot = VendingMachineSlotFactory(quantity=5)
+        call_command("sync_replicas")
+        VendingMachineSlot.objects.filter(id=slot.id).update(quantity=1)
+
+        assert slot_quantities(client.get("/slots/")) == [5]
+        assert client.get(f"/slots/{slot.id}").json()["quantity"] == 5
+        streamed = client.get("/slots/?stream=true")
+        assert json.loads(b"".join(streamed.streaming_content))[0]["quantity"] == 5
+
+    def test_sync_replicas_copies_the_primary(self, client, replica):
+        call_command("sync_replicas")
+        VendingMachineSlotFactory(quantity=5)
+
+        assert client.get("/slots/").json() == []
+        call_command("sync_replicas")
+        assert slot_quantities(client.get("/slots/")) == [5]
+
+    def test_order_is_written_to_the_primary_and_pins_its_client(self, client, replica):
+        user = UserFactory(balance=Money("20.00"))
+        slot = VendingMachineSlotFactory(quantity=5)
+        call_command("sync_replicas")
+
+        response = client.post("/order/", {"user_id": user.id, "slot_id": slot.id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.cookies[PRIMARY_PIN_COOKIE]["max-age"] == 10
+        assert VendingMachineSlot.objects.get(id=slot.id).quantity == 4
+        assert slot_quantities(client.get("/slots/")) == [4]
+        assert slot_quantities(Client().get("/slots/")) == [5]
+
+    def test_cross_origin_clients_store_and_send_the_pin(self, client, replica):
+        user = UserFactory(balance=Money("20.00"))
+        slot = VendingMachineSlotFactory(quantity=5)
+        call_command("sync_replicas")
+        origin = {"HTTP_ORIGIN": "http://localhost:3000"}
+
+        response = client.post("/order/", {"user_id": user.id, "slot_id": slot.id}, **origin)
+        listing = client.get("/slots/", **origin)
+
+        assert response["Access-Control-Allow-Origin"] == "http://localhost:3000"
+        assert response["Access-Control-Allow-Credentials"] == "true"
+        assert PRIMARY_PIN_COOKIE in response.cookies
+        assert listing["Access-Control-Allow-Credentials"] == "true"
+        assert slot_quantities(listing) == [4]
+
+    def test_login_of_an_existing_user_does_not_pin(self, client, replica):
+        UserFactory(name="Cristian")
+        call_command("sync_replicas")
+
+        response = client.post("/login/", {"name": "CRISTIAN"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert PRIMARY_PIN_COOKIE not in response.cookies
+
+    def test_login_of_a_new_user_pins(self, client, replica):
+        call_command("sync_replicas")
+
+        response = client.post("/login/", {"name": "Cristian"})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert PRIMARY_PIN_COOKIE in response.cookies
+
+    def test_services_read_inside_their_transaction_on_the_primary(self, client, replica):
+        call_command("sync_replicas")
+        user = UserFactory(balance=Money("20.00"))
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        response = client.post("/order/", {"user_id": user.id, "slot_id": slot.id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["balance"] == "9.60"
+
+    def test_reads_do_not_pin(self, client, replica):
+        call_command("sync_replicas")
+        response = client.get("/slots/")
+
+        assert PRIMARY_PIN_COOKIE not in response.cookies
+
+    def test_planogram_renders_from_the_primary(self, client, replica):
+        call_command("sync_replicas")
+        VendingMachineSlotFactory(quantity=5)
+
+        assert len(client.get("/products/").json()) == 1
+
+
+@pytest.mark.django_db
+class TestPrimaryReplicaRouter:
+
+    def test_reads_outside_requests_use_the_primary(self, replica):
+        assert PrimaryReplicaRouter().db_for_read(VendingMachineSlot) == "default"
+
+    def test_replicas_are_never_migrated(self, replica):
+        assert not PrimaryReplicaRouter().allow_migrate("replica", "vending")
+        assert PrimaryReplicaRouter().allow_migrate("default", "vending")
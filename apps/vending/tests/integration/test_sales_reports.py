@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from django.db.models import Count, Sum
+from django.test import Client
+from rest_framework import status
+
+from apps.vending.enums import SalesPeriod
+from apps.vending.exceptions import OrderError
+from apps.vending.models import OrderEvent, SalesRollup
+from apps.vending.money import Money
+from apps.vending.request_dto import BatchOrderOperationDto, OrderLineDto, OrderOperationDto
+from apps.vending.services import BatchOrderOperatorService, OrderOperatorService
+from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
+
+NOON = datetime(2026, 10, 18, 12, 30, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """sets the time orders are placed at"""
+    now = [NOON]
+    monkeypatch.setattr("apps.vending.services.timezone.now", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def user():
+    return UserFactory(balance=Money("99.99"))
+
+
+@pytest.fixture
+def slots():
+    return [
+        VendingMachineSlotFactory(product__name="Water", product__price=Money("1.10"), row=1, quantity=50),
+        VendingMachineSlotFactory(product__name="Chips", product__price=Money("2.25"), row=2, quantity=50),
+    ]
+
+
+def order(user, slot):
+    return OrderOperatorService().execute(OrderOperationDto(user_id=user.id, slot_id=slot.id))
+
+
+def rollup(period: SalesPeriod, bucket: datetime, slot):
+    return SalesRollup.objects.values("quantity", "orders", "revenue").get(
+        period=period.value, bucket=bucket, slot_id=slot.id)
+
+
+@pytest.mark.django_db
+class TestSalesRollups:
+
+    def test_order_records_an_event_and_its_hour_and_day_rollups(self, clock, user, slots):
+        order(user, slots[0])
+
+        event = OrderEvent.objects.get()
+        assert (str(event.slot_id), str(event.product_id)) == (slots[0].id, slots[0].product.id)
+        assert (event.quantity, event.total_price, event.created_at) == (1, Money("1.10"), NOON)
+        expected = {"quantity": 1, "orders": 1, "revenue": Money("1.10")}
+        assert rollup(SalesPeriod.HOUR, datetime(2026, 10, 18, 12, tzinfo=dt_timezone.utc), slots[0]) == expected
+        assert rollup(SalesPeriod.DAY, datetime(2026, 10, 18, tzinfo=dt_timezone.utc), slots[0]) == expected
+
+    def test_orders_add_up_in_their_buckets(self, clock, user, slots):
+        order(user, slots[0])
+        order(user, slots[0])
+        clock[0] = NOON + timedelta(hours=1)
+        order(user, slots[0])
+
+        assert SalesRollup.objects.filter(period=SalesPeriod.HOUR.value).count() == 2
+        assert rollup(SalesPeriod.HOUR, datetime(2026, 10, 18, 12, tzinfo=dt_timezone.utc), slots[0])["quantity"] == 2
+        assert rollup(SalesPeriod.DAY, datetime(2026, 10, 18, tzinfo=dt_timezone.utc), slots[0]) == {
+            "quantity": 3, "orders": 3, "revenue": Money("3.30")}
+
+    def test_batch_order_records_one_event_per_slot(self, clock, user, slots):
+        BatchOrderOperatorService().execute(BatchOrderOperationDto(user_id=user.id, lines=[
+            OrderLineDto(slot_id=slots[0].id, quantity=2), OrderLineDto(slot_id=slots[1].id)]))
+
+        assert OrderEvent.objects.values("order_id").distinct().count() == 1
+        assert rollup(SalesPeriod.DAY, datetime(2026, 10, 18, tzinfo=dt_timezone.utc), slots[0]) == {
+            "quantity": 2, "orders": 1, "revenue": Money("2.20")}
+        assert rollup(SalesPeriod.DAY, datetime(2026, 10, 18, tzinfo=dt_timezone.utc), slots[1]) == {
+            "quantity": 1, "orders": 1, "revenue": Money("2.25")}
+
+    def test_failed_order_records_nothing(self, clock, slots):
+        with pytest.raises(OrderError):
+            order(UserFactory(balance=Money("0.00")), slots[0])
+
+        assert not OrderEvent.objects.exists()
+        assert not SalesRollup.objects.exists()
+
+    def test_rollups_match_the_events(self, clock, user, slots):
+        for minutes in range(0, 300, 7):
+            clock[0] = NOON + timedelta(minutes=minutes)
+            order(user, slots[minutes % 2])
+
+        events = OrderEvent.objects.aggregate(quantity=Sum("quantity"), orders=Count("id"), revenue=Sum("total_price"))
+        for period in SalesPeriod:
+            assert SalesRollup.objects.filter(period=period.value).aggregate(
+                quantity=Sum("quantity"), orders=Sum("orders"), revenue=Sum("revenue")) == events
+
+
+@pytest.mark.django_db
+class TestSalesReportView:
+
+    @pytest.fixture
+    def client(self, admin_client):
+        return admin_client
+
+    @pytest.mark.parametrize("user", [None, "customer"])
+    def test_non_staff_are_forbidden(self, django_user_model, user):
+        other = Client()
+        if user:
+            other.force_login(django_user_model.objects.create_user(username=user, password="secret"))
+
+        response = other.get("/reports/sales/")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert "rows" not in response.json()
+
+    def test_reports_sales_per_product_and_bucket(self, client, clock, user, slots):
+        order(user, slots[0])
+        order(user, slots[1])
+        clock[0] = NOON + timedelta(hours=1)
+        order(user, slots[0])
+
+        response = client.get("/reports/sales/", {
+            "period": "hour", "start": "2026-10-18T00:00:00Z", "end": "2026-10-19T00:00:00Z"})
+
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        assert (body["period"], body["start"], body["end"]) == ("hour", "2026-10-18T00:00:00Z", "2026-10-19T00:00:00Z")
+        assert [(row["bucket"], row["product_id"], row["quantity"], row["revenue"]) for row in body["rows"]] == sorted([
+            ("2026-10-18T12:00:00Z", slots[0].product.id, 1, "1.10"),
+            ("2026-10-18T12:00:00Z", slots[1].product.id, 1, "2.25"),
+            ("2026-10-18T13:00:00Z", slots[0].product.id, 1, "1.10"),
+        ])
+
+    def test_groups_by_slot(self, client, clock, user, slots):
+        order(user, slots[0])
+
+        response = client.get("/reports/sales/", {"group_by": "slot", "end": "2026-10-19T00:00:00Z"})
+
+        [row] = response.json()["rows"]
+        assert (row["bucket"], row["slot_id"], row["product_id"]) == ("2026-10-18T00:00:00Z", slots[0].id, None)
+
+    def test_reads_one_row_per_bucket_however_many_orders(self, client, clock, user, slots,
+                                                         django_assert_num_queries):
+        for _ in range(20):
+            order(user, slots[0])
+
+        # One query for the report, two for the staff user's session.
+        with django_assert_num_queries(3):
+            response = client.get("/reports/sales/", {"end": "2026-10-19T00:00:00Z"})
+
+        assert [row["orders"] for row in response.json()["rows"]] == [20]
+
+    def test_defaults_to_the_last_buckets(self, client):
+        response = client.get("/reports/sales/")
+
+        body = response.json()
+        assert body["period"] == "day"
+        assert body["rows"] == []
+
+    @pytest.mark.parametrize("params", [
+        {"period": "week"},
+        {"start": "2026-10-19T00:00:00Z", "end": "2026-10-18T00:00:00Z"},
+        {"period": "hour", "start": "2020-01-01T00:00:00Z", "end": "2026-01-01T00:00:00Z"},
+    ])
+    def test_invalid_windows_are_rejected(self, client, params):
+        response = client.get("/reports/sales/", params)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,112 @@
+import uuid
+
+import pytest
+import yaml
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.urls import resolve
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from apps.vending import schema
+from apps.vending.openapi import _documentation
+from apps.vending.schema import load_schema
+
+
+@pytest.fixture(autouse=True)
+def fresh_schema(settings):
+    settings.OPENAPI_SCHEMA_DIR = None
+    load_schema.cache_clear()
+    yield
+    load_schema.cache_clear()
+
+
+def spectacular_schema(**headers) -> bytes:
+    response = SpectacularAPIView.as_view()(APIRequestFactory().get("/schema/", **headers))
+    return response.render().content
+
+
+class TestSchema:
+
+    def test_schema_matches_drf_spectacular_output(self, client):
+        response = client.get("/schema/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/vnd.oai.openapi"
+        assert response.content == spectacular_schema()
+
+    def test_documents_every_endpoint(self, client):
+        paths = yaml.safe_load(client.get("/schema/").content)["paths"]
+
+        assert set(paths) == {
+            "/healthcheck/", "/schema/", "/login/", "/balance/", "/order/", "/order/batch/",
+            "/slots/", "/slots/{id}", "/slots/bulk/", "/products/", "/products/stream/",
+            "/machines/{machine_id}/slots/", "/machines/{machine_id}/products/",
+            "/machines/{machine_id}/products/stream/", "/reports/sales/",
+        }
+        assert paths["/slots/{id}"]["get"]["responses"]["200"]["content"]["application/json"]["schema"] == {
+            "$ref": "#/components/schemas/VendingMachineSlot"}
+        assert "text/event-stream" in paths["/products/stream/"]["get"]["responses"]["200"]["content"]
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("path", ["/healthcheck/", "/schema/", f"/machines/{uuid.uuid4()}/products/"])
+    def test_documented_views_respond_like_the_plain_views(self, client, path):
+        match = resolve(path)
+        documented = _documentation(match.func)
+
+        response = documented(APIRequestFactory().get(path), *match.args, **match.kwargs)
+
+        expected = client.get(path)
+        assert (response.status_code, response.content) == (expected.status_code, expected.content)
+
+    @pytest.mark.parametrize("query,headers", [
+        ("?format=json", {}),
+        ("", {"HTTP_ACCEPT": "application/json"}),
+        ("", {"HTTP_ACCEPT": "application/vnd.oai.openapi+json"}),
+    ])
+    def test_json_is_served_on_request(self, client, query, headers):
+        response = client.get(f"/schema/{query}", **headers)
+
+        assert response["Content-Type"] == "application/vnd.oai.openapi+json"
+        assert response.content == spectacular_schema(HTTP_ACCEPT="application/vnd.oai.openapi+json")
+
+    def test_unknown_format_is_not_found(self, client):
+        assert client.get("/schema/?format=xml").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_schema_is_generated_once(self, client, monkeypatch):
+        calls = []
+        generate_schema = schema.generate_schema
+        monkeypatch.setattr(schema, "generate_schema", lambda: calls.append(1) or generate_schema())
+
+        first = client.get("/schema/")
+        second = client.get("/schema/?format=json")
+
+        assert len(calls) == 1
+        assert first["ETag"] != second["ETag"]
+
+    def test_unchanged_schema_is_revalidated_without_a_body(self, client):
+        etag = client.get("/schema/")["ETag"]
+
+        response = client.get("/schema/", HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response["ETag"] == etag
+        assert response["Cache-Control"] == "no-cache"
+
+    def test_built_schema_files_are_served(self, client, settings, tmp_path):
+        call_command("build_schema", output=str(tmp_path))
+        (tmp_path / "schema.yaml").write_bytes(b"openapi: 3.0.3\n")
+        settings.OPENAPI_SCHEMA_DIR = str(tmp_path)
+
+        response = client.get("/schema/")
+
+        assert response.content == b"openapi: 3.0.3\n"
+        assert client.get("/schema/?format=json").content == (tmp_path / "schema.json").read_bytes()
+
+    def test_missing_built_schema_is_a_configuration_error(self, settings, tmp_path):
+        settings.OPENAPI_SCHEMA_DIR = str(tmp_path)
+
+        with pytest.raises(ImproperlyConfigured):
+            load_schema()
@@ -0,0 +1,91 @@
+import json
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from rest_framework import status
+
+from apps.vending.middleware import ServerTimingMiddleware
+
+from apps.vending.money import Money
+from apps.vending.tests.factories import UserFactory, VendingMachineSlotFactory
+
+
+@pytest.fixture
+def server_timing(settings):
+    settings.MIDDLEWARE = [
+        "apps.vending.middleware.ServerTimingMiddleware", *settings.MIDDLEWARE]
+
+
+def parse_server_timing(header: str) -> dict[str, str]:
+    metrics = {}
+    for metric in header.split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+@pytest.mark.django_db
+class TestServerTiming:
+
+    def test_order_reports_db_view_and_serialization_timings(self, client, server_timing, caplog):
+        user = UserFactory(balance=Money("20.00"))
+        slot = VendingMachineSlotFactory(quantity=5)
+
+        with caplog.at_level(logging.INFO, logger="apps.vending.server_timing"):
+            response = client.post("/order/", {"user_id": user.id, "slot_id": slot.id})
+
+        assert response.status_code == status.HTTP_200_OK
+        metrics = parse_server_timing(response["Server-Timing"])
+        assert set(metrics) == {
+            "db", "view", "render", "validation", "service", "serialization", "total"}
+        # stock, price, debit, ledger entry, order event and rollups, plus the
+        # test's savepoint pair
+        assert metrics["db"]["desc"] == '"8 queries"'
+        assert all(float(metric["dur"]) >= 0 for metric in metrics.values())
+
+        log_line = json.loads(caplog.records[-1].getMessage())
+        assert log_line["path"] == "/order/"
+        assert log_line["status"] == status.HTTP_200_OK
+        assert log_line["db_queries"] == 8
+        assert log_line["total_ms"] >= log_line["view_ms"]
+
+    def test_plain_responses_report_view_time_without_render(self, client, server_timing):
+        response = client.get("/healthcheck/")
+
+        metrics = parse_server_timing(response["Server-Timing"])
+        assert set(metrics) == {"db", "view", "total"}
+        assert metrics["db"]["desc"] == '"0 queries"'
+
+    def test_middleware_runs_natively_on_both_handlers(self):
+        assert ServerTimingMiddleware.sync_capable
+        assert ServerTimingMiddleware.async_capable
+
+    def test_async_views_report_their_queries(self, async_client, server_timing):
+        VendingMachineSlotFactory(quantity=5)
+
+        async def get():
+            return await async_client.get("/slots/")
+
+        response = async_to_sync(get)()
+
+        assert response.status_code == status.HTTP_200_OK
+        metrics = parse_server_timing(response["Server-Timing"])
+        assert set(metrics) == {"db", "view", "total"}
+        assert metrics["db"]["desc"] != '"0 queries"'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_replica_queries_are_reported(self, client, server_timing, replica):
+        VendingMachineSlotFactory(quantity=5)
+        call_command("sync_replicas")
+
+        response = client.get("/slots/")
+
+        assert response.json()[0]["quantity"] == 5
+        assert parse_server_timing(response["Server-Timing"])["db"]["desc"] == '"1 queries"'
+
+    def test_no_header_when_middleware_is_not_installed(self, client):
+        response = client.get("/healthcheck/")
+
+        assert "Server-Timing" not in response
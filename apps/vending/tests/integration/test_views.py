@@ -1,4 +1,4 @@
-from decimal import Decimal
+import json
 from unittest.mock import ANY
 
 import pytest
@@ -6,7 +6,9 @@ from rest_framework import status
 from apps.vending.enums import BalanceTypeOperation
 
 from apps.vending.models import Product, User, VendingMachineSlot
-from apps.vending.tests.factories import ProductFactory, VendingMachineSlotFactory
+from apps.vending.money import Money
+from apps.vending.planogram import planogram_cache
+from apps.vending.tests.factories import MachineFactory, ProductFactory, UserFactory, VendingMachineSlotFactory
 
 
 @pytest.fixture
@@ -27,6 +29,17 @@ def slots_grid(products_list) -> list[VendingMachineSlot]:
     return slots
 
 
+@pytest.fixture
+def full_slots_grid() -> list[VendingMachineSlot]:
+    """returns a full machine grid of 10x5 slots, each with its own product"""
+    return [
+        VendingMachineSlotFactory(
+            product__name=f"Product {row}-{column}", row=row, column=column)
+        for row in range(1, 11)
+        for column in range(1, 6)
+    ]
+
+
 @pytest.fixture
 def products_grid(products_list) -> list[Product]:
     """returns a grid of product of 2x2"""
@@ -59,7 +72,7 @@ class TestLogin:
         assert response.status_code == status.HTTP_201_CREATED
 
         user = User.objects.get(id=response.json()["id"])
-        user.balance = Decimal("10.40")
+        user.balance = Money("10.40")
         user.save()
 
         new_response = client.post("/login/", {
@@ -70,6 +83,19 @@ class TestLogin:
         assert new_response.json()["name"] == "Juan Praderas"
         assert new_response.json()["balance"] == '10.40'
 
+    def test_login_ignores_case_of_existing_user(self, client):
+        response = client.post("/login/", {
+            "name": "Juan Praderas"
+        })
+
+        new_response = client.post("/login/", {
+            "name": "JUAN PRADERAS"
+        })
+
+        assert new_response.status_code == status.HTTP_200_OK
+        assert new_response.json()["id"] == response.json()["id"]
+        assert new_response.json()["name"] == "Juan Praderas"
+
 
 @pytest.mark.django_db
 class TestListVendingMachineSlots:
@@ -153,6 +179,82 @@ class TestListVendingMachineSlots:
         assert response.status_code == status.HTTP_200_OK
         assert response.json() == expected_response
 
+    def test_list_slots_queries_do_not_grow_with_slots(self, client, full_slots_grid, django_assert_max_num_queries):
+        with django_assert_max_num_queries(1):
+            response = client.get("/slots/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 50
+
+    def test_slot_detail_loads_product_in_one_query(self, client, full_slots_grid, django_assert_max_num_queries):
+        slot = full_slots_grid[0]
+        with django_assert_max_num_queries(1):
+            response = client.get(f"/slots/{slot.id}")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["product"]["name"] == "Product 1-1"
+
+    def test_list_slots_pages_follow_next_links(self, client, full_slots_grid):
+        slots, pages = [], 0
+        url = "/slots/?page_size=7"
+        while url:
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.json()) <= 7
+            slots += response.json()
+            pages += 1
+            link = response.get("Link")
+            url = link[1:link.index(">")] if link else None
+
+        assert pages == 8
+        assert [(slot["row"], slot["column"]) for slot in slots] == [
+            (slot.row, slot.column) for slot in full_slots_grid]
+
+    def test_list_slots_pages_keep_quantity_filter(self, client, slots_grid):
+        first_page = client.get("/slots/?quantity=1&page_size=3")
+        next_url = first_page["Link"][1:first_page["Link"].index(">")]
+        second_page = client.get(next_url)
+
+        assert "quantity=1" in next_url
+        assert [slot["quantity"] for slot in first_page.json()] == [0, 1, 0]
+        assert [slot["quantity"] for slot in second_page.json()] == [1]
+        assert "Link" not in second_page
+
+    def test_list_slots_last_page_has_no_next_link(self, client, slots_grid):
+        response = client.get("/slots/?page_size=10")
+
+        assert len(response.json()) == 10
+        assert "Link" not in response
+
+    def test_list_slots_stream_returns_every_slot_in_chunks(self, client, full_slots_grid, settings):
+        settings.STREAMING_CHUNK_SIZE = 20
+        response = client.get("/slots/?stream=true")
+        chunks = list(response.streaming_content)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/json"
+        assert "Link" not in response
+        assert len(chunks) == 4
+        assert b"".join(chunks) == client.get("/slots/?page_size=50").content
+
+    def test_list_slots_stream_keeps_filter_and_cursor(self, client, slots_grid):
+        first_page = client.get("/slots/?quantity=1&page_size=1")
+        cursor = first_page["Link"].split("cursor=")[1].split(">")[0]
+        response = client.get(f"/slots/?quantity=1&stream=true&cursor={cursor}")
+
+        assert [slot["quantity"] for slot in json.loads(b"".join(response.streaming_content))] == [1, 0, 1]
+
+    def test_invalid_cursor_returns_bad_request(self, client):
+        response = client.get("/slots/?cursor=not-a-cursor")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"cursor": ["Invalid cursor"]}
+
+    def test_page_size_above_maximum_returns_bad_request(self, client):
+        response = client.get("/slots/?page_size=100000")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_invalid_quantity_filter_returns_bad_request(self, client):
         response = client.get("/slots/?quantity=-1")
         assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -293,6 +395,135 @@ class TestListProducts:
         assert response.status_code == status.HTTP_200_OK
         assert response.json() == expected_response
 
+    def test_list_products_stream_matches_cached_planogram(self, client, full_slots_grid, settings):
+        settings.STREAMING_CHUNK_SIZE = 7
+        response = client.get("/products/?stream=true")
+
+        assert response.streaming
+        assert b"".join(response.streaming_content) == client.get("/products/").content
+        assert planogram_cache.stats() == {"hits": 0, "misses": 1}
+
+    def test_list_products_queries_do_not_grow_with_slots(self, client, full_slots_grid, django_assert_max_num_queries):
+        with django_assert_max_num_queries(1):
+            response = client.get("/products/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [len(row) for row in response.json()] == [5] * 10
+
+    def test_list_products_is_served_from_cache_without_queries(self, client, slots_grid, django_assert_num_queries):
+        first_response = client.get("/products/")
+
+        with django_assert_num_queries(0):
+            second_response = client.get("/products/")
+
+        assert first_response["X-Planogram-Cache"] == "miss"
+        assert second_response["X-Planogram-Cache"] == "hit"
+        assert second_response.content == first_response.content
+        assert planogram_cache.stats() == {"hits": 1, "misses": 1}
+
+    def test_list_products_is_refreshed_after_order(self, client, slots_grid, django_capture_on_commit_callbacks):
+        user = UserFactory(balance=Money("20.00"))
+        slot = slots_grid[1]
+        client.get("/products/")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post("/order/", {"user_id": user.id, "slot_id": slot.id})
+        response = client.get("/products/")
+
+        assert response["X-Planogram-Cache"] == "miss"
+        assert response.json()[0][1]["quantity"] == 0
+
+    def test_list_products_is_refreshed_after_product_edit(self, client, slots_grid, django_capture_on_commit_callbacks):
+        client.get("/products/")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product = slots_grid[0].product
+            product.price = Money("1.25")
+            product.save()
+        response = client.get("/products/")
+
+        assert response["X-Planogram-Cache"] == "miss"
+        assert response.json()[0][0]["price"] == "1.25"
+
+
+@pytest.fixture
+def two_machines() -> list:
+    """returns two machines of 2x2 slots, quantity 1 in the first and 2 in the second"""
+    machines = [MachineFactory(name="Lobby"), MachineFactory(name="Gym")]
+    for quantity, machine in enumerate(machines, start=1):
+        for row in range(1, 3):
+            for column in range(1, 3):
+                VendingMachineSlotFactory(
+                    machine=machine, product__name=f"{machine.name} {row}-{column}",
+                    row=row, column=column, quantity=quantity)
+    return machines
+
+
+@pytest.mark.django_db
+class TestMachineEndpoints:
+
+    def test_machine_slots_only_lists_its_own_slots(self, client, two_machines):
+        response = client.get(f"/machines/{two_machines[1].id}/slots/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [slot["product"]["name"] for slot in response.json()] == [
+            "Gym 1-1", "Gym 1-2", "Gym 2-1", "Gym 2-2"]
+
+    def test_machine_slots_keep_filters_and_pagination(self, client, two_machines):
+        path = f"/machines/{two_machines[0].id}/slots/"
+        first_page = client.get(f"{path}?quantity=1&page_size=3")
+        second_page = client.get(first_page["Link"][1:first_page["Link"].index(">")])
+
+        assert len(first_page.json()) == 3
+        assert [slot["product"]["name"] for slot in second_page.json()] == ["Lobby 2-2"]
+        assert client.get(f"/machines/{two_machines[1].id}/slots/?quantity=1").json() == []
+
+    def test_machine_products_returns_its_planogram(self, client, two_machines):
+        response = client.get(f"/machines/{two_machines[0].id}/products/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [[product["name"] for product in row] for row in response.json()] == [
+            ["Lobby 1-1", "Lobby 1-2"], ["Lobby 2-1", "Lobby 2-2"]]
+
+    def test_machine_products_are_cached_per_machine(self, client, two_machines, django_assert_num_queries):
+        lobby = client.get(f"/machines/{two_machines[0].id}/products/")
+        gym = client.get(f"/machines/{two_machines[1].id}/products/")
+
+        with django_assert_num_queries(0):
+            cached_gym = client.get(f"/machines/{two_machines[1].id}/products/")
+
+        assert lobby.content != gym.content
+        assert cached_gym["X-Planogram-Cache"] == "hit"
+        assert cached_gym.content == gym.content
+
+    def test_machine_reads_take_one_query(self, client, two_machines, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            client.get(f"/machines/{two_machines[0].id}/slots/")
+        with django_assert_num_queries(1):
+            client.get(f"/machines/{two_machines[0].id}/products/")
+
+    def test_empty_machine_returns_empty_listings(self, client):
+        machine = MachineFactory(name="Empty")
+
+        assert client.get(f"/machines/{machine.id}/slots/").json() == []
+        assert client.get(f"/machines/{machine.id}/products/").json() == []
+
+    def test_machine_listings_stream(self, client, two_machines):
+        path = f"/machines/{two_machines[1].id}"
+
+        for resource in ["slots", "products"]:
+            response = client.get(f"{path}/{resource}/?stream=true")
+
+            assert b"".join(response.streaming_content) == client.get(f"{path}/{resource}/").content
+
+    @pytest.mark.parametrize("query", ["", "?stream=true"])
+    @pytest.mark.parametrize("resource", ["slots", "products"])
+    def test_unknown_machine_returns_not_found(self, client, resource, query):
+        response = client.get(f"/machines/3fa85f64-5717-4562-b3fc-2c963f66afa6/{resource}/{query}")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {"message": "Machine not found"}
+
 
 @pytest.mark.django_db
 class TestOrderProduct:
@@ -302,17 +533,75 @@ class TestOrderProduct:
             "name": "Juan Praderas"
         })
         User.objects.update(id=response_login.json()[
-                            "id"], balance=Decimal("21.40"))
+                            "id"], balance=Money("21.40"))
 
+        # slots_grid leaves the first column empty and slots have random ids,
+        # so the first slot by id is only in stock four times out of five.
         response = client.post("/order/", {
             "user_id": response_login.json()["id"],
-            "slot_id": VendingMachineSlot.objects.all().first().id
+            "slot_id": VendingMachineSlot.objects.filter(quantity__gt=0).first().id
         })
 
         assert response.status_code == status.HTTP_200_OK
         assert response.json()["balance"] == "11.00"
 
 
+@pytest.mark.django_db
+class TestBatchOrderProduct:
+
+    def test_batch_order_with_slot_ids_returns_expected_response(self, client, slots_grid):
+        user = UserFactory(balance=Money("50.00"))
+
+        response = client.post("/order/batch/", {
+            "user_id": user.id,
+            "slot_ids": [slots_grid[4].id, slots_grid[4].id, slots_grid[9].id],
+        }, content_type="application/json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "user": {"id": str(user.id), "name": user.name, "balance": "18.80"},
+            "lines": [
+                {"slot_id": str(slots_grid[4].id), "quantity": 2,
+                 "unit_price": "10.40", "total_price": "20.80"},
+                {"slot_id": str(slots_grid[9].id), "quantity": 1,
+                 "unit_price": "10.40", "total_price": "10.40"},
+            ],
+            "total_price": "31.20",
+        }
+
+    def test_batch_order_with_items_returns_expected_response(self, client, slots_grid):
+        user = UserFactory(balance=Money("50.00"))
+
+        response = client.post("/order/batch/", {
+            "user_id": user.id,
+            "items": [{"slot_id": slots_grid[3].id, "quantity": 3}],
+        }, content_type="application/json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["user"]["balance"] == "18.80"
+        assert VendingMachineSlot.objects.get(id=slots_grid[3].id).quantity == 0
+
+    def test_batch_order_returns_bad_request_when_balance_is_not_enough(self, client, slots_grid):
+        user = UserFactory(balance=Money("20.00"))
+
+        response = client.post("/order/batch/", {
+            "user_id": user.id,
+            "slot_ids": [slots_grid[3].id, slots_grid[4].id],
+        }, content_type="application/json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"message": "Not enough balance"}
+
+    def test_batch_order_requires_slot_ids_or_items(self, client):
+        response = client.post("/order/batch/", {
+            "user_id": UserFactory.build().id,
+        }, content_type="application/json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"non_field_errors": [
+            "Exactly one of slot_ids or items is required"]}
+
+
 @pytest.mark.django_db
 class TestBalance:
 
@@ -321,7 +610,7 @@ class TestBalance:
             "name": "Juan Praderas"
         })
         User.objects.update(id=response_login.json()[
-                            "id"], balance=Decimal("5.50"))
+                            "id"], balance=Money("5.50"))
 
         response = client.post("/balance/", {
             "user_id": response_login.json()["id"],
@@ -332,12 +621,23 @@ class TestBalance:
         assert response.status_code == status.HTTP_200_OK
         assert response.json()["balance"] == "15.50"
 
+    def test_order_product_without_amount_is_rejected(self, client):
+        user = UserFactory(balance=Money("5.50"))
+
+        response = client.post("/balance/", {
+            "user_id": user.id,
+            "type_operation": BalanceTypeOperation.ORDER_PRODUCT.value,
+        })
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"non_field_errors": ["Amount is required when type_operation is order_product"]}
+
     def test_balance_returns_expected_response_when_refund(self, client):
         response_login = client.post("/login/", {
             "name": "Juan Praderas"
         })
         User.objects.update(id=response_login.json()[
-                            "id"], balance=Decimal("5.50"))
+                            "id"], balance=Money("5.50"))
 
         response = client.post("/balance/", {
             "user_id": response_login.json()["id"],
@@ -353,7 +653,7 @@ class TestBalance:
             "name": "Juan Praderas"
         })
         User.objects.update(id=response_login.json()[
-                            "id"], balance=Decimal("15.50"))
+                            "id"], balance=Money("15.50"))
 
         response = client.post("/balance/", {
             "user_id": response_login.json()["id"],
@@ -363,3 +663,28 @@ class TestBalance:
 
         assert response.status_code == status.HTTP_200_OK
         assert response.json()["balance"] == "5.50"
+
+    def test_balance_accepts_json_numbers_beyond_two_digit_amounts(self, client):
+        user = UserFactory(balance=Money("99.99"))
+
+        response = client.post("/balance/", {
+            "user_id": str(user.id),
+            "type_operation": BalanceTypeOperation.ADD.value,
+            "amount": 1500.5,
+        }, content_type="application/json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["balance"] == "1600.49"
+        assert User.objects.get(id=user.id).balance == Money(160049)
+
+    def test_balance_rejects_fractions_of_a_cent(self, client):
+        user = UserFactory()
+
+        response = client.post("/balance/", {
+            "user_id": str(user.id),
+            "type_operation": BalanceTypeOperation.ADD.value,
+            "amount": "1.005",
+        }, content_type="application/json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"amount": ["Ensure that there are no more than 2 decimal places."]}
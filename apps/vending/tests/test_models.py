@@ -1,8 +1,21 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+import uuid
+from datetime import timedelta
+
+from django.apps import apps as django_apps
+from django.conf import settings
 from django.db.utils import IntegrityError
+from django.utils import timezone
 import pytest
-from decimal import Decimal, InvalidOperation
 from apps.vending.models import Product, VendingMachineSlot, User
-from apps.vending.tests.factories import ProductFactory, VendingMachineSlotFactory, UserFactory
+from apps.vending.money import Money
+from apps.vending.pagination import SLOT_KEYSET, _after
+from apps.vending.renderers import slot_rows
+from apps.vending.tests.factories import MachineFactory, ProductFactory, VendingMachineSlotFactory, UserFactory
 from django.core.exceptions import ValidationError
 
 
@@ -14,17 +27,18 @@ class TestProductModel:
         [
             ("Ramon de pitis", "4.99", None),
             ("Mariano Delgado", "0.00", None),
-            ("Sin animo de lucro", "2.99", "de algeciras")
+            ("Sin animo de lucro", "2.99", "de algeciras"),
+            ("Lingote de oro", "199999.99", None),
         ],
-        ids=["with_name_and_price", "price_0", "with_description"]
+        ids=["with_name_and_price", "price_0", "with_description", "with_big_price"]
     )
-    def test_product_creation(self, name: str, price: Decimal, description: str):
+    def test_product_creation(self, name: str, price: str, description: str):
         test_product = ProductFactory(
-            name=name, price=Decimal(price), description=description)
+            name=name, price=Money(price), description=description)
 
         stored_product = Product.objects.get(id=test_product.id)
 
-        assert stored_product.price == Decimal(price)
+        assert stored_product.price == Money(price)
         assert stored_product.name == name
         assert stored_product.description == description
 
@@ -33,16 +47,16 @@ class TestProductModel:
         [
             (None, "1.95",  None, IntegrityError),
             ("Mariano Delgado", None, None, TypeError),
-            ("Ramon de Pitis", "199999", None, InvalidOperation),
+            ("Ramon de Pitis", "1.999", None, ValueError),
             ("Sin animo de lucro", None, 44, TypeError)
         ],
         ids=["without_name", "without_price",
-             "without_big_price", "wrong_description"]
+             "with_fractional_cents", "wrong_description"]
     )
-    def test_product_creation_fail(self, name: str, price: Decimal, description: str, expected_error: Exception):
+    def test_product_creation_fail(self, name: str, price: str, description: str, expected_error: Exception):
         with pytest.raises(expected_error):
             ProductFactory(
-                name=name, price=Decimal(price), description=description)
+                name=name, price=Money(price), description=description)
 
 
 @pytest.fixture
@@ -95,6 +109,70 @@ class TestVendingMachineSlotModel:
                 product=product_fixture, quantity=quantity, row=row, column=column)
             slot.full_clean()
 
+    def test_vending_machine_slot_grid_position_is_unique(self, product_fixture):
+        VendingMachineSlotFactory(product=product_fixture, row=2, column=3)
+        with pytest.raises(IntegrityError):
+            VendingMachineSlotFactory(product=product_fixture, row=2, column=3)
+
+    def test_same_grid_position_is_allowed_in_other_machine(self, product_fixture):
+        VendingMachineSlotFactory(product=product_fixture, row=2, column=3)
+        VendingMachineSlotFactory(
+            product=product_fixture, row=2, column=3, machine=MachineFactory(name="Gym"))
+
+        assert VendingMachineSlot.objects.filter(row=2, column=3).count() == 2
+
+
+@pytest.mark.django_db
+class TestIndexes:
+
+    def test_grid_position_lookup_uses_index(self):
+        plan = VendingMachineSlot.objects.filter(row=1, column=2).explain()
+
+        assert "USING INDEX" in plan
+        assert "(row=? AND column=?)" in plan
+
+    def test_grid_ordering_uses_index_instead_of_sorting(self):
+        plan = VendingMachineSlot.objects.select_related(
+            "product").order_by("row", "column").explain()
+
+        assert "SCAN vending_machine_slot USING INDEX" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_slots_keyset_page_seeks_grid_index(self):
+        plan = slot_rows(VendingMachineSlot.objects.all()).filter(
+            _after((5, 3, uuid.uuid4()))).order_by(*SLOT_KEYSET)[:11].explain()
+
+        assert "SEARCH vending_machine_slot USING INDEX" in plan
+        assert "(row>?)" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_machine_planogram_seeks_machine_grid_index(self):
+        plan = VendingMachineSlot.objects.filter(
+            machine_id=uuid.uuid4()).order_by("row", "column").explain()
+
+        # SQLite names the index of the unique constraint sqlite_autoindex_*.
+        assert "SEARCH vending_machine_slot USING INDEX" in plan
+        assert "(machine_id=?)" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_machine_slots_keyset_page_seeks_machine_grid_index(self):
+        plan = slot_rows(VendingMachineSlot.objects.filter(machine_id=uuid.uuid4())).filter(
+            _after((5, 3, uuid.uuid4()))).order_by(*SLOT_KEYSET)[:11].explain()
+
+        assert "(machine_id=? AND row>?)" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_low_stock_filter_uses_quantity_index(self):
+        plan = VendingMachineSlot.objects.filter(quantity__lte=2).explain()
+
+        assert "USING INDEX slot_quantity_idx" in plan
+
+    def test_login_lookup_uses_normalized_name_index(self):
+        plan = User.objects.filter(normalized_name="cristian").explain()
+
+        assert "SEARCH user USING INDEX" in plan
+        assert "(normalized_name=?)" in plan
+
 
 @pytest.mark.django_db
 class TestUserModel:
@@ -106,4 +184,83 @@ class TestUserModel:
         stored_user = User.objects.get(name=test_user.name)
 
         assert stored_user.name == "Cristian"
-        assert stored_user.balance == Decimal("15")
+        assert stored_user.balance == Money("15")
+
+    def test_user_normalized_name_is_stored_on_save(self):
+        test_user = UserFactory(name="CrIsTiAn")
+
+        stored_user = User.objects.get(normalized_name="cristian")
+
+        assert stored_user.id == test_user.id
+
+    def test_user_normalized_name_is_unique(self):
+        UserFactory(name="Cristian")
+        with pytest.raises(IntegrityError):
+            UserFactory(name="CRISTIAN")
+
+    def test_user_name_is_validated_case_insensitively(self):
+        test_user = UserFactory(name="Cristian")
+
+        with pytest.raises(ValidationError, match="A user with this name already exists"):
+            User(name="CRISTIAN").full_clean()
+        test_user.full_clean()
+
+    def test_normalized_names_migration_renames_case_duplicates(self):
+        normalize_names = importlib.import_module(
+            "apps.vending.migrations.0017_user_normalized_name").normalize_names
+        # bulk_create skips save(), so the rows look like the ones before the migration
+        names = ["Cristian", "CRISTIAN", "cristian", "Cristian (2)", "Ana"]
+        User.objects.bulk_create([User(name=name) for name in names])
+        for i, name in enumerate(names):
+            User.objects.filter(name=name).update(created_at=timezone.now() + timedelta(seconds=i))
+
+        normalize_names(django_apps, None)
+
+        assert dict(User.objects.values_list("name", "normalized_name")) == {
+            "Cristian": "cristian",
+            "CRISTIAN (2)": "cristian (2)",
+            "cristian (3)": "cristian (3)",
+            "Cristian (2) (2)": "cristian (2) (2)",
+            "Ana": "ana",
+        }
+
+
+# Reads the PRAGMAs of a new connection to a scratch database, opened in a
+# fresh interpreter because the profile is chosen when settings load.
+PROFILE_SCRIPT = """
+import json, sys
+import django
+from django.conf import settings
+django.setup()
+settings.DATABASES["default"]["NAME"] = sys.argv[1]
+from django.db import connection
+with connection.cursor() as cursor:
+    pragmas = {}
+    for pragma in ["journal_mode", "busy_timeout", "synchronous", "cache_size", "temp_store"]:
+        cursor.execute(f"PRAGMA {pragma}")
+        pragmas[pragma] = cursor.fetchone()[0]
+print(json.dumps({**pragmas, "conn_max_age": connection.settings_dict["CONN_MAX_AGE"]}))
+"""
+
+
+def database_profile(tmp_path, **environ) -> dict:
+    child = subprocess.run(
+        [sys.executable, "-c", PROFILE_SCRIPT, str(tmp_path / "profile.sqlite3")],
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": "vending_machine.settings", **environ},
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+    return json.loads(child.stdout)
+
+
+class TestDatabaseProfile:
+
+    def test_default_profile_waits_for_locks_without_tuning(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("SQLITE_PRODUCTION", raising=False)
+
+        assert database_profile(tmp_path) == {
+            "journal_mode": "delete", "busy_timeout": 20000, "synchronous": 2,
+            "cache_size": -2000, "temp_store": 0, "conn_max_age": 0}
+
+    def test_production_profile_is_tuned(self, tmp_path):
+        assert database_profile(tmp_path, SQLITE_PRODUCTION="1", CONN_MAX_AGE="60") == {
+            "journal_mode": "wal", "busy_timeout": 20000, "synchronous": 1,
+            "cache_size": -20000, "temp_store": 2, "conn_max_age": 60}
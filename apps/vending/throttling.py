@@ -0,0 +1,79 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+RATE_LIMIT_KEY = "vending:ratelimit:{scope}:{kind}:{ident}"
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# Longer user ids are cut, so a request can't make the cache key grow.
+MAX_IDENT_LENGTH = 64
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """
+    "10/min" -> (10, 60): a burst of 10 requests, refilled at 10 per minute.
+    """
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token buckets per user_id and per client for the view's throttle_scope,
+    with the rates set in settings.RATE_LIMITS. A request is admitted only
+    when every bucket it falls in has a token; otherwise DRF answers 429
+    with Retry-After. Runs in APIView.initial(), before the view touches
+    the database.
+
+    Each bucket is a single cached timestamp (the GCRA form of a token
+    bucket), so a request costs one get_many and one set_many on the default
+    cache. The lock makes buckets exact within a process; with a cache
+    shared by several processes, concurrent requests may overdraw a bucket
+    by a few tokens.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_buckets(self, request, view) -> list[tuple[str, int, int]]:
+        scope = getattr(view, "throttle_scope", None)
+        limits = settings.RATE_LIMITS.get(scope) or {}
+        idents = {"client": self.get_ident(request)}
+        user_id = request.data.get("user_id") if hasattr(request.data, "get") else None
+        if user_id:
+            idents["user"] = str(user_id)[:MAX_IDENT_LENGTH]
+        return [
+            (RATE_LIMIT_KEY.format(scope=scope, kind=kind, ident=ident), *parse_rate(limits[kind]))
+            for kind, ident in idents.items() if kind in limits
+        ]
+
+    def allow_request(self, request, view) -> bool:
+        buckets = self.get_buckets(request, view)
+        if not buckets:
+            return True
+        now = time.time()
+        with self._lock:
+            arrivals = cache.get_many([key for key, _, _ in buckets])
+            admitted, waits = {}, []
+            for key, count, period in buckets:
+                # When the bucket would be full again after taking a token.
+                arrival = max(arrivals.get(key, now), now) + period / count
+                if arrival - now > period:
+                    waits.append(arrival - now - period)
+                else:
+                    admitted[key] = arrival
+            if waits:
+                self.retry_after = max(waits)
+                return False
+            cache.set_many(admitted, timeout=math.ceil(max(period for _, _, period in buckets)))
+        return True
+
+    def wait(self) -> float | None:
+        return self.retry_after
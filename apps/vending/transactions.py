@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+
+@contextmanager
+def write_transaction():
+    """
+    transaction.atomic() for write paths. On the SQLite backend the
+    outermost block opens with BEGIN IMMEDIATE, so concurrent writers queue
+    on the busy timeout instead of failing with "database is locked".
+    """
+    if connection.in_atomic_block or not hasattr(connection, "begin_immediate"):
+        with transaction.atomic():
+            yield
+        return
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic():
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
@@ -1,25 +1,52 @@
-from decimal import Decimal
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
-from apps.vending.enums import BalanceTypeOperation
-from apps.vending.request_dto import BalanceOperationDto, OrderOperationDto
+from apps.vending.enums import BalanceTypeOperation, SalesPeriod
+from apps.vending.models import VendingMachineSlot
+from apps.vending.pagination import decode_cursor
+from apps.vending.request_dto import BalanceOperationDto, BatchOrderOperationDto, LoginDto, OrderLineDto, OrderOperationDto, PlanogramSlotDto, PlanogramUploadDto, SalesReportDto
+from apps.vending.serializers import MoneyField
 
 
 class ListSlotsValidator(serializers.Serializer):
     quantity = serializers.IntegerField(
         required=False, min_value=0, default=None)
+    cursor = serializers.CharField(required=False, default=None)
+    page_size = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.SLOTS_MAX_PAGE_SIZE,
+        default=settings.SLOTS_PAGE_SIZE)
+    # Streams every matching slot from the cursor on instead of one page.
+    stream = serializers.BooleanField(required=False, default=False)
+
+    def validate_cursor(self, cursor):
+        if cursor is None:
+            return None
+        try:
+            return decode_cursor(cursor)
+        except ValueError:
+            raise serializers.ValidationError("Invalid cursor")
+
+
+class ListProductsValidator(serializers.Serializer):
+    # Streams the planogram straight from the database, bypassing the cache.
+    stream = serializers.BooleanField(required=False, default=False)
 
 
 class LoginValidator(serializers.Serializer):
     name = serializers.CharField(required=True, max_length=200)
 
+    def to_dto(self) -> LoginDto:
+        return LoginDto(name=self.validated_data["name"])
+
 
 class BalanceViewValidator(serializers.Serializer):
     user_id = serializers.UUIDField(required=True)
     type_operation = serializers.ChoiceField(
         choices=[BalanceTypeOperation.ADD.value, BalanceTypeOperation.REFUND.value, BalanceTypeOperation.ORDER_PRODUCT.value])
-    amount = serializers.DecimalField(
-        required=False, max_digits=4, decimal_places=2)
+    amount = MoneyField(required=False)
 
     def to_dto(self) -> BalanceOperationDto:
         return BalanceOperationDto(
@@ -30,14 +57,15 @@ class BalanceViewValidator(serializers.Serializer):
         )
 
     def validate(self, data):
-        if data.get("type_operation") == BalanceTypeOperation.ADD and data.get("amount") is None:
+        type_operation = data.get("type_operation")
+        if type_operation != BalanceTypeOperation.REFUND and data.get("amount") is None:
             raise serializers.ValidationError(
-                "Amount is required when type_operation is add"
+                f"Amount is required when type_operation is {type_operation}"
             )
         return data
 
     def validate_amount(self, amount):
-        if amount < Decimal("0.00"):
+        if amount < 0:
             raise serializers.ValidationError(
                 "Amount must to be greater than 0.00"
             )
@@ -53,3 +81,98 @@ class OrderViewValidator(serializers.Serializer):
             user_id=self.validated_data["user_id"],
             slot_id=self.validated_data["slot_id"],
         )
+
+
+class OrderLineValidator(serializers.Serializer):
+    slot_id = serializers.UUIDField(required=True)
+    quantity = serializers.IntegerField(
+        required=False, min_value=1, max_value=100, default=1)
+
+
+class BatchOrderViewValidator(serializers.Serializer):
+    user_id = serializers.UUIDField(required=True)
+    slot_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, allow_empty=False)
+    items = OrderLineValidator(many=True, required=False, allow_empty=False)
+
+    def to_dto(self) -> BatchOrderOperationDto:
+        if "items" in self.validated_data:
+            lines = [OrderLineDto(slot_id=item["slot_id"], quantity=item["quantity"])
+                     for item in self.validated_data["items"]]
+        else:
+            lines = [OrderLineDto(slot_id=slot_id)
+                     for slot_id in self.validated_data["slot_ids"]]
+        return BatchOrderOperationDto(
+            user_id=self.validated_data["user_id"],
+            lines=lines,
+        )
+
+    def validate(self, data):
+        if ("slot_ids" in data) == ("items" in data):
+            raise serializers.ValidationError(
+                "Exactly one of slot_ids or items is required"
+            )
+        return data
+
+
+def _slot_field_validators(name: str) -> list:
+    return VendingMachineSlot._meta.get_field(name).validators
+
+
+class PlanogramSlotValidator(serializers.Serializer):
+    machine_id = serializers.UUIDField(required=True)
+    row = serializers.IntegerField(validators=_slot_field_validators("row"))
+    column = serializers.IntegerField(validators=_slot_field_validators("column"))
+    product_id = serializers.UUIDField(required=True)
+    quantity = serializers.IntegerField(validators=_slot_field_validators("quantity"))
+
+
+class PlanogramUploadValidator(serializers.Serializer):
+    slots = PlanogramSlotValidator(many=True, allow_empty=False)
+
+    def to_dto(self) -> PlanogramUploadDto:
+        return PlanogramUploadDto(slots=[
+            PlanogramSlotDto(**slot) for slot in self.validated_data["slots"]])
+
+    def validate_slots(self, slots):
+        positions = Counter((slot["machine_id"], slot["row"], slot["column"]) for slot in slots)
+        duplicates = [position for position, count in positions.items() if count > 1]
+        if duplicates:
+            raise serializers.ValidationError([
+                f"Row {row}, column {column} of machine {machine_id} is listed more than once"
+                for machine_id, row, column in duplicates
+            ])
+        return slots
+
+
+SALES_PERIOD_LENGTH = {SalesPeriod.HOUR: timedelta(hours=1), SalesPeriod.DAY: timedelta(days=1)}
+
+
+class SalesReportValidator(serializers.Serializer):
+    period = serializers.ChoiceField(
+        choices=[period.value for period in SalesPeriod], required=False, default=SalesPeriod.DAY.value)
+    # Defaults to the last SALES_REPORT_DEFAULT_BUCKETS buckets up to now.
+    start = serializers.DateTimeField(required=False, default=None)
+    end = serializers.DateTimeField(required=False, default=None)
+    group_by = serializers.ChoiceField(choices=["product", "slot"], required=False, default="product")
+
+    def to_dto(self) -> SalesReportDto:
+        return SalesReportDto(
+            period=SalesPeriod(self.validated_data["period"]),
+            start=self.validated_data["start"],
+            end=self.validated_data["end"],
+            group_by=self.validated_data["group_by"],
+        )
+
+    def validate(self, data):
+        length = SALES_PERIOD_LENGTH[SalesPeriod(data["period"])]
+        if data["end"] is None:
+            data["end"] = timezone.now()
+        if data["start"] is None:
+            data["start"] = data["end"] - length * settings.SALES_REPORT_DEFAULT_BUCKETS
+        if data["start"] >= data["end"]:
+            raise serializers.ValidationError("start must be before end")
+        if data["end"] - data["start"] > length * settings.SALES_REPORT_MAX_BUCKETS:
+            raise serializers.ValidationError(
+                f"A report spans at most {settings.SALES_REPORT_MAX_BUCKETS} {data['period']} buckets")
+        return data
@@ -1,42 +1,116 @@
-from decimal import Decimal
 from uuid import UUID
 
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.request import Request
+from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework import serializers
 from apps.vending.enums import BalanceTypeOperation
-from apps.vending.exceptions import OrderError, UserNotFound, VendingMachineSlotNotFound
+from apps.vending.events import event_stream_response
+from apps.vending.exceptions import MachineNotFound, OrderError, ProductNotFound, UserNotFound, VendingMachineSlotNotFound
 
-from apps.vending.models import VendingMachineSlot, User
-from apps.vending.serializers import VendingMachineSlotSerializer, UserSerializer
-from apps.vending.services import BalanceOperatorService, OrderOperatorService
-from apps.vending.validators import ListSlotsValidator, LoginValidator, OrderViewValidator, BalanceViewValidator
+from apps.vending.idempotency import IDEMPOTENCY_KEY_HEADER, idempotent
+from apps.vending.inventory import LiveQuantityEncoder, inventory_engine
+from apps.vending.middleware import server_timing
+from apps.vending.models import Machine, VendingMachineSlot
+from apps.vending.money import Money
+from apps.vending.pagination import aslots_page, encode_cursor, next_page_link, ordered_after
+from apps.vending.parsers import PlanogramCSVParser
+from apps.vending.planogram import planogram_cache
+from apps.vending.renderers import ProductGridEncoder, SlotsEncoder, render_slot, render_slots, slot_rows
+from apps.vending.schema import schema_response
+from apps.vending.serializers import BatchOrderSerializer, MoneyField, PlanogramUploadSerializer, SalesReportSerializer, UserSerializer
+from apps.vending.services import BalanceOperatorService, BatchOrderOperatorService, LoginService, OrderOperatorService, PlanogramUploadService, SalesReportService
+from apps.vending.streaming import streaming_response
+from apps.vending.throttling import TokenBucketThrottle
+from apps.vending.validators import BatchOrderViewValidator, ListProductsValidator, ListSlotsValidator, LoginValidator, OrderViewValidator, BalanceViewValidator, PlanogramUploadValidator, SalesReportValidator
 
-from drf_spectacular.utils import extend_schema, inline_serializer
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, inline_serializer
 
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    IDEMPOTENCY_KEY_HEADER, OpenApiTypes.STR, OpenApiParameter.HEADER,
+    description="Retries with the same key get the first response back instead of running again.")
 
-class VendingMachineSlotView(APIView):
 
-    def get(self, request: Request) -> Response:
-        validator = ListSlotsValidator(data=request.query_params)
-        validator.is_valid(raise_exception=True)
+# Read endpoints are plain async Django views: under ASGI a kiosk poll
+# waits on the event loop instead of holding a worker thread. Writes stay
+# on synchronous APIViews and their transactional services.
+
+def machine_not_found() -> JsonResponse:
+    return JsonResponse({"message": "Machine not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
+class VendingMachineSlotView(View):
+
+    async def get(self, request, machine_id: UUID | None = None) -> HttpResponse:
+        validator = ListSlotsValidator(data=request.GET)
+        if not validator.is_valid():
+            return JsonResponse(validator.errors, status=status.HTTP_400_BAD_REQUEST)
         filters = {}
+        if machine_id is not None:
+            filters["machine_id"] = machine_id
         if quantity := validator.validated_data["quantity"]:
             filters["quantity__lte"] = quantity
 
-        slots = VendingMachineSlot.objects.filter(**filters)
-        slots_serializer = VendingMachineSlotSerializer(slots, many=True)
-        return Response(data=slots_serializer.data)
+        slots = slot_rows(VendingMachineSlot.objects.filter(**filters))
+        if validator.validated_data["stream"]:
+            if machine_id is not None and not await Machine.objects.filter(id=machine_id).aexists():
+                return machine_not_found()
+            return streaming_response(
+                request, ordered_after(slots, validator.validated_data["cursor"]),
+                LiveQuantityEncoder(SlotsEncoder()))
+
+        rows, next_key = await aslots_page(
+            slots, validator.validated_data["cursor"], validator.validated_data["page_size"])
+        if not rows and machine_id is not None and not await Machine.objects.filter(id=machine_id).aexists():
+            return machine_not_found()
+        response = HttpResponse(render_slots(inventory_engine.overlay(rows)), content_type="application/json")
+        if next_key is not None:
+            response["Link"] = next_page_link(request, encode_cursor(next_key))
+        return response
 
 
-class VendingMachineSlotDetailView(APIView):
+class VendingMachineSlotDetailView(View):
 
-    def get(self, request, id: UUID) -> Response:
-        slot = VendingMachineSlot.objects.get(id=id)
-        slot_serializer = VendingMachineSlotSerializer(slot)
-        return Response(data=slot_serializer.data)
+    async def get(self, request, id: UUID) -> HttpResponse:
+        try:
+            slot = await slot_rows(VendingMachineSlot.objects.filter(id=id)).aget()
+        except VendingMachineSlot.DoesNotExist:
+            return JsonResponse({"message": f"Slot not found with ID {id}"}, status=status.HTTP_404_NOT_FOUND)
+        [slot] = inventory_engine.overlay([slot])
+        return HttpResponse(render_slot(slot), content_type="application/json")
+
+
+class SlotBulkView(APIView):
+    # Restocking and repricing are for staff, as they are in the admin.
+    authentication_classes = [SessionAuthentication]
+    permission_classes = [IsAdminUser]
+    parser_classes = [JSONParser, PlanogramCSVParser]
+
+    @extend_schema(
+        request=PlanogramUploadValidator,
+        responses=PlanogramUploadSerializer,
+    )
+    def post(self, request) -> Response:
+        with server_timing("validation"):
+            validator = PlanogramUploadValidator(data=request.data)
+            validator.is_valid(raise_exception=True)
+            dto = validator.to_dto()
+        service = PlanogramUploadService()
+        try:
+            with server_timing("service"):
+                result = service.execute(dto)
+        except (MachineNotFound, ProductNotFound) as e:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"message": str(e)})
+        with server_timing("serialization"):
+            data = PlanogramUploadSerializer(result).data
+        return Response(data=data)
 
 
 class LoginView(APIView):
@@ -52,34 +126,47 @@ class LoginView(APIView):
     def post(self, request: Request) -> Response:
         validator = LoginValidator(data=request.data)
         validator.is_valid(raise_exception=True)
-        name = validator.validated_data["name"]
-        user, created = User.objects.get_or_create(
-            name__iexact=name, defaults={"name": name})
+        dto = validator.to_dto()
+        service = LoginService()
+        user, created = service.execute(dto)
         user_serializer = UserSerializer(user)
         return Response(data=user_serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
-class ProductView(APIView):
+class ProductView(View):
+
+    async def get(self, request, machine_id: UUID | None = None) -> HttpResponse:
+        validator = ListProductsValidator(data=request.GET)
+        if not validator.is_valid():
+            return JsonResponse(validator.errors, status=status.HTTP_400_BAD_REQUEST)
+        if validator.validated_data["stream"]:
+            slots = VendingMachineSlot.objects.order_by("row", "column")
+            if machine_id is not None:
+                if not await Machine.objects.filter(id=machine_id).aexists():
+                    return machine_not_found()
+                slots = slots.filter(machine_id=machine_id)
+            return streaming_response(request, slot_rows(slots), LiveQuantityEncoder(ProductGridEncoder()))
+
+        try:
+            content, cached = await planogram_cache.aget(machine_id)
+        except MachineNotFound:
+            return machine_not_found()
+        response = HttpResponse(content, content_type="application/json")
+        response["X-Planogram-Cache"] = "hit" if cached else "miss"
+        return response
+
+
+class ProductStreamView(View):
 
-    def get(self, request: Request) -> Response:
-        slots = VendingMachineSlot.objects.order_by("row", "column")
-        slots_serializer = VendingMachineSlotSerializer(
-            slots, many=True)
-        result = []
-        for slot in slots_serializer.data:
-            new_product = {
-                **slot["product"],
-                "quantity": slot["quantity"],
-                "slot_id": slot["id"]
-            }
-            if len(result) < slot["row"]:
-                result.append([new_product])
-            else:
-                result[slot["row"] - 1].append(new_product)
-        return Response(data=result)
+    async def get(self, request, machine_id: UUID | None = None) -> HttpResponse:
+        if machine_id is not None and not await Machine.objects.filter(id=machine_id).aexists():
+            return machine_not_found()
+        return event_stream_response(request, machine_id)
 
 
 class BalanceView(APIView):
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "balance"
 
     @extend_schema(
         request=inline_serializer(
@@ -88,25 +175,32 @@ class BalanceView(APIView):
                 "user_id": serializers.UUIDField(),
                 "type_operation": serializers.ChoiceField(
                     choices=[BalanceTypeOperation.ADD, BalanceTypeOperation.REFUND, BalanceTypeOperation.ORDER_PRODUCT]),
-                "amount": serializers.DecimalField(
-                    max_digits=4, decimal_places=2, default=0.00)
+                "amount": MoneyField(default=Money(0))
             },
         ),
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
     )
+    @idempotent
     def post(self, request) -> Response:
-        validator = BalanceViewValidator(data=request.data)
-        validator.is_valid(raise_exception=True)
-        dto = validator.to_dto()
+        with server_timing("validation"):
+            validator = BalanceViewValidator(data=request.data)
+            validator.is_valid(raise_exception=True)
+            dto = validator.to_dto()
         service = BalanceOperatorService()
         try:
-            user = service.execute(dto)
+            with server_timing("service"):
+                user = service.execute(dto)
         except UserNotFound as e:
             return Response(status=status.HTTP_404_NOT_FOUND, data={"message": str(e)},)
-        user_serializer = UserSerializer(user)
-        return Response(data=user_serializer.data)
+        with server_timing("serialization"):
+            user_serializer = UserSerializer(user)
+            data = user_serializer.data
+        return Response(data=data)
 
 
 class OrderView(APIView):
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "order"
 
     @extend_schema(
         request=inline_serializer(
@@ -116,19 +210,78 @@ class OrderView(APIView):
                 "slot_id": serializers.UUIDField(),
             },
         ),
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
     )
+    @idempotent
     def post(self, request) -> Response:
-        validator = OrderViewValidator(data=request.data)
-        validator.is_valid(raise_exception=True)
-        dto = validator.to_dto()
+        with server_timing("validation"):
+            validator = OrderViewValidator(data=request.data)
+            validator.is_valid(raise_exception=True)
+            dto = validator.to_dto()
         service = OrderOperatorService()
         try:
-            user = service.execute(dto)
+            with server_timing("service"):
+                user = service.execute(dto)
         except UserNotFound as e:
             return Response(status=status.HTTP_404_NOT_FOUND, data={"message": str(e)})
         except VendingMachineSlotNotFound as e:
             return Response(status=status.HTTP_404_NOT_FOUND, data={"message": str(e)})
         except OrderError as e:
             return Response(status=status.HTTP_400_BAD_REQUEST, data={"message": str(e)})
-        user_serializer = UserSerializer(user)
-        return Response(data=user_serializer.data)
+        with server_timing("serialization"):
+            user_serializer = UserSerializer(user)
+            data = user_serializer.data
+        return Response(data=data)
+
+
+class BatchOrderView(APIView):
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "order"
+
+    @extend_schema(
+        request=BatchOrderViewValidator,
+        responses=BatchOrderSerializer,
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
+    )
+    @idempotent
+    def post(self, request) -> Response:
+        with server_timing("validation"):
+            validator = BatchOrderViewValidator(data=request.data)
+            validator.is_valid(raise_exception=True)
+            dto = validator.to_dto()
+        service = BatchOrderOperatorService()
+        try:
+            with server_timing("service"):
+                result = service.execute(dto)
+        except UserNotFound as e:
+            return Response(status=status.HTTP_404_NOT_FOUND, data={"message": str(e)})
+        except VendingMachineSlotNotFound as e:
+            return Response(status=status.HTTP_404_NOT_FOUND, data={"message": str(e)})
+        except OrderError as e:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"message": str(e)})
+        with server_timing("serialization"):
+            batch_serializer = BatchOrderSerializer(result)
+            data = batch_serializer.data
+        return Response(data=data)
+
+
+class SalesReportView(APIView):
+    # Revenue is for staff only, like the admin.
+    authentication_classes = [SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        parameters=[SalesReportValidator],
+        responses=SalesReportSerializer,
+    )
+    def get(self, request) -> Response:
+        validator = SalesReportValidator(data=request.query_params)
+        validator.is_valid(raise_exception=True)
+        report = SalesReportService().execute(validator.to_dto())
+        return Response(data=SalesReportSerializer(report).data)
+
+
+class SchemaView(View):
+
+    def get(self, request) -> HttpResponse:
+        return schema_response(request)
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from corsheaders.defaults import default_headers as default_cors_headers
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -46,9 +48,21 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # The API has no logins; without authenticators DRF never loads a
+    # session, so requests are throttled before any query.
+    "DEFAULT_AUTHENTICATION_CLASSES": [],
+    # Proxies in front of the app. With 0, X-Forwarded-For is ignored, so a
+    # client can't choose its own rate limit bucket.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
+}
+
+SPECTACULAR_SETTINGS = {
+    # Also documents the read endpoints, which are plain Django views.
+    "DEFAULT_GENERATOR_CLASS": "apps.vending.openapi.SchemaGenerator",
 }
 
 MIDDLEWARE = [
+    "apps.vending.middleware.ReplicaRoutingMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -59,6 +73,26 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Adds a Server-Timing header and a JSON log line with DB, view, render and
+# serialization timings to every response. Off unless SERVER_TIMING=1.
+SERVER_TIMING = os.environ.get("SERVER_TIMING") == "1"
+if SERVER_TIMING:
+    MIDDLEWARE.insert(0, "apps.vending.middleware.ServerTimingMiddleware")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "apps.vending.server_timing": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+    },
+}
+
 ROOT_URLCONF = 'vending_machine.urls'
 
 TEMPLATES = [
@@ -78,17 +112,134 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'vending_machine.wsgi.application'
+ASGI_APPLICATION = 'vending_machine.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# The backend opens the services' write transactions with BEGIN IMMEDIATE
+# (see apps.vending.transactions), and writers wait up to "timeout" seconds
+# for the lock instead of failing.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'vending_machine.sqlite_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        # A file (rather than the shared in-memory default) lets concurrent
+        # test connections, and the forked workers of replay_operations,
+        # wait on SQLite locks instead of failing.
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    }
+}
+
+# Production SQLite profile, SQLITE_PRODUCTION=1: WAL lets readers run
+# alongside the writer, synchronous=NORMAL is durable in WAL mode up to the
+# last checkpoint, and connections are kept for CONN_MAX_AGE seconds
+# instead of per request.
+SQLITE_PRODUCTION = os.environ.get("SQLITE_PRODUCTION") == "1"
+if SQLITE_PRODUCTION:
+    DATABASES['default']['OPTIONS']['init_command'] = (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA temp_store=MEMORY;'
+        'PRAGMA mmap_size=134217728;'
+    )
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read replicas: a comma separated list of SQLite files in DATABASE_REPLICAS
+# becomes the replica_0, replica_1... aliases, refreshed from the primary
+# with `manage.py sync_replicas`. Request reads are spread over them; a
+# client that wrote reads from the primary for REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = [path for path in os.environ.get("DATABASE_REPLICAS", "").split(",") if path]
+for index, path in enumerate(DATABASE_REPLICAS):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "NAME": path,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["apps.vending.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# The cached planogram and its inventory version, idempotency keys and rate
+# limit buckets live in the default cache. LocMemCache is per process: with
+# several worker processes, or manage.py commands writing next to the
+# server, set REDIS_URL so they share one, or processes that did not make a
+# change keep serving the old planogram until it expires.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vending-machine',
     }
 }
+if os.environ.get("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+    }
+
+# /slots/ keyset pagination: default and maximum page_size.
+SLOTS_PAGE_SIZE = 100
+SLOTS_MAX_PAGE_SIZE = 1000
+
+# Rows fetched and encoded at a time by streaming listings (?stream=true).
+STREAMING_CHUNK_SIZE = 500
+
+# In-memory stock counters for orders and listings, written back to the
+# database in batches (see apps.vending.inventory). Off unless
+# INVENTORY_ENGINE=1; needs a single worker process.
+INVENTORY_ENGINE = os.environ.get("INVENTORY_ENGINE") == "1"
+INVENTORY_FLUSH_INTERVAL = float(os.environ.get("INVENTORY_FLUSH_INTERVAL", 1.0))
+INVENTORY_FLUSH_BATCH_SIZE = 500
+
+# /products/stream/ Server-Sent Events: heartbeat comment interval (seconds),
+# slots a client may fall behind on before it is told to resync, the
+# reconnect delay suggested to clients (milliseconds) and how long a stream
+# lasts before the client has to reconnect (seconds), which is also how
+# long a client that went away can stay subscribed.
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_MAX_PENDING = 1000
+SSE_RETRY_MS = 3000
+SSE_MAX_STREAM_SECONDS = 300
+
+# Token buckets per throttle_scope on the write endpoints, for each user_id
+# and each client: "N/period" admits bursts of N requests, refilled at N per
+# period (s, min, hour or day). See apps.vending.throttling.
+RATE_LIMITS = {
+    "order": {"user": "30/min", "client": "300/min"},
+    "balance": {"user": "30/min", "client": "300/min"},
+}
+
+# /reports/sales/ window: buckets shown by default and at most.
+SALES_REPORT_DEFAULT_BUCKETS = 30
+SALES_REPORT_MAX_BUCKETS = 1000
+
+# Idempotency-Key on /order/ and /balance/: how long a response is kept for
+# replay, and how long a concurrent duplicate waits for the first request.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+# How long the first request holds its key. It must outlive the request,
+# including the wait for the database's busy timeout (20 s), or a retry
+# would claim the key again and run twice; it only expires on its own when
+# the worker dies mid-request.
+IDEMPOTENCY_CLAIM_TTL = 120
+
+# Directory with the OpenAPI schema files written by `manage.py
+# build_schema`, served from memory by /schema/. Unset, the schema is
+# generated on the first request instead.
+OPENAPI_SCHEMA_DIR = os.environ.get("OPENAPI_SCHEMA_DIR")
 
 
 # Password validation
@@ -133,3 +284,10 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000"
 ]
+
+# Lets kiosk frontends read the /slots/ next page link.
+CORS_EXPOSE_HEADERS = ["Link", "Idempotent-Replayed"]
+CORS_ALLOW_HEADERS = (*default_cors_headers, "idempotency-key")
+# Frontends fetch with credentials so the browser stores and sends back the
+# vending_primary_pin cookie, which keeps a client that wrote on the primary.
+CORS_ALLOW_CREDENTIALS = True
@@ -0,0 +1,49 @@
+"""
+API-only settings for kiosk workers: DJANGO_SETTINGS_MODULE=vending_machine.settings_api.
+
+Drops the admin, sessions, messages, static files and drf-spectacular,
+which the kiosk API never uses, so workers import less at boot and run
+fewer middleware per request. /schema/ is served from the files that
+`manage.py build_schema` (run with the default settings) writes to
+OPENAPI_SCHEMA_DIR; /admin/ and /docs/ are not routed. With no sessions
+or users, the staff-only endpoints answer every request with 403.
+"""
+
+import os
+
+from vending_machine.settings import *  # noqa: F401,F403
+from vending_machine.settings import BASE_DIR, MIDDLEWARE, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    "apps.health",
+    "apps.vending",
+    "corsheaders",
+]
+
+# Sessions, CSRF (DRF views are exempt and the other views only read),
+# auth, messages and X-Frame-Options are for the admin.
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE if middleware not in {
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.middleware.csrf.CsrfViewMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+        "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    }
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # AnonymousUser lives in django.contrib.auth, which is not installed.
+    "UNAUTHENTICATED_USER": None,
+    # @extend_schema subclasses this when views are imported; DRF's base
+    # inspector keeps drf-spectacular's schema generator out of workers.
+    "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.inspectors.ViewInspector",
+}
+
+# Nothing renders templates.
+TEMPLATES = []
+
+ROOT_URLCONF = "vending_machine.urls_api"
+
+OPENAPI_SCHEMA_DIR = os.environ.get("OPENAPI_SCHEMA_DIR", os.path.join(BASE_DIR, "build"))
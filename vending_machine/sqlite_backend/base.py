@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend with two additions:
+
+    - OPTIONS["init_command"]: semicolon separated statements (PRAGMAs) run
+      on every new connection.
+    - begin_immediate: when set, the next transaction opens with BEGIN
+      IMMEDIATE, taking the write lock up front. A deferred transaction that
+      reads before writing cannot wait for the lock on upgrade and fails
+      with "database is locked" instead.
+    """
+
+    begin_immediate = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.init_command = kwargs.pop("init_command", "")
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in self.init_command.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE" if self.begin_immediate else "BEGIN")
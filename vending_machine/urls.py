@@ -14,23 +14,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from apps.health.views import healthcheck
-import apps.vending.views as vending_views
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from django.urls import path
+from drf_spectacular.views import SpectacularSwaggerView
+
+from vending_machine.urls_api import urlpatterns as api_urlpatterns
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("healthcheck/", healthcheck),
-    path("slots/", include([
-        path("<uuid:id>", vending_views.VendingMachineSlotDetailView.as_view()),
-        path("", vending_views.VendingMachineSlotView.as_view()),
-    ])),
-    path("login/", vending_views.LoginView.as_view()),
-    path("products/", vending_views.ProductView.as_view()),
-    path("balance/", vending_views.BalanceView.as_view()),
-    path("order/", vending_views.OrderView.as_view()),
-    path("schema/", SpectacularAPIView.as_view(), name="schema"),
+    *api_urlpatterns,
     path(
         "docs/",
         SpectacularSwaggerView.as_view(
@@ -0,0 +1,31 @@
+"""
+URLs of the kiosk API, without the admin and the Swagger UI, for the
+API-only settings profile (vending_machine.settings_api).
+"""
+from django.urls import path, include
+from apps.health.views import healthcheck
+import apps.vending.views as vending_views
+
+urlpatterns = [
+    path("healthcheck/", healthcheck),
+    path("slots/", include([
+        path("bulk/", vending_views.SlotBulkView.as_view()),
+        path("<uuid:id>", vending_views.VendingMachineSlotDetailView.as_view()),
+        path("", vending_views.VendingMachineSlotView.as_view()),
+    ])),
+    path("machines/<uuid:machine_id>/", include([
+        path("slots/", vending_views.VendingMachineSlotView.as_view()),
+        path("products/", vending_views.ProductView.as_view()),
+        path("products/stream/", vending_views.ProductStreamView.as_view()),
+    ])),
+    path("login/", vending_views.LoginView.as_view()),
+    path("products/", vending_views.ProductView.as_view()),
+    path("products/stream/", vending_views.ProductStreamView.as_view()),
+    path("balance/", vending_views.BalanceView.as_view()),
+    path("order/", include([
+        path("batch/", vending_views.BatchOrderView.as_view()),
+        path("", vending_views.OrderView.as_view()),
+    ])),
+    path("reports/sales/", vending_views.SalesReportView.as_view()),
+    path("schema/", vending_views.SchemaView.as_view(), name="schema"),
+]